@@ -1,6 +1,7 @@
 import logging
 from algobench.decorator import algorithm
+from algobench.progress import report_progress
 
-__all__ = ["algorithm"]
+__all__ = ["algorithm", "report_progress"]
 
 logging.getLogger("algobench").addHandler(logging.NullHandler())
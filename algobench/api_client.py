@@ -1,32 +1,255 @@
+import asyncio
+import functools
+import importlib.metadata
 import subprocess
 import requests
 import sys
 import inspect
-from dataclasses import dataclass
+import json
+from dataclasses import dataclass, field
 import logging
 import os
+import threading
+import time
+import weakref
+from typing import Callable, Iterable, Iterator
+from urllib.parse import quote_plus, urlencode
 
-from .file_handling import convert_to_json, convert_from_json
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
+from .cache import DiskCache
+from .circuit_breaker import AdaptiveTimeouts, CircuitBreaker, CircuitOpenError, endpoint_key
+from .forking import reinit_after_fork
+from .file_handling import CODECS, COMPRESSIONS, JSONStream, content_hash, convert_to_json, convert_from_json, encode
+from .instrumentation import count, span
 
 logger = logging.getLogger(__name__)
 
 
+class UploadRejectedError(Exception):
+    # The server refused an upload for good (a 4xx status other than 408 and 429), so retrying it cannot help.
+
+    def __init__(self, status_code: int, text: str):
+        super().__init__(f"Upload rejected with status {status_code}. {text}")
+        self.status_code = status_code
+
+
+def rejected(response: requests.Response) -> bool:
+    return 400 <= response.status_code < 500 and response.status_code not in (408, 429)
+
+
+def _close_thread_session(sessions: dict, key: int):
+    # Called when the thread owning the session is collected, unless close() closed the session before.
+    session = sessions.pop(key, None)
+    if session is not None:
+        session.close()
+
+
+@functools.lru_cache(maxsize=1)
+def requirements_freeze() -> str:
+    return subprocess.check_output(["uv", "pip", "freeze"]).decode("utf-8")
+
+
+def installed_packages_hash() -> str:
+    # Reading package metadata is much cheaper than running a freeze and changes whenever the freeze would.
+    packages = sorted(f"{dist.metadata['Name']}=={dist.version}" for dist in importlib.metadata.distributions())
+    return content_hash("\n".join(packages))
+
+
+class FormStream:
+    # Form-encoded request body whose streamed field is url-encoded chunk by chunk. Sent with chunked
+    # transfer encoding; it can be iterated again, so retries resend the complete body.
+
+    def __init__(self, fields: dict, stream_field: str, stream: Iterable[str]):
+        self.fields = fields
+        self.stream_field = stream_field
+        self.stream = stream
+
+    def __iter__(self) -> Iterator[bytes]:
+        fields = [(key, value) for key, value in self.fields.items() if value is not None]
+        yield (urlencode(fields + [(self.stream_field, "")])).encode("ascii")
+        for chunk in self.stream:
+            yield quote_plus(chunk).encode("ascii")
+
+
+@dataclass
+class Registration:
+    algobench_url: str
+    env_name: str
+    problem_id: str
+    server_fingerprint: str | None
+    content_format: tuple[str, str | None] | None
+    solution_diffs: bool = False
+
+
+# Registrations handed over by another process, e.g. together with a pickled decorated function.
+known_registrations: dict[tuple[str, str], Registration] = {}
+
+
 @dataclass
 class APIClient:
     api_key: str
     env_name: str
     problem_id: str | None = None
+    pool_size: int = 10
+    connect_timeout: float = 3.05
+    read_timeout: float = 30.0
+    min_poll_timeout: float = 1.0
+    max_retries: int = 3
+    backoff_factor: float = 0.5
+    instance_cache: DiskCache | None = None
+    problem_cache: DiskCache | None = None
+    codec: str = "json"
+    compression: str | None = None
+    stream_uploads: bool = False
+    per_thread_sessions: bool = False
+    circuit_breaker: CircuitBreaker = field(default_factory=CircuitBreaker)
+    timeouts: AdaptiveTimeouts | None = None
 
     def __post_init__(self):
         self.headers = {"Authorization": f"ApiKey {self.api_key}"}
         self.algobench_url = os.getenv("ALGOBENCH_URL", "https://algobench.io")
+        self.server_fingerprint = None
+        self.content_format = None
+        # Solutions are only uploaded as JSON Patch diffs if the server advertised them at login.
+        self.solution_diffs = False
+        self._session = None
+        self._poll_session = None
+        self._local = threading.local()
+        self._thread_sessions = {}
+        self._session_lock = threading.Lock()
+        # Guards problem_id, server_fingerprint and content_format, which login and upload_problem replace.
+        self._state_lock = threading.RLock()
+        reinit_after_fork(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def session(self) -> requests.Session:
+        # The session and its connection pools are shared by all threads using this client. With
+        # per_thread_sessions, every thread gets its own session with a pool of pool_size connections.
+        return self._get_session("_session", retry_reads=True)
+
+    @property
+    def poll_session(self) -> requests.Session:
+        # Polls are bounded by the deadline of the wait, so a poll that timed out reading is not retried.
+        return self._get_session("_poll_session", retry_reads=False)
+
+    def _get_session(self, name: str, retry_reads: bool) -> requests.Session:
+        if self.per_thread_sessions:
+            return self._thread_session(name, retry_reads)
+        if getattr(self, name) is None:
+            with self._session_lock:
+                if getattr(self, name) is None:
+                    setattr(self, name, self._create_session(retry_reads))
+        return getattr(self, name)
+
+    def _thread_session(self, name: str, retry_reads: bool) -> requests.Session:
+        # Sessions of finished threads, e.g. of the pool of every batch() call, are closed with their thread.
+        session = getattr(self._local, name, None)
+        if session is None:
+            session = self._create_session(retry_reads)
+            setattr(self._local, name, session)
+            with self._session_lock:
+                self._thread_sessions[id(session)] = session
+            weakref.finalize(threading.current_thread(), _close_thread_session, self._thread_sessions, id(session))
+        return session
+
+    def _create_session(self, retry_reads: bool = True) -> requests.Session:
+        # Connection errors are retried for every method since nothing reached the server yet.
+        # Read errors and retryable status codes are only retried for idempotent methods.
+        retry = Retry(
+            total=self.max_retries,
+            connect=self.max_retries,
+            read=self.max_retries if retry_reads else False,
+            status=self.max_retries,
+            backoff_factor=self.backoff_factor,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset({"GET", "PUT"}),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size, max_retries=retry)
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers.update(self.headers)
+        return session
+
+    def close(self):
+        with self._session_lock:
+            sessions = list(self._thread_sessions.values())
+            sessions.extend(session for session in (self._session, self._poll_session) if session is not None)
+            self._session = None
+            self._poll_session = None
+            self._local = threading.local()
+            self._thread_sessions.clear()
+        for session in sessions:
+            session.close()
+
+    def _after_fork(self):
+        # The sockets of the sessions are shared with the parent process, so they are dropped without closing them.
+        self._session = None
+        self._poll_session = None
+        self._local = threading.local()
+        self._thread_sessions = {}
+        self._session_lock = threading.Lock()
+        self._state_lock = threading.RLock()
+
+    def reachable(self) -> bool:
+        return not self.circuit_breaker.is_open()
+
+    def _request(self, method: str, path: str, poll_timeout: float | None = None, **kwargs) -> requests.Response:
+        # Every request passes the circuit breaker. Server errors and exceptions count as failures. With timeouts,
+        # the latencies of GET requests tune the read timeout of their endpoint; uploads take longer for larger
+        # payloads and keep read_timeout. A poll waits at most poll_timeout
+        # (but min_poll_timeout at least) for the response and is not retried after a read timeout.
+        endpoint = endpoint_key(method, path)
+        if not self.circuit_breaker.allow():
+            raise CircuitOpenError(f"Circuit to {self.algobench_url} is open")
+        timeouts = self.timeouts if method == "GET" else None
+        read_timeout = self.read_timeout if timeouts is None else timeouts.read_timeout(endpoint, self.read_timeout)
+        if poll_timeout is not None:
+            read_timeout = min(read_timeout, max(poll_timeout, self.min_poll_timeout))
+        kwargs.setdefault("timeout", (self.connect_timeout, read_timeout))
+        session = self.session if poll_timeout is None else self.poll_session
+        started = time.perf_counter()
+        try:
+            response = session.request(method, f"{self.algobench_url}{path}", **kwargs)
+        except requests.exceptions.RequestException:
+            self.circuit_breaker.record_failure()
+            raise
+        latency = time.perf_counter() - started
+        if response.status_code >= 500 or response.status_code == 429:
+            self.circuit_breaker.record_failure()
+        else:
+            self.circuit_breaker.record_success(latency)
+            if timeouts is not None:
+                timeouts.observe(endpoint, latency)
+        self._count_traffic(response)
+        return response
+
+    def _count_traffic(self, response: requests.Response):
+        # Streamed bodies have no length and are not counted in bytes_sent.
+        count("requests")
+        body = getattr(response.request, "body", None)
+        if isinstance(body, (str, bytes)):
+            count("bytes_sent", len(body))
+        if isinstance(response.content, bytes):
+            count("bytes_received", len(response.content))
+        history = getattr(getattr(response.raw, "retries", None), "history", None)
+        if isinstance(history, tuple):
+            count("retries", len(history))
 
     def login(self) -> bool:
         if not self.api_key:
             return False
         try:
-            response = requests.get(f"{self.algobench_url}/api/problems?name={self.env_name}", headers=self.headers)
+            response = self._request("GET", "/api/problems", params={"name": self.env_name})
             if response.status_code != 200:
                 logger.warning(f"Login failed. Status code: {response.status_code}. {response.text}")
                 return False
@@ -34,41 +257,155 @@ class APIClient:
             logger.warning("Login failed. Could not connect to the server.")
             return False
 
-        if len(response.json()) > 0:
-            self.problem_id = response.json()[0]["id"]
+        problems = response.json()
+        content_format = self._negotiate_content_format(response.headers.get("X-Algobench-Content-Formats"))
+        encodings = response.headers.get("X-Algobench-Solution-Encodings")
+        solution_diffs = isinstance(encodings, str) and "json-patch" in [e.strip() for e in encodings.split(",")]
+        with self._state_lock:
+            if len(problems) > 0:
+                self.problem_id = problems[0]["id"]
+                self.server_fingerprint = problems[0].get("fingerprint")
+            self.content_format = content_format
+            self.solution_diffs = solution_diffs
 
         logger.info("Login successful.")
         return True
 
+    def registration(self) -> Registration | None:
+        with self._state_lock:
+            if self.problem_id is None:
+                return None
+            return Registration(
+                self.algobench_url,
+                self.env_name,
+                self.problem_id,
+                self.server_fingerprint,
+                self.content_format,
+                self.solution_diffs,
+            )
+
+    def restore_registration(self, registration: Registration):
+        # Takes over the registration of another client instead of logging in. upload_problem still
+        # compares fingerprints, so a changed problem is uploaded again.
+        with self._state_lock:
+            self.problem_id = registration.problem_id
+            self.server_fingerprint = registration.server_fingerprint
+            self.content_format = registration.content_format
+            self.solution_diffs = registration.solution_diffs
+
+    def serialize(self, object, stream: bool | None = None) -> str | bytes | JSONStream:
+        # JSON text goes into the form field the server always accepts. Other formats are only used
+        # after the server advertised them at login and are sent as a file part.
+        if self.content_format is not None:
+            return encode(object, *self.content_format)
+        if self.stream_uploads if stream is None else stream:
+            return JSONStream(object)
+        return convert_to_json(object)
+
+    def _content_payload(self, content: str | bytes | JSONStream, fields: dict) -> dict:
+        if isinstance(content, str):
+            return {"data": {"content": content, **fields}}
+        if isinstance(content, JSONStream):
+            return {
+                "data": FormStream(fields, "content", content),
+                "headers": {"Content-Type": "application/x-www-form-urlencoded"},
+            }
+        codec, compression = self.content_format
+        return {
+            "data": {"content_codec": codec, "content_compression": compression or "", **fields},
+            "files": {"content": ("content", content, CODECS[codec].media_type)},
+        }
+
+    def _negotiate_content_format(self, advertised: str | None) -> tuple[str, str | None] | None:
+        if self.codec == "json" and self.compression is None:
+            return None
+        if self.codec not in CODECS or (self.compression is not None and self.compression not in COMPRESSIONS):
+            logger.warning(f"Content format {self.codec}/{self.compression} is not installed. Using JSON.")
+            return None
+        requested = self.codec if self.compression is None else f"{self.codec}+{self.compression}"
+        if not isinstance(advertised, str) or requested not in [f.strip() for f in advertised.split(",")]:
+            logger.info(f"Server does not accept {requested} content. Using JSON.")
+            return None
+        return self.codec, self.compression
+
     def upload_instance(self, instance) -> str | None:
-        response = requests.post(
-            f"{self.algobench_url}/api/instances/",
-            data={"content": convert_to_json(instance), "problem": self.problem_id},
-            headers=self.headers,
-        )
+        return self.upload_instance_content(self.serialize(instance))
+
+    def upload_instance_content(self, content: str | bytes | JSONStream, raise_rejected: bool = False) -> str | None:
+        # With raise_rejected, uploads refused for good raise UploadRejectedError instead of returning None.
+        # Read once so that the cache key and the upload refer to the same problem.
+        problem_id = self.problem_id
+        cache_key = None
+        if self.instance_cache is not None:
+            cache_key = f"{self.algobench_url}:{problem_id}:{content_hash(content)}"
+            cached = self.instance_cache.get(cache_key)
+            if cached is not None:
+                count("instance_cache_hits")
+                logger.info(f"Instance already uploaded as {json.loads(cached)}. Skipping upload.")
+                return json.loads(cached)
+
+        response = self._request("POST", "/api/instances/", **self._content_payload(content, {"problem": problem_id}))
 
         if response.status_code != 201:
+            if raise_rejected and rejected(response):
+                raise UploadRejectedError(response.status_code, response.text)
             logger.warning(f"Instance Upload failed. {response.text}")
             return None
-        return response.json()["id"]
+        instance_id = response.json()["id"]
+        if cache_key is not None:
+            self.instance_cache.set(cache_key, json.dumps(instance_id))
+        return instance_id
 
     def upload_solution(self, solution, instance_id: str, feasible: bool, score: float) -> str | None:
-        response = requests.post(
-            f"{self.algobench_url}/api/solutions/",
-            data={"content": convert_to_json(solution), "instance": instance_id, "feasible": feasible, "score": score},
-            headers=self.headers,
-        )
+        return self.upload_solution_content(self.serialize(solution), instance_id, feasible, score)
+
+    def upload_solution_content(
+        self,
+        content: str | bytes | JSONStream,
+        instance_id: str,
+        feasible: bool,
+        score: float,
+        raise_rejected: bool = False,
+    ) -> str | None:
+        fields = {"instance": instance_id, "feasible": feasible, "score": score}
+        response = self._request("POST", "/api/solutions/", **self._content_payload(content, fields))
 
         if response.status_code != 201:
+            if raise_rejected and rejected(response):
+                raise UploadRejectedError(response.status_code, response.text)
             logger.warning(f"Solution Upload failed. {response.text}")
             return None
 
         return response.json()["id"]
 
+    def upload_solution_delta(
+        self, delta: str, base_solution_id: str, instance_id: str, feasible: bool, score: float
+    ) -> str | None:
+        # delta is a JSON Patch against the content of the solution base_solution_id.
+        data = {
+            "content": delta,
+            "content_encoding": "json-patch",
+            "base_solution": base_solution_id,
+            "instance": instance_id,
+            "feasible": feasible,
+            "score": score,
+        }
+        response = self._request("POST", "/api/solutions/", data=data)
+
+        if response.status_code != 201:
+            logger.info(f"Solution diff upload failed. {response.text}")
+            return None
+
+        return response.json()["id"]
+
     def upload_problem(self, algorithm_function, feasibility, scoring, is_minimization: bool):
+        # Serialized so that concurrent registrations create the problem only once.
+        with self._state_lock:
+            self._upload_problem(algorithm_function, feasibility, scoring, is_minimization)
+
+    def _upload_problem(self, algorithm_function, feasibility, scoring, is_minimization: bool):
 
         python_version = f"{sys.version_info.major}.{sys.version_info.minor}"
-        requirements = subprocess.check_output(["uv", "pip", "freeze"]).decode("utf-8")
 
         file_path = inspect.getfile(algorithm_function)
         with open(file_path, "r") as f:
@@ -80,7 +417,6 @@ class APIClient:
 
         json_data = {
             "python_version": python_version,
-            "requirements": requirements,
             "code": source_code,
             "algorithm_function_name": algorithm_name,
             "feasibility_function_name": feasibility_name,
@@ -88,26 +424,55 @@ class APIClient:
             "is_minimization": is_minimization,
             "name": self.env_name,
         }
+        fingerprint = content_hash(json.dumps({**json_data, "packages": installed_packages_hash()}, sort_keys=True))
+
+        # The server's fingerprint wins: if another process uploaded different code, this one uploads its own again.
+        # The local cache only stands in when the server reports none.
+        known = self.server_fingerprint if self.server_fingerprint is not None else self._cached_fingerprint()
+        if self.problem_id is not None and fingerprint == known:
+            logger.info("Problem is unchanged. Skipping problem upload.")
+            return
+
+        json_data["requirements"] = requirements_freeze()
+        json_data["fingerprint"] = fingerprint
 
         if self.problem_id is not None:
-            response = requests.put(
-                f"{self.algobench_url}/api/problems/{self.problem_id}/", json=json_data, headers=self.headers
-            )
+            response = self._request("PUT", f"/api/problems/{self.problem_id}/", json=json_data)
             if response.status_code != 200:
                 logger.warning(f"Problem upload failed. {response.text}")
+            else:
+                self.server_fingerprint = fingerprint
+                self._cache_fingerprint(fingerprint)
         else:
-            response = requests.post(f"{self.algobench_url}/api/problems/", json=json_data, headers=self.headers)
+            response = self._request("POST", "/api/problems/", json=json_data)
             if response.status_code != 201:
                 logger.warning(f"Problem upload failed. {response.text}")
                 logger.warning(f"Problem: {response.status_code}")
             else:
                 self.problem_id = response.json()["id"]
+                self.server_fingerprint = fingerprint
+                self._cache_fingerprint(fingerprint)
                 logger.info("Problem uploaded successfully.")
 
+    def _cached_fingerprint(self) -> str | None:
+        if self.problem_cache is None:
+            return None
+        return self.problem_cache.get(f"{self.algobench_url}:{self.problem_id}")
+
+    def _cache_fingerprint(self, fingerprint: str):
+        if self.problem_cache is not None:
+            self.problem_cache.set(f"{self.algobench_url}:{self.problem_id}", fingerprint)
+
     def pull_solution(self, instance_id: str, solution_type: type) -> object | None:
-        response = requests.get(
-            f"{self.algobench_url}/api/instances/{instance_id}/best_solution/", headers=self.headers
-        )
+        data = self.fetch_best_solution(instance_id)
+        if data is None:
+            return None
+        return convert_from_json(data["content"], solution_type)
+
+    def fetch_best_solution(self, instance_id: str, timeout: float | None = None) -> dict | None:
+        # With a timeout, the pull is a poll bounded by it.
+        with span("pull"):
+            response = self._request("GET", f"/api/instances/{instance_id}/best_solution/", poll_timeout=timeout)
 
         if response.status_code == 404:
             logger.info(f"No solution found for instance {instance_id}")
@@ -126,4 +491,157 @@ class APIClient:
             logger.warning(f"Solution Pull failed. Data: {data}")
             return None
 
-        return convert_from_json(data["content"], solution_type)
+        return data
+
+    def fetch_best_algorithm(self) -> dict | None:
+        # The best algorithm algobench evolved for the problem: the source of the problem file in "code", with the
+        # evolved algorithm function named "algorithm_function_name".
+        problem_id = self.problem_id
+        if problem_id is None:
+            return None
+        response = self._request("GET", f"/api/problems/{problem_id}/best_algorithm/")
+
+        if response.status_code == 404:
+            logger.info(f"No evolved algorithm found for problem {problem_id}")
+            return None
+        elif response.status_code != 200:
+            logger.warning(f"Algorithm Pull failed. Status code: {response.status_code}. {response.text}")
+            return None
+
+        data = response.json()
+        if "code" not in data or "algorithm_function_name" not in data:
+            logger.warning(f"Algorithm Pull failed. Data: {data}")
+            return None
+        return data
+
+    def wait_for_solution(
+        self,
+        instance_id: str,
+        solution_type: type,
+        accept: Callable[[object], bool],
+        timeout: float,
+        poll_interval: float = 0.1,
+        max_poll_interval: float = 2.0,
+        backoff: float = 1.5,
+        stop: threading.Event | None = None,
+        with_record: bool = False,
+    ) -> object | None:
+        # Polls the best solution until accept() returns True for one of them, the timeout expires or stop is set.
+        # The server solution is pulled at least once, and unchanged solutions are not passed to accept() twice.
+        # With with_record, accept() also receives the solution record as returned by the server.
+        poll = SolutionPoll(solution_type, accept, timeout, poll_interval, max_poll_interval, backoff, with_record)
+        while True:
+            if poll.offer(self.fetch_best_solution(instance_id, timeout=poll.remaining())):
+                return poll.solution
+            pause = poll.pause(stop is not None and stop.is_set())
+            if pause is None:
+                return None
+            if stop is None:
+                time.sleep(pause)
+            elif stop.wait(pause):
+                return None
+
+
+class SolutionPoll:
+    # State of one wait_for_solution call, shared by the sync and the async client, which only differ in how
+    # they fetch and pause.
+
+    def __init__(
+        self,
+        solution_type: type,
+        accept: Callable[[object], bool],
+        timeout: float,
+        poll_interval: float,
+        max_poll_interval: float,
+        backoff: float,
+        with_record: bool,
+    ):
+        self.solution_type = solution_type
+        self.accept = accept
+        self.deadline = time.monotonic() + timeout
+        self.interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.backoff = backoff
+        self.with_record = with_record
+        self.solution = None
+        self._last_solution_id = None
+
+    def remaining(self) -> float:
+        return self.deadline - time.monotonic()
+
+    def offer(self, data: dict | None) -> bool:
+        # Returns whether accept() took the fetched solution, which is then kept in solution.
+        if data is None or (data.get("id") is not None and data.get("id") == self._last_solution_id):
+            return False
+        self._last_solution_id = data.get("id")
+        with span("deserialize"):
+            solution = convert_from_json(data["content"], self.solution_type)
+        if not (self.accept(solution, data) if self.with_record else self.accept(solution)):
+            return False
+        self.solution = solution
+        return True
+
+    def pause(self, stopped: bool) -> float | None:
+        # Seconds to wait before the next fetch, or None if polling is over.
+        remaining = self.remaining()
+        if remaining <= 0 or stopped:
+            return None
+        pause = min(self.interval, remaining)
+        self.interval = min(self.interval * self.backoff, self.max_poll_interval)
+        return pause
+
+
+class AsyncAPIClient:
+    # Awaitable counterpart of APIClient. Requests run on the default executor over the pooled session
+    # of the wrapped client, so they never block the event loop.
+
+    def __init__(self, api_client: APIClient):
+        self.api_client = api_client
+
+    async def login(self) -> bool:
+        return await asyncio.to_thread(self.api_client.login)
+
+    async def upload_instance(self, instance) -> str | None:
+        return await asyncio.to_thread(self.api_client.upload_instance, instance)
+
+    async def upload_solution(self, solution, instance_id: str, feasible: bool, score: float) -> str | None:
+        return await asyncio.to_thread(self.api_client.upload_solution, solution, instance_id, feasible, score)
+
+    async def upload_problem(self, algorithm_function, feasibility, scoring, is_minimization: bool):
+        return await asyncio.to_thread(
+            self.api_client.upload_problem, algorithm_function, feasibility, scoring, is_minimization
+        )
+
+    async def pull_solution(self, instance_id: str, solution_type: type) -> object | None:
+        return await asyncio.to_thread(self.api_client.pull_solution, instance_id, solution_type)
+
+    async def fetch_best_solution(self, instance_id: str, timeout: float | None = None) -> dict | None:
+        return await asyncio.to_thread(self.api_client.fetch_best_solution, instance_id, timeout)
+
+    async def wait_for_solution(
+        self,
+        instance_id: str,
+        solution_type: type,
+        accept: Callable[[object], bool],
+        timeout: float,
+        poll_interval: float = 0.1,
+        max_poll_interval: float = 2.0,
+        backoff: float = 1.5,
+        stop: asyncio.Event | None = None,
+        with_record: bool = False,
+    ) -> object | None:
+        poll = SolutionPoll(solution_type, accept, timeout, poll_interval, max_poll_interval, backoff, with_record)
+        while True:
+            if poll.offer(await self.fetch_best_solution(instance_id, timeout=poll.remaining())):
+                return poll.solution
+            pause = poll.pause(stop is not None and stop.is_set())
+            if pause is None:
+                return None
+            if stop is None:
+                await asyncio.sleep(pause)
+            else:
+                try:
+                    await asyncio.wait_for(stop.wait(), pause)
+                    return None
+                except asyncio.TimeoutError:
+                    pass
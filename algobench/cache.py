@@ -0,0 +1,126 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+
+from .forking import reinit_after_fork
+
+logger = logging.getLogger(__name__)
+
+
+def default_cache_dir() -> str:
+    return os.getenv("ALGOBENCH_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "algobench"))
+
+
+def open_disk_cache(file_name: str, **kwargs) -> "DiskCache | None":
+    try:
+        return DiskCache(os.path.join(default_cache_dir(), file_name), **kwargs)
+    except (OSError, sqlite3.Error) as e:
+        logger.warning(f"Could not open cache {file_name}: {e}")
+        return None
+
+
+class DiskCache:
+    # Persistent key/value store on sqlite with least-recently-used eviction and an optional time to live.
+    # The file can be shared by several processes; within a process the connection is guarded by a lock.
+
+    def __init__(self, path: str, max_entries: int = 10000, ttl_seconds: float | None = None):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection = self._connect()
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS entries "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+        reinit_after_fork(self)
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        return connection
+
+    def _after_fork(self):
+        # sqlite connections must not be used across a fork, so the child opens its own.
+        self._lock = threading.Lock()
+        self._connection = self._connect()
+
+    def get(self, key: str) -> str | None:
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute("SELECT value, created FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            value, created = row
+            if self.ttl_seconds is not None and now - created > self.ttl_seconds:
+                self._connection.execute("DELETE FROM entries WHERE key = ?", (key,))
+                return None
+            self._connection.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+            return value
+
+    def set(self, key: str, value: str):
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO entries (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            self._evict()
+
+    def delete(self, key: str):
+        with self._lock:
+            self._connection.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def _evict(self):
+        if self.ttl_seconds is not None:
+            self._connection.execute("DELETE FROM entries WHERE created < ?", (time.time() - self.ttl_seconds,))
+        count = self._connection.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        if count > self.max_entries:
+            self._connection.execute(
+                "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY accessed LIMIT ?)",
+                (count - self.max_entries,),
+            )
+
+
+@dataclass
+class CachedSolution:
+    instance_id: str | None
+    content: str
+    feasible: bool
+    score: float
+    updated: float = field(default_factory=time.time)
+
+
+class SolutionCache:
+    # Best known solution per instance hash. Entries older than stale_after are still served,
+    # but callers are expected to refresh them from the server.
+
+    def __init__(self, store: DiskCache, stale_after: float = 300.0):
+        self.stale_after = stale_after
+        self._store = store
+
+    def get(self, key: str) -> CachedSolution | None:
+        value = self._store.get(key)
+        if value is None:
+            return None
+        return CachedSolution(**json.loads(value))
+
+    def put(self, key: str, cached_solution: CachedSolution):
+        self._store.set(key, json.dumps(asdict(cached_solution)))
+
+    def is_stale(self, cached_solution: CachedSolution) -> bool:
+        return time.time() - cached_solution.updated > self.stale_after
@@ -0,0 +1,654 @@
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import Executor, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable
+
+from .api_client import APIClient, AsyncAPIClient
+from .cache import CachedSolution, SolutionCache
+from .delta import DeltaEncoder
+from .evaluation import Evaluator
+from .evolved import EvolvedAlgorithms
+from .file_handling import content_hash, convert_from_json, convert_to_json
+from .forking import ForkSafeExecutor
+from .improvement import CandidateAcceptor, ImprovementWait, Objective, ScoreTrust, best_solution
+from .instrumentation import bind_context, count, span
+from .policy import UploadCall, UploadPolicy
+from .progress import reporting
+from .spool import SpoolUploader
+from .uploader import BackgroundUploader, resolved_future
+from .validation import validate_input
+from .wait_budget import WaitBudget
+
+logger = logging.getLogger(__name__)
+
+# The steps of a call to a decorated function are generators, which are written once for regular and async
+# functions. A step yields whatever it waits for, e.g. an upload, and gets back its result: SyncCallFlow blocks
+# until it is there, AsyncCallFlow awaits it. Solutions are passed around as (solution, feasible, score).
+
+
+@dataclass
+class CallFlow:
+    algorithm_function: Callable
+    name: str
+    api_client: APIClient
+    evaluator: Evaluator
+    objective: Objective
+    trust: ScoreTrust
+    solution_type: type | None
+    registered: threading.Event
+    uploader: BackgroundUploader | SpoolUploader | None = None
+    policy: UploadPolicy | None = None
+    is_generator: bool = False
+    race: bool = False
+    additional_wait_seconds: float = 0
+    poll_interval: float = 0.1
+    checkpoint_every: int = 10
+    time_limit: float | None = None
+    evaluation_executor: Executor | None = None
+    evaluation_grace_seconds: float = 5.0
+    wait_budget: WaitBudget | None = None
+    evolved: EvolvedAlgorithms | None = None
+    solution_cache: SolutionCache | None = None
+
+    def __post_init__(self):
+        self.upload_after_solve = self.policy is not None and self.policy.waits_for_solve
+        self.progress_executor = (
+            ForkSafeExecutor(lambda: ThreadPoolExecutor(max_workers=1, thread_name_prefix="algobench-progress"))
+            if self.uploader is None
+            else None
+        )
+        self.evolved_executor = (
+            ForkSafeExecutor(lambda: ThreadPoolExecutor(thread_name_prefix="algobench-evolved-race"))
+            if self.evolved is not None and self.evolved.race
+            else None
+        )
+        self._refreshing = set()
+        self._refreshing_lock = threading.Lock()
+
+    # What the steps wait for. Each returns the result in SyncCallFlow and an awaitable of it in AsyncCallFlow.
+
+    @property
+    def client(self):
+        raise NotImplementedError
+
+    def result(self, future):
+        raise NotImplementedError
+
+    def settled(self, future: Future, timeout: float):
+        raise NotImplementedError
+
+    def run_algorithm(self, args, kwargs):
+        raise NotImplementedError
+
+    def settle(self, acceptor: CandidateAcceptor):
+        raise NotImplementedError
+
+    # How steps run concurrently with the call.
+
+    def run(self, steps):
+        raise NotImplementedError
+
+    def start(self, steps):
+        # Runs steps next to the call and returns a future of their result.
+        raise NotImplementedError
+
+    def detach(self, steps):
+        # Runs steps in the background without the call waiting for them.
+        raise NotImplementedError
+
+    def event(self):
+        raise NotImplementedError
+
+    def stop_setter(self, stop) -> Callable[[], None]:
+        # Candidate checks finish on pool threads.
+        raise NotImplementedError
+
+    # Steps of a call.
+
+    def solve(self, args, kwargs):
+        # Cached solutions are returned even while uploads are disabled.
+        enabled = self.uploads_enabled()
+        if not enabled and self.solution_cache is None:
+            return (yield from self.run_locally(args, kwargs))
+
+        try:
+            instance, cache_key, solution, skip = self.prepare_call(args, kwargs, enabled)
+            if solution is not None:
+                return solution
+            instance_future = None if skip or self.upload_after_solve else (yield from self.upload_instance(instance))
+        except Exception as e:
+            logger.warning(f"Uploading instance failed: {e}")
+            return (yield from self.run_locally(args, kwargs))
+
+        if skip:
+            return (yield from self.run_locally(args, kwargs))
+        with self.evaluator.call(instance):
+            if self.upload_after_solve:
+                instance_future, best = yield from self.solve_before_upload(instance, args, kwargs)
+                if instance_future is not None:
+                    best = yield from self.wait_for_improvement(instance, instance_future, best)
+            elif self.race:
+                best = yield from self.race_solve(instance, instance_future, args, kwargs)
+            else:
+                best = yield from self.solve_and_improve(instance, instance_future, args, kwargs)
+        self.remember(cache_key, instance_future, best)
+        return best[0]
+
+    def run_locally(self, args, kwargs):
+        if self.is_generator:
+            return self.iterate_solutions(validate_input(args, kwargs), None, args, kwargs)[0]
+        return (yield self.run_algorithm(args, kwargs))
+
+    def call_algorithm(self, report, args, kwargs):
+        with reporting(report), span("solve"):
+            return (yield self.run_algorithm(args, kwargs))
+
+    def solve_and_improve(self, instance, instance_future, args, kwargs):
+        best = yield from self.solve_and_upload(instance, instance_future, args, kwargs)
+        if best[2] is None:
+            return best
+        return (yield from self.wait_for_improvement(instance, instance_future, best))
+
+    def solve_and_upload(self, instance, instance_future, args, kwargs):
+        # Returns the best local solution, which only has a score if it was uploaded.
+        if self.is_generator:
+            return self.iterate_solutions(instance, instance_future, args, kwargs)
+        report, final_delta = self.progress_reporter(instance, instance_future)
+        solution = yield from self.call_algorithm(report, args, kwargs)
+
+        try:
+            feasible, score = yield from self.evaluate_and_upload(instance, instance_future, solution, final_delta())
+        except Exception as e:
+            logger.warning(f"Uploading solution failed: {e}")
+            return solution, False, None
+        return solution, feasible, score
+
+    def wait_for_improvement(self, instance, instance_future, best):
+        wait = ImprovementWait(instance, self.wait_budget, self.additional_wait_seconds)
+        if self.uploader is not None and not wait.seconds:
+            return best
+        if not self.worth_waiting(instance_future):
+            return best
+
+        try:
+            instance_id = yield from self.resolve_instance_id(instance_future, wait.seconds)
+            improved = yield from self.improve(
+                instance, instance_id, type(best[0]), best, wait.remaining(), improvements=wait.improvements
+            )
+            wait.learn(self.objective, instance_id, best)
+            return improved
+        except Exception as e:
+            logger.warning(f"Improving solution failed: {e}")
+        return best
+
+    def solve_before_upload(self, instance, args, kwargs):
+        # The policy needs the duration of the local solve, so the instance and the solution are uploaded after
+        # it, if at all. Progress reported during the solve is not uploaded. Returns no instance future when
+        # nothing was uploaded.
+        call = UploadCall(instance)
+        started = time.perf_counter()
+        if self.is_generator:
+            best = self.iterate_solutions(instance, None, args, kwargs)
+        else:
+            best = ((yield from self.call_algorithm(None, args, kwargs)), False, None)
+        call.duration = time.perf_counter() - started
+        if not self.upload_allowed(call):
+            return None, best
+
+        try:
+            instance_future = yield from self.upload_instance(instance)
+            if not self.is_generator:
+                best = (best[0], *(yield from self.evaluate_and_upload(instance, instance_future, best[0])))
+            elif best[2] is not None:
+                yield from self.upload_solution(instance_future, *best)
+        except Exception as e:
+            logger.warning(f"Uploading solution failed: {e}")
+            return None, best
+        return instance_future, best
+
+    def race_solve(self, instance, instance_future, args, kwargs):
+        # The local solve runs next to the call while it polls for server solutions. additional_wait_seconds is
+        # the wall-clock budget from the start of the call.
+        deadline = time.monotonic() + self.additional_wait_seconds
+        report, final_delta = self.progress_reporter(instance, instance_future)
+        local = self.start(self.call_algorithm(report, args, kwargs))
+        stop_polling = self.event()
+        local.add_done_callback(lambda done: stop_polling.set())
+
+        server_best = (None, False, None)
+        instance_id = None
+        if self.worth_waiting(instance_future):
+            instance_id = yield from self.resolve_instance_id(instance_future, deadline - time.monotonic())
+        if instance_id is not None:
+            try:
+                server_best = yield from self.improve(
+                    instance,
+                    instance_id,
+                    self.solution_type,
+                    server_best,
+                    deadline - time.monotonic(),
+                    first_improvement=False,
+                    stop=stop_polling,
+                )
+            except Exception as e:
+                logger.warning(f"Polling for solutions failed: {e}")
+
+        if not local.done() and self.objective.server_wins_race(server_best, deadline):
+            logger.info("Server solution arrived before the local solve finished.")
+            local.add_done_callback(
+                lambda done: self.detach(self.upload_late_solution(instance, instance_future, done, final_delta()))
+            )
+            return server_best
+
+        solution = yield self.result(local)
+        try:
+            feasible, score = yield from self.evaluate_and_upload(instance, instance_future, solution, final_delta())
+        except Exception as e:
+            logger.warning(f"Uploading solution failed: {e}")
+            return self.objective.better_of((solution, False, None), server_best)
+
+        best = self.objective.better_of((solution, feasible, score), server_best)
+        try:
+            return (yield from self.improve(instance, instance_id, type(solution), best, deadline - time.monotonic()))
+        except Exception as e:
+            logger.warning(f"Improving solution failed: {e}")
+        return best
+
+    def upload_late_solution(self, instance, instance_future, local, delta):
+        try:
+            yield from self.evaluate_and_upload(instance, instance_future, local.result(), delta)
+        except Exception as e:
+            logger.warning(f"Uploading solution failed: {e}")
+
+    def resolve_instance_id(self, instance_future, timeout):
+        # The wait is cut short when algobench becomes unreachable while the instance is still being shipped.
+        deadline = time.monotonic() + timeout
+        while not (yield self.settled(instance_future, max(0.0, min(deadline - time.monotonic(), 0.1)))):
+            if time.monotonic() >= deadline or not self.worth_waiting(instance_future):
+                logger.info("Instance upload did not finish in time. Skipping solution improvement.")
+                return None
+        return instance_future.result()
+
+    def improve(
+        self, instance, instance_id, solution_type, best, timeout, first_improvement=True, stop=None, improvements=None
+    ):
+        if self.objective.skip_improvement(instance_id, best):
+            return best
+        if self.evaluation_executor is not None and stop is None:
+            stop = self.event()
+        acceptor = CandidateAcceptor(
+            instance,
+            best,
+            self.objective,
+            self.evaluator,
+            self.trust,
+            self.evaluation_executor,
+            first_improvement,
+            self.stop_setter(stop) if stop is not None else None,
+            improvements,
+        )
+        with span("wait"):
+            try:
+                yield self.client.wait_for_solution(
+                    instance_id,
+                    solution_type,
+                    acceptor.accept,
+                    timeout,
+                    poll_interval=self.poll_interval,
+                    stop=stop,
+                    with_record=self.trust.with_record,
+                )
+            finally:
+                if self.evaluation_executor is not None:
+                    yield self.settle(acceptor)
+        return acceptor.best
+
+    def upload_instance(self, instance):
+        with span("upload_instance"):
+            if self.uploader is not None:
+                return self.uploader.submit_instance(instance)
+            return resolved_future((yield self.client.upload_instance(instance)))
+
+    def evaluate_and_upload(self, instance, instance_future, solution, delta=None):
+        feasible, score = self.evaluator.evaluate(instance, solution)
+        yield from self.upload_solution(instance_future, solution, feasible, score, delta)
+        return feasible, score
+
+    def upload_solution(self, instance_future, solution, feasible, score, delta=None):
+        with span("upload_solution"):
+            if delta is not None:
+                future = self.upload_progress(instance_future, solution, feasible, score, delta)
+                if self.uploader is None:
+                    yield self.result(future)
+            elif self.uploader is not None:
+                self.uploader.submit_solution(solution, instance_future, feasible, score)
+            else:
+                yield self.client.upload_solution(solution, instance_future.result(), feasible, score)
+
+    def refresh_cached_solution(self, instance, cache_key, cached, solution):
+        try:
+            best = yield from self.improve(
+                instance, cached.instance_id, self.solution_type, (solution, cached.feasible, cached.score), 0
+            )
+            self.remember(cache_key, resolved_future(cached.instance_id), best)
+        except Exception as e:
+            logger.warning(f"Refreshing cached solution failed: {e}")
+        finally:
+            with self._refreshing_lock:
+                self._refreshing.discard(cache_key)
+
+    # Decisions that do not wait.
+
+    def uploads_enabled(self) -> bool:
+        # While the circuit to algobench is open, calls skip it entirely. The spool does not need the server.
+        return isinstance(self.uploader, SpoolUploader) or (self.registered.is_set() and self.api_client.reachable())
+
+    def worth_waiting(self, instance_future) -> bool:
+        # Outages must not slow calls down: while the circuit is open, or not closed with the instance still
+        # waiting to be shipped, the local solution is returned right away.
+        if not self.api_client.reachable():
+            return False
+        return instance_future.done() or self.api_client.circuit_breaker.state == "closed"
+
+    def upload_allowed(self, call: UploadCall) -> bool:
+        try:
+            allowed = self.policy(call)
+        except Exception as e:
+            logger.warning(f"Upload policy failed: {e}")
+            allowed = False
+        if not allowed:
+            count("policy_skips")
+        return allowed
+
+    def skipped_by_policy(self, instance) -> bool:
+        # Policies that do not need the local solve decide before anything is uploaded.
+        return self.policy is not None and not self.upload_after_solve and not self.upload_allowed(UploadCall(instance))
+
+    def prepare_call(self, args, kwargs, enabled):
+        # Returns the instance of a call, its solution cache key, the cached solution if there is one, and
+        # otherwise whether the call skips algobench. Nothing is uploaded yet.
+        instance = validate_input(args, kwargs)
+        cache_key = self.solution_cache_key(instance)
+        solution = self.cached_solution(instance, cache_key)
+        skip = solution is None and (not enabled or self.skipped_by_policy(instance))
+        return instance, cache_key, solution, skip
+
+    def upload_progress(self, instance_future, solution, feasible, score, delta) -> Future:
+        # Progress is shipped in order by a single worker, so every diff is uploaded after its base.
+        if self.uploader is not None:
+            return self.uploader.submit_solution(solution, instance_future, feasible, score, delta=delta)
+        content = self.api_client.serialize(solution, stream=False)
+        return self.progress_executor.submit(
+            lambda: delta.upload(self.api_client, content, instance_future.result(), feasible, score)
+        )
+
+    def progress_reporter(self, instance, instance_future):
+        # Solutions passed to report_progress during a call are uploaded when they improve on the
+        # previously reported one, as diffs against it. The final solution of the call is diffed
+        # against the reported ones through final_delta().
+        delta = DeltaEncoder(self.checkpoint_every)
+        last = []
+
+        def report(solution):
+            try:
+                feasible, score = self.evaluator.evaluate(instance, solution)
+                if last and not (feasible and self.objective.is_better(score, last[1], last[0])):
+                    return
+                last[:] = [feasible, score]
+                self.upload_progress(instance_future, solution, feasible, score, delta)
+            except Exception as e:
+                logger.warning(f"Reporting progress failed: {e}")
+
+        def final_delta():
+            return delta if last else None
+
+        return report, final_delta
+
+    def iterate_solutions(self, instance, instance_future, args, kwargs):
+        # Consumes a generator algorithm until it is exhausted, yields a feasible solution reaching target_score
+        # or time_limit has passed. Improving solutions are uploaded in the background as they are yielded, as
+        # diffs only if the server advertised them; without the background uploader the upload of the best one is
+        # awaited like a regular solution upload.
+        delta = DeltaEncoder(self.checkpoint_every)
+        uploads = []
+
+        def upload(solution, feasible, score):
+            if instance_future is None or score is None:
+                return
+            try:
+                uploads[:] = [self.upload_progress(instance_future, solution, feasible, score, delta)]
+            except Exception as e:
+                logger.warning(f"Uploading solution failed: {e}")
+
+        solutions = self.algorithm_function(*args, **kwargs)
+        best = best_solution(solutions, instance, self.evaluator, self.objective, self.time_limit, upload)
+        if uploads and self.uploader is None:
+            try:
+                uploads[0].result()
+            except Exception as e:
+                logger.warning(f"Uploading solution failed: {e}")
+        return best
+
+    def solution_cache_key(self, instance):
+        if self.solution_cache is None:
+            return None
+        return f"{self.api_client.algobench_url}:{self.name}:{content_hash(convert_to_json(instance))}"
+
+    def cached_solution(self, instance, cache_key):
+        if cache_key is None:
+            return None
+        try:
+            cached = self.solution_cache.get(cache_key)
+            if cached is None:
+                return None
+            solution = convert_from_json(cached.content, self.solution_type)
+            count("solution_cache_hits")
+        except Exception as e:
+            logger.warning(f"Reading cached solution failed: {e}")
+            return None
+
+        if self.solution_cache.is_stale(cached) and cached.instance_id is not None:
+            with self._refreshing_lock:
+                if cache_key in self._refreshing:
+                    return solution
+                self._refreshing.add(cache_key)
+            self.detach(self.refresh_cached_solution(instance, cache_key, cached, solution))
+        return solution
+
+    def remember(self, cache_key, instance_future, best):
+        solution, feasible, score = best
+        if cache_key is None or not feasible:
+            return
+        try:
+            instance_id = instance_future.result() if instance_future is not None and instance_future.done() else None
+            self.solution_cache.put(cache_key, CachedSolution(instance_id, convert_to_json(solution), feasible, score))
+        except Exception as e:
+            logger.warning(f"Caching solution failed: {e}")
+
+
+class SyncCallFlow(CallFlow):
+    # Runs the steps of regular and generator functions, blocking for everything they wait for. The local solve
+    # of a race runs on a worker thread.
+
+    def __post_init__(self):
+        super().__post_init__()
+        self.race_executor = (
+            ForkSafeExecutor(lambda: ThreadPoolExecutor(thread_name_prefix="algobench-race")) if self.race else None
+        )
+        self.background_executor = ForkSafeExecutor(
+            lambda: ThreadPoolExecutor(thread_name_prefix="algobench-background")
+        )
+
+    @property
+    def client(self):
+        return self.api_client
+
+    def result(self, future):
+        return future.result()
+
+    def settled(self, future: Future, timeout: float) -> bool:
+        return not wait([future], timeout=timeout).not_done
+
+    def run_algorithm(self, args, kwargs):
+        if self.evolved is None or not self.evolved.available():
+            return self.algorithm_function(*args, **kwargs)
+        try:
+            instance = validate_input(args, kwargs)
+        except Exception:
+            return self.algorithm_function(*args, **kwargs)
+        if self.evolved_executor is not None:
+            return self.race_evolved(instance, args, kwargs)
+        try:
+            return self.evolved.solve(instance)
+        except Exception as e:
+            logger.warning(f"Evolved algorithm failed: {e}. Running the original algorithm.")
+        return self.algorithm_function(*args, **kwargs)
+
+    def race_evolved(self, instance, args, kwargs):
+        # The evolved algorithm runs in its own process while this thread runs the original one; the better
+        # feasible solution is returned.
+        evolved_future = self.evolved_executor.submit(bind_context(self.evolved.solve), instance)
+        solution = self.algorithm_function(*args, **kwargs)
+        try:
+            evolved_solution = evolved_future.result()
+            feasible, score = self.evaluator.evaluate(instance, solution)
+            evolved_feasible, evolved_score = self.evaluator.evaluate(instance, evolved_solution)
+        except Exception as e:
+            logger.warning(f"Evolved algorithm failed: {e}")
+            return solution
+        if evolved_feasible and self.objective.is_better(evolved_score, score, feasible):
+            count("evolved_wins")
+            return evolved_solution
+        return solution
+
+    def settle(self, acceptor: CandidateAcceptor):
+        acceptor.settle(self.evaluation_grace_seconds)
+
+    def run(self, steps):
+        # Everything the steps yield has already been waited for.
+        value = None
+        while True:
+            try:
+                value = steps.send(value)
+            except StopIteration as done:
+                return done.value
+
+    def start(self, steps) -> Future:
+        return self.race_executor.submit(bind_context(self.run), steps)
+
+    def detach(self, steps):
+        self.background_executor.submit(self.run, steps)
+
+    def event(self):
+        return threading.Event()
+
+    def stop_setter(self, stop) -> Callable[[], None]:
+        return stop.set
+
+    def batch(self, instances, max_workers: int | None = None) -> list:
+        # Solves and uploads all instances on a thread pool, then waits once for the whole batch
+        # and pulls the best server solutions concurrently. Results are returned in input order.
+        instances = list(instances)
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="algobench-batch") as executor:
+            count("instances", len(instances))
+            solved = list(executor.map(bind_context(lambda instance: self.run(self.batch_solve(instance))), instances))
+            deadline = time.monotonic() + self.additional_wait_seconds
+
+            def improve_solved(instance, solved_instance):
+                return self.run(self.improve_solved(instance, solved_instance, deadline))
+
+            return list(executor.map(bind_context(improve_solved), instances, solved))
+
+    def batch_solve(self, instance):
+        # Returns the solution cache key of instance, its instance future, the local solution, and the best
+        # solution if it was uploaded and can be improved.
+        cache_key = self.solution_cache_key(instance)
+        solution = self.cached_solution(instance, cache_key)
+        if solution is not None:
+            return None, None, solution, None
+        if not self.uploads_enabled() or self.skipped_by_policy(instance):
+            return None, None, (yield from self.run_locally((instance,), {})), None
+        if self.upload_after_solve:
+            instance_future, best = yield from self.solve_before_upload(instance, (instance,), {})
+            uploaded = instance_future is not None and best[2] is not None
+            return cache_key, instance_future, best[0], best if uploaded else None
+
+        try:
+            instance_future = yield from self.upload_instance(instance)
+        except Exception as e:
+            logger.warning(f"Uploading instance failed: {e}")
+            instance_future = resolved_future(None)
+        best = yield from self.solve_and_upload(instance, instance_future, (instance,), {})
+        return cache_key, instance_future, best[0], best if best[2] is not None else None
+
+    def improve_solved(self, instance, solved_instance, deadline):
+        cache_key, instance_future, solution, best = solved_instance
+        if best is None:
+            return solution
+        if (self.uploader is None or self.additional_wait_seconds) and self.worth_waiting(instance_future):
+            try:
+                instance_id = yield from self.resolve_instance_id(instance_future, deadline - time.monotonic())
+                best = yield from self.improve(instance, instance_id, type(solution), best, deadline - time.monotonic())
+            except Exception as e:
+                logger.warning(f"Improving solution failed: {e}")
+        self.remember(cache_key, instance_future, best)
+        return best[0]
+
+
+class AsyncCallFlow(CallFlow):
+    # Runs the steps of async functions, awaiting everything they wait for, so many calls can run concurrently on
+    # one event loop. The local solve of a race runs as a task.
+
+    def __post_init__(self):
+        super().__post_init__()
+        self.async_client = AsyncAPIClient(self.api_client)
+        self._detached = set()
+
+    @property
+    def client(self):
+        return self.async_client
+
+    def result(self, future):
+        return asyncio.wrap_future(future)
+
+    async def settled(self, future: Future, timeout: float) -> bool:
+        # asyncio.wait does not cancel the wrapped future when the timeout expires.
+        done, _ = await asyncio.wait({asyncio.wrap_future(future)}, timeout=timeout)
+        return bool(done)
+
+    def run_algorithm(self, args, kwargs):
+        return self.algorithm_function(*args, **kwargs)
+
+    def settle(self, acceptor: CandidateAcceptor):
+        return asyncio.to_thread(acceptor.settle, self.evaluation_grace_seconds)
+
+    async def run(self, steps):
+        value, error = None, None
+        while True:
+            try:
+                awaitable = steps.send(value) if error is None else steps.throw(error)
+            except StopIteration as done:
+                return done.value
+            try:
+                value, error = await awaitable, None
+            except BaseException as e:
+                # Also cancellations, so that the steps can clean up.
+                value, error = None, e
+
+    def start(self, steps) -> asyncio.Task:
+        return asyncio.ensure_future(self.run(steps))
+
+    def detach(self, steps):
+        task = asyncio.ensure_future(self.run(steps))
+        self._detached.add(task)
+        task.add_done_callback(self._detached.discard)
+
+    def event(self):
+        return asyncio.Event()
+
+    def stop_setter(self, stop) -> Callable[[], None]:
+        loop = asyncio.get_running_loop()
+        return lambda: loop.call_soon_threadsafe(stop.set)
@@ -0,0 +1,155 @@
+import logging
+import re
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from typing import Callable
+
+import requests
+
+from .forking import reinit_after_fork
+from .instrumentation import count, percentile
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    # Raised instead of sending a request while the circuit is open, so it is handled like an unreachable server.
+    pass
+
+
+def endpoint_key(method: str, path: str) -> str:
+    # Requests to the same endpoint share statistics, whatever object id is in their path.
+    return method + " " + re.sub(r"^/api/(\w+)/[^/]+/", r"/api/\1/{id}/", path)
+
+
+class CircuitBreaker:
+    # Stops requests to algobench after failure_threshold consecutive failures (connection errors, timeouts,
+    # 5xx and 429 responses), or when the latency_percentile of the last latencies exceeds latency_budget seconds.
+    # After reset_timeout seconds, up to half_open_probes requests are let through: a success closes the circuit,
+    # a failure opens it again. Share one breaker between clients to trip them together.
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        latency_budget: float | None = None,
+        latency_percentile: float = 0.9,
+        window: int = 50,
+        half_open_probes: int = 1,
+        listeners: list[Callable[[str, str, str], None]] | None = None,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.latency_budget = latency_budget
+        self.latency_percentile = latency_percentile
+        self.window = window
+        self.half_open_probes = half_open_probes
+        self.listeners = list(listeners or [])
+        self.state = "closed"
+        self.transitions = Counter()
+        self.rejections = 0
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self._latencies = deque(maxlen=window)
+        # Reentrant, so that listeners can call stats().
+        self._lock = threading.RLock()
+        reinit_after_fork(self)
+
+    def _after_fork(self):
+        self._lock = threading.RLock()
+
+    def is_open(self) -> bool:
+        # True while requests are rejected without a probe being due.
+        return self.state == "open" and time.monotonic() < self._opened_at + self.reset_timeout
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "open" and time.monotonic() >= self._opened_at + self.reset_timeout:
+                self._transition("half_open", "reset timeout passed")
+            if self.state == "closed" or (self.state == "half_open" and self._probes < self.half_open_probes):
+                if self.state == "half_open":
+                    self._probes += 1
+                return True
+            self.rejections += 1
+        count("circuit_rejections")
+        return False
+
+    def record_success(self, latency: float):
+        with self._lock:
+            self._failures = 0
+            if self.state == "half_open":
+                self._transition("closed", "probe succeeded")
+                return
+            self._latencies.append(latency)
+            if self.latency_budget is None or len(self._latencies) < self.window:
+                return
+            observed = percentile(sorted(self._latencies), self.latency_percentile)
+            if observed > self.latency_budget:
+                self._transition("open", f"p{self.latency_percentile * 100:g} latency {observed:.2f}s over budget")
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == "half_open":
+                self._transition("open", "probe failed")
+            elif self.state == "closed" and self._failures >= self.failure_threshold:
+                self._transition("open", f"{self._failures} consecutive failures")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"state": self.state, "transitions": dict(self.transitions), "rejections": self.rejections}
+
+    def _transition(self, state: str, reason: str):
+        previous, self.state = self.state, state
+        self.transitions[f"{previous}->{state}"] += 1
+        self._probes = 0
+        if state == "open":
+            self._opened_at = time.monotonic()
+            self._latencies.clear()
+            logger.warning(f"Circuit to algobench opened: {reason}. Skipping algobench for {self.reset_timeout}s.")
+        else:
+            logger.info(f"Circuit to algobench {state}: {reason}.")
+        count(f"circuit_{state}")
+        for listener in self.listeners:
+            try:
+                listener(previous, state, reason)
+            except Exception as e:
+                logger.warning(f"Circuit breaker listener failed: {e}")
+
+
+class AdaptiveTimeouts:
+    # Read timeout per endpoint of multiplier times the latency_percentile of its recent latencies, between
+    # min_timeout and the client's read timeout. Endpoints with fewer than min_samples latencies get the latter.
+
+    def __init__(
+        self,
+        multiplier: float = 4.0,
+        latency_percentile: float = 0.99,
+        min_timeout: float = 2.0,
+        min_samples: int = 20,
+        window: int = 200,
+    ):
+        self.multiplier = multiplier
+        self.latency_percentile = latency_percentile
+        self.min_timeout = min_timeout
+        self.min_samples = min_samples
+        self._latencies = defaultdict(lambda: deque(maxlen=window))
+        self._lock = threading.Lock()
+        reinit_after_fork(self)
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+
+    def observe(self, endpoint: str, latency: float):
+        with self._lock:
+            self._latencies[endpoint].append(latency)
+
+    def read_timeout(self, endpoint: str, max_timeout: float) -> float:
+        with self._lock:
+            latencies = self._latencies.get(endpoint)
+            if latencies is None or len(latencies) < self.min_samples:
+                return max_timeout
+            observed = percentile(sorted(latencies), self.latency_percentile)
+        return min(max_timeout, max(self.min_timeout, self.multiplier * observed))
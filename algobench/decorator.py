@@ -1,13 +1,123 @@
+import importlib
 import logging
-from functools import wraps
-import time
+import pickle
+import sys
+import threading
+import types
+import inspect
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import update_wrapper, wraps
+from typing import Callable
 
-from .validation import validate, validate_input
-from .api_client import APIClient
+from .validation import solution_annotation, validate, validate_input
+from .api_client import APIClient, Registration, known_registrations
+from .call_flow import AsyncCallFlow, SyncCallFlow
+from .circuit_breaker import AdaptiveTimeouts, CircuitBreaker
+from .cache import SolutionCache, open_disk_cache
+from .evaluation import Evaluator
+from .evolved import EvolvedAlgorithms
+from .forking import ForkSafeExecutor
+from .improvement import Objective, ScoreTrust, best_solution
+from .instrumentation import Instrumentation, bind_context, span
+from .policy import UploadCall, UploadPolicy, as_policy
+from .spool import SpoolUploader, open_spool
+from .uploader import BackgroundUploader
+from .wait_budget import WaitBudget
 
 logger = logging.getLogger(__name__)
 
 
+class AlgorithmFunction:
+    # What algorithm() returns for regular and generator functions. It pickles as a reference to the module
+    # attribute it is bound to, so it can be sent to process pools. The problem registration travels along,
+    # and the worker process reuses it when it imports the module instead of logging in again.
+
+    def __init__(self, call, algorithm_function, api_client: APIClient | None):
+        update_wrapper(self, algorithm_function)
+        self._call = call
+        self._api_client = api_client
+
+    def __call__(self, *args, **kwargs):
+        return self._call(*args, **kwargs)
+
+    def __get__(self, obj, objtype=None):
+        # Binds like a plain function when it decorates a method.
+        if obj is None:
+            return self
+        return types.MethodType(self, obj)
+
+    def __reduce__(self):
+        module = sys.modules.get(self.__module__)
+        names = [self.__qualname__] + list(vars(module) if module is not None else [])
+        name = next((name for name in names if getattr(module, name, None) is self), None)
+        if name is None:
+            raise pickle.PicklingError(f"Can't pickle {self.__qualname__}: it is not a module attribute")
+        registration = self._api_client.registration() if self._api_client is not None else None
+        return restore_algorithm, (self.__module__, name, registration)
+
+
+def restore_algorithm(module_name: str, name: str, registration: Registration | None):
+    # The registration is known before the module is imported, so decorating the function there reuses it.
+    if registration is not None:
+        known_registrations[(registration.algobench_url, registration.env_name)] = registration
+    return getattr(importlib.import_module(module_name), name)
+
+
+def local_algorithm(
+    algorithm_function,
+    instrumentation: Instrumentation,
+    evaluator: Evaluator,
+    objective: Objective,
+    time_limit: float | None,
+    wait_budget: WaitBudget | None,
+):
+    # What algorithm() returns when algobench cannot be used: the function runs unchanged, but keeps the
+    # attributes of a decorated one, so that code using them works either way. batch solves the instances on a
+    # thread pool, and generator algorithms return their best solution within time_limit, as when decorated.
+    if inspect.iscoroutinefunction(algorithm_function):
+
+        @wraps(algorithm_function)
+        async def decorated(*args, **kwargs):
+            with instrumentation.call(), span("solve"):
+                return await algorithm_function(*args, **kwargs)
+
+    else:
+
+        def run(*args, **kwargs):
+            if not inspect.isgeneratorfunction(algorithm_function):
+                with span("solve"):
+                    return algorithm_function(*args, **kwargs)
+            try:
+                instance = validate_input(args, kwargs)
+            except Exception:
+                instance = None
+            solutions = algorithm_function(*args, **kwargs)
+            return best_solution(solutions, instance, evaluator, objective, time_limit)[0]
+
+        def call(*args, **kwargs):
+            with instrumentation.call():
+                return run(*args, **kwargs)
+
+        def batch(instances, max_workers: int | None = None) -> list:
+            with (
+                instrumentation.call("batch"),
+                ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="algobench-batch") as executor,
+            ):
+                return list(executor.map(bind_context(run), instances))
+
+        decorated = AlgorithmFunction(call, algorithm_function, None)
+        decorated.batch = batch
+    decorated.registered = threading.Event()
+    decorated.circuit_breaker = None
+    decorated.wait_budget = wait_budget
+    decorated.evolved = None
+    decorated.stats = instrumentation.stats
+    decorated.add_hook = instrumentation.add_hook
+    decorated.evaluate = evaluator.evaluate_many
+    decorated.flush = lambda timeout=None: True
+    return decorated
+
+
 def algorithm(
     name: str,
     feasibility_function: any,
@@ -15,68 +125,176 @@ def algorithm(
     api_key: str,
     is_minimization: bool,
     additional_wait_seconds: int = 0,
+    background_uploads: bool = False,
+    poll_interval: float = 0.1,
+    target_score: float | None = None,
+    race: bool = False,
+    dedup_instances: bool = False,
+    cache_solutions: bool = False,
+    lazy_registration: bool = False,
+    stream_uploads: bool = False,
+    codec: str = "json",
+    compression: str | None = None,
+    checkpoint_every: int = 10,
+    time_limit: float | None = None,
+    memoize_evaluations: bool = False,
+    batch_feasibility_function: any = None,
+    batch_scoring_function: any = None,
+    evaluation_pool: str | None = None,
+    evaluation_workers: int | None = None,
+    evaluation_grace_seconds: float = 5.0,
+    verify_server_scores: float = 1.0,
+    hooks: list | None = None,
+    per_thread_sessions: bool = False,
+    spool_uploads: bool = False,
+    circuit_breaker: CircuitBreaker | None = None,
+    adaptive_timeouts: AdaptiveTimeouts | None = None,
+    upload_policy: UploadPolicy | Callable[[UploadCall], bool] | None = None,
+    wait_budget: WaitBudget | None = None,
+    evolved: EvolvedAlgorithms | None = None,
 ):
 
     def create_decorator(algorithm_function):
-        if not validate(algorithm_function, name, feasibility_function, scoring_function, api_key):
-            logger.warning("Falling back to normal algorithm execution")
-            return algorithm_function
+        instrumentation = Instrumentation(name, hooks)
+        evaluator = Evaluator(
+            feasibility_function,
+            scoring_function,
+            batch_feasibility_function,
+            batch_scoring_function,
+            memoize=memoize_evaluations,
+        )
+        objective = Objective(is_minimization, target_score)
 
-        api_client = APIClient(api_key, name)
-        if not api_client.login():
+        def fall_back():
             logger.warning("Falling back to normal algorithm execution")
-            return algorithm_function
+            return local_algorithm(algorithm_function, instrumentation, evaluator, objective, time_limit, wait_budget)
 
-        api_client.upload_problem(algorithm_function, feasibility_function, scoring_function, is_minimization)
+        if not validate(algorithm_function, name, feasibility_function, scoring_function, api_key):
+            return fall_back()
 
-        def improve(instance, instance_id, solution, old_solution_feasible, old_score):
+        instance_cache = open_disk_cache("instances.sqlite", ttl_seconds=7 * 24 * 3600) if dedup_instances else None
+        problem_cache = open_disk_cache("problems.sqlite")
+        api_client = APIClient(
+            api_key,
+            name,
+            instance_cache=instance_cache,
+            problem_cache=problem_cache,
+            codec=codec,
+            compression=compression,
+            stream_uploads=stream_uploads,
+            per_thread_sessions=per_thread_sessions,
+            circuit_breaker=circuit_breaker if circuit_breaker is not None else CircuitBreaker(),
+            timeouts=adaptive_timeouts,
+        )
+        registered = threading.Event()
 
-            server_solution = api_client.pull_solution(instance_id, type(solution))
-            if server_solution is None:
-                return solution
+        def register() -> bool:
+            registration = known_registrations.get((api_client.algobench_url, name))
+            if registration is not None:
+                api_client.restore_registration(registration)
+            elif not api_client.login():
+                return False
+            api_client.upload_problem(algorithm_function, feasibility_function, scoring_function, is_minimization)
+            registered.set()
+            return True
+
+        def try_register() -> bool:
+            # Timeouts and an open circuit must not escape the decorator, e.g. while its module is imported.
             try:
-                if feasibility_function(instance, server_solution):
-                    new_score = scoring_function(instance, server_solution)
-                    if (
-                        (is_minimization and old_score > new_score)
-                        or (not is_minimization and old_score < new_score)
-                        or not old_solution_feasible
-                    ):
-                        logger.info(f"Improved solution found. New score: {new_score}. Old score: {old_score}")
-                        return server_solution
-                    else:
-                        return solution
+                return register()
             except Exception as e:
-                logger.warning(f"Improving solution failed: {e}")
-                return solution
+                logger.warning(f"Registering problem failed: {e}")
+                return False
 
-        @wraps(algorithm_function)
-        def wrapper(*args, **kwargs):
+        def register_in_background():
+            if not try_register():
+                logger.warning("Falling back to normal algorithm execution")
 
-            try:
-                instance = validate_input(args, kwargs)
-                instance_id = api_client.upload_instance(instance)
-            except Exception as e:
-                logger.warning(f"Uploading instance failed: {e}")
-                return algorithm_function(*args, **kwargs)
+        # With the spool, the problem is registered by its replayer, which retries until the server is reachable.
+        spool = open_spool() if spool_uploads else None
+        if spool is None and lazy_registration:
+            threading.Thread(target=register_in_background, name="algobench-registration", daemon=True).start()
+        elif spool is None and not try_register():
+            return fall_back()
 
-            solution = algorithm_function(*args, **kwargs)
+        if spool is not None:
+            uploader = SpoolUploader(api_client, spool, lambda: registered.is_set() or register())
+        else:
+            uploader = BackgroundUploader(api_client) if background_uploads else None
+        is_async = inspect.iscoroutinefunction(algorithm_function)
+        is_generator = inspect.isgeneratorfunction(algorithm_function)
+        if race and is_generator:
+            logger.warning("race is not supported for generator algorithms and is ignored")
+        solution_type = solution_annotation(algorithm_function)
+        if evolved is not None and (is_async or is_generator):
+            logger.warning("evolved is only supported for regular algorithms and is ignored")
+        evolved_algorithms = evolved if not (is_async or is_generator) else None
+        if evolved_algorithms is not None:
+            evolved_algorithms.bind(
+                api_client, open_disk_cache("algorithms.sqlite"), f"{api_client.algobench_url}:{name}", solution_type
+            )
+        if evaluation_pool == "process":
+            evaluation_executor = ForkSafeExecutor(lambda: ProcessPoolExecutor(max_workers=evaluation_workers))
+        elif evaluation_pool == "thread":
+            evaluation_executor = ForkSafeExecutor(
+                lambda: ThreadPoolExecutor(evaluation_workers, thread_name_prefix="algobench-evaluation")
+            )
+        else:
+            if evaluation_pool is not None:
+                logger.warning(f"Unknown evaluation_pool {evaluation_pool}. Evaluating in the calling thread.")
+            evaluation_executor = None
+        if wait_budget is not None:
+            wait_budget.bind(open_disk_cache("wait_budgets.sqlite"), f"{api_client.algobench_url}:{name}")
+        solution_store = open_disk_cache("solutions.sqlite") if cache_solutions else None
 
-            try:
-                feasible = feasibility_function(instance, solution)
-                score = scoring_function(instance, solution)
-                api_client.upload_solution(solution, instance_id, feasible, score)
-            except Exception as e:
-                logger.warning(f"Uploading solution failed: {e}")
+        flow = (AsyncCallFlow if is_async else SyncCallFlow)(
+            algorithm_function,
+            name,
+            api_client,
+            evaluator,
+            objective,
+            ScoreTrust(verify_server_scores),
+            solution_type,
+            registered,
+            uploader=uploader,
+            policy=as_policy(upload_policy) if upload_policy is not None else None,
+            is_generator=is_generator,
+            race=race and not is_generator,
+            additional_wait_seconds=additional_wait_seconds,
+            poll_interval=poll_interval,
+            checkpoint_every=checkpoint_every,
+            time_limit=time_limit,
+            evaluation_executor=evaluation_executor,
+            evaluation_grace_seconds=evaluation_grace_seconds,
+            wait_budget=wait_budget,
+            evolved=evolved_algorithms,
+            solution_cache=SolutionCache(solution_store) if solution_store is not None else None,
+        )
 
-            time.sleep(additional_wait_seconds)
-            try:
-                return improve(instance, instance_id, solution, feasible, score)
-            except Exception as e:
-                logger.warning(f"Improving solution failed: {e}")
+        def wrapper(*args, **kwargs):
+            with instrumentation.call():
+                return flow.run(flow.solve(args, kwargs))
+
+        @wraps(algorithm_function)
+        async def async_wrapper(*args, **kwargs):
+            with instrumentation.call():
+                return await flow.run(flow.solve(args, kwargs))
 
-            return solution
+        def batch(instances, max_workers: int | None = None) -> list:
+            with instrumentation.call("batch"):
+                return flow.batch(instances, max_workers)
 
-        return wrapper
+        decorated = async_wrapper if is_async else AlgorithmFunction(wrapper, algorithm_function, api_client)
+        decorated.registered = registered
+        decorated.circuit_breaker = api_client.circuit_breaker
+        decorated.wait_budget = wait_budget
+        decorated.evolved = evolved_algorithms
+        decorated.stats = instrumentation.stats
+        decorated.add_hook = instrumentation.add_hook
+        decorated.evaluate = evaluator.evaluate_many
+        if not is_async:
+            decorated.batch = batch
+        decorated.flush = uploader.flush if uploader is not None else lambda timeout=None: True
+        return decorated
 
     return create_decorator
@@ -0,0 +1,106 @@
+import copy
+import json
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def diff(old, new, path: str = "") -> list[dict]:
+    # JSON Patch (RFC 6902) operations that turn the JSON document old into new.
+    if isinstance(old, dict) and isinstance(new, dict):
+        operations = []
+        for key in old:
+            if key not in new:
+                operations.append({"op": "remove", "path": f"{path}/{escape(key)}"})
+        for key, value in new.items():
+            if key in old:
+                operations.extend(diff(old[key], value, f"{path}/{escape(key)}"))
+            else:
+                operations.append({"op": "add", "path": f"{path}/{escape(key)}", "value": value})
+        return operations
+    if isinstance(old, list) and isinstance(new, list):
+        operations = []
+        for index in range(min(len(old), len(new))):
+            operations.extend(diff(old[index], new[index], f"{path}/{index}"))
+        for index in range(len(old) - 1, len(new) - 1, -1):
+            operations.append({"op": "remove", "path": f"{path}/{index}"})
+        for index in range(len(old), len(new)):
+            operations.append({"op": "add", "path": f"{path}/{index}", "value": new[index]})
+        return operations
+    if type(old) is type(new) and old == new:
+        return []
+    return [{"op": "replace", "path": path, "value": new}]
+
+
+def apply_diff(document, operations: list[dict]):
+    document = copy.deepcopy(document)
+    for operation in operations:
+        keys = [unescape(key) for key in operation["path"].split("/")[1:]]
+        if not keys:
+            document = operation["value"]
+            continue
+        parent = document
+        for key in keys[:-1]:
+            parent = parent[int(key)] if isinstance(parent, list) else parent[key]
+        key = int(keys[-1]) if isinstance(parent, list) else keys[-1]
+        if operation["op"] == "remove":
+            del parent[key]
+        elif operation["op"] == "add" and isinstance(parent, list):
+            parent.insert(key, operation["value"])
+        else:
+            parent[key] = operation["value"]
+    return document
+
+
+def escape(key) -> str:
+    return str(key).replace("~", "~0").replace("/", "~1")
+
+
+def unescape(key: str) -> str:
+    return key.replace("~1", "/").replace("~0", "~")
+
+
+class DeltaEncoder:
+    # Uploads a sequence of solutions for one instance, sending each as a diff against the previously
+    # uploaded one. Every checkpoint_every uploads, and whenever the diff is not smaller, the full solution
+    # is sent instead. A solution equal to the previous one is not uploaded again. Diffs are only sent if the
+    # server advertised them at login; if it rejects one anyway, the encoder falls back to full uploads for good.
+
+    def __init__(self, checkpoint_every: int = 10):
+        self.checkpoint_every = checkpoint_every
+        self.base_id = None
+        self.enabled = True
+        self._base = None
+        self._since_checkpoint = 0
+        self._lock = threading.Lock()
+
+    def upload(self, api_client, content: str | bytes, instance_id: str, feasible: bool, score: float) -> str | None:
+        with self._lock:
+            if not isinstance(content, str):
+                return api_client.upload_solution_content(content, instance_id, feasible, score)
+
+            document = json.loads(content)
+            operations = diff(self._base, document) if self.base_id is not None else None
+            if operations == []:
+                return self.base_id
+            diffs = self.enabled and api_client.solution_diffs
+            if diffs and operations is not None and self._since_checkpoint + 1 < self.checkpoint_every:
+                delta = json.dumps(operations)
+                if len(delta) < len(content):
+                    solution_id = api_client.upload_solution_delta(delta, self.base_id, instance_id, feasible, score)
+                    if solution_id is not None:
+                        self._set_base(solution_id, document, self._since_checkpoint + 1)
+                        return solution_id
+                    logger.info("Server did not accept a solution diff. Uploading full solutions.")
+                    self.enabled = False
+
+            solution_id = api_client.upload_solution_content(content, instance_id, feasible, score)
+            if solution_id is not None:
+                self._set_base(solution_id, document, 0)
+            return solution_id
+
+    def _set_base(self, solution_id: str, document, since_checkpoint: int):
+        self.base_id = solution_id
+        self._base = document
+        self._since_checkpoint = since_checkpoint
@@ -0,0 +1,143 @@
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from concurrent.futures import Executor, Future
+from typing import Callable, Sequence
+
+from .file_handling import content_hash, convert_to_json
+from .forking import reinit_after_fork
+from .instrumentation import count, span
+
+# The instance of the current decorated call and its content hash.
+_current_instance: ContextVar = ContextVar("algobench_current_instance", default=None)
+
+
+def check(feasibility_function: Callable, scoring_function: Callable, instance, solution) -> tuple[bool, float]:
+    # Module level so that it can be sent to a process pool together with the user's functions.
+    with span("feasibility"):
+        feasible = feasibility_function(instance, solution)
+    with span("scoring"):
+        score = scoring_function(instance, solution)
+    return feasible, score
+
+
+class Evaluator:
+    # Runs the feasibility and scoring functions of a problem. With memoize, results are kept per
+    # (instance hash, solution hash) in a bounded least-recently-used map. Several solutions of one instance
+    # can be evaluated by a single call of the optional batched functions, e.g. vectorized with NumPy. Instances
+    # are hashed again for every evaluation, so changing one in place does not reuse stale results; within call(),
+    # its instance is hashed once.
+
+    def __init__(
+        self,
+        feasibility_function: Callable,
+        scoring_function: Callable,
+        batch_feasibility_function: Callable[[object, list], Sequence[bool]] | None = None,
+        batch_scoring_function: Callable[[object, list], Sequence[float]] | None = None,
+        memoize: bool = False,
+        max_entries: int = 1024,
+    ):
+        self.feasibility_function = feasibility_function
+        self.scoring_function = scoring_function
+        self.batch_feasibility_function = batch_feasibility_function
+        self.batch_scoring_function = batch_scoring_function
+        self.memoize = memoize
+        self.max_entries = max_entries
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+        reinit_after_fork(self)
+
+    @contextmanager
+    def call(self, instance):
+        # Evaluations of instance in this context, and in threads bound to it, share one hash of its content.
+        if not self.memoize:
+            yield
+            return
+        token = _current_instance.set((instance, content_hash(convert_to_json(instance))))
+        try:
+            yield
+        finally:
+            _current_instance.reset(token)
+
+    def evaluate(self, instance, solution) -> tuple[bool, float]:
+        key = self._key(instance, solution)
+        result = self._lookup(key)
+        if result is None:
+            result = check(self.feasibility_function, self.scoring_function, instance, solution)
+            self._store(key, result)
+        return result
+
+    def submit(self, executor: Executor, instance, solution) -> Future:
+        # Evaluates on the executor; with a process pool, instance, solution and both functions must be picklable.
+        key = self._key(instance, solution)
+        result = self._lookup(key)
+        if result is not None:
+            future = Future()
+            future.set_result(result)
+            return future
+        future = executor.submit(check, self.feasibility_function, self.scoring_function, instance, solution)
+        future.add_done_callback(lambda done: self._store_future(key, done))
+        return future
+
+    def evaluate_many(self, instance, solutions: list) -> list[tuple[bool, float]]:
+        solutions = list(solutions)
+        keys = [self._key(instance, solution) for solution in solutions]
+        results = [self._lookup(key) for key in keys]
+        missing = [index for index, result in enumerate(results) if result is None]
+        if not missing:
+            return results
+
+        pending = [solutions[index] for index in missing]
+        with span("feasibility"):
+            if self.batch_feasibility_function is not None:
+                feasible = self.batch_feasibility_function(instance, pending)
+            else:
+                feasible = [self.feasibility_function(instance, solution) for solution in pending]
+        with span("scoring"):
+            if self.batch_scoring_function is not None:
+                scores = self.batch_scoring_function(instance, pending)
+            else:
+                scores = [self.scoring_function(instance, solution) for solution in pending]
+
+        for index, solution_feasible, score in zip(missing, feasible, scores, strict=True):
+            results[index] = (bool(solution_feasible), score.item() if hasattr(score, "item") else score)
+            self._store(keys[index], results[index])
+        return results
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+
+    def _key(self, instance, solution) -> tuple[str, str] | None:
+        if not self.memoize:
+            return None
+        return self._instance_key(instance), content_hash(convert_to_json(solution))
+
+    def _instance_key(self, instance) -> str:
+        current = _current_instance.get()
+        if current is not None and current[0] is instance:
+            return current[1]
+        return content_hash(convert_to_json(instance))
+
+    def _lookup(self, key) -> tuple[bool, float] | None:
+        if key is None:
+            return None
+        with self._lock:
+            result = self._results.get(key)
+            if result is not None:
+                self._results.move_to_end(key)
+        if result is not None:
+            count("evaluation_cache_hits")
+        return result
+
+    def _store_future(self, key, future: Future):
+        if future.exception() is None:
+            self._store(key, future.result())
+
+    def _store(self, key, result: tuple[bool, float]):
+        if key is None:
+            return
+        with self._lock:
+            self._results[key] = result
+            if len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
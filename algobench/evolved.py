@@ -0,0 +1,369 @@
+import importlib.util
+import inspect
+import json
+import logging
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+
+from .api_client import APIClient
+from .cache import DiskCache, default_cache_dir
+from .file_handling import content_hash, convert_from_json, convert_to_json
+from .forking import ForkSafeExecutor, reinit_after_fork
+from .instrumentation import count, span
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# The worker runs in isolated mode, which ignores PYTHON* variables and the user site directory, so only the
+# directory containing algobench is added to the interpreter's own path.
+_WORKER = "import sys; sys.path.insert(0, sys.argv[1]); from algobench.evolved import serve; serve(*sys.argv[2:])"
+_PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Variables the worker inherits; everything else, e.g. API keys and cloud credentials, stays in this process.
+_ENVIRONMENT = ("PATH", "LANG", "LC_ALL", "LC_CTYPE", "TZ", "TMPDIR", "TEMP", "TMP", "SYSTEMROOT")
+
+
+class EvolvedAlgorithmError(RuntimeError):
+    pass
+
+
+@dataclass
+class EvolvedAlgorithm:
+    # An algorithm evolved by algobench: the source of a problem file, and the name of its algorithm function.
+    id: str
+    code: str
+    function_name: str
+
+
+def write_source(algorithm: EvolvedAlgorithm) -> str:
+    # Source files are named by their hash, so processes never overwrite a file another one is loading.
+    directory = os.path.join(default_cache_dir(), "evolved")
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{content_hash(algorithm.code)}.py")
+    if not os.path.exists(path):
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "w") as f:
+            f.write(algorithm.code)
+        os.replace(temporary, path)
+    return path
+
+
+def load_algorithm(path: str, function_name: str):
+    import algobench
+    import algobench.decorator
+
+    # The evolved code is a copy of the problem file, decorator included. It must not register or upload
+    # anything from the worker process, so algorithm() leaves functions undecorated there.
+    algobench.algorithm = algobench.decorator.algorithm = lambda *args, **kwargs: lambda function: function
+    spec = importlib.util.spec_from_file_location("algobench_evolved", path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return getattr(module, function_name)
+
+
+def serve(path: str, function_name: str, memory_limit: str = ""):
+    # Main loop of the worker process. Requests and replies are JSON lines on stdin and the original stdout;
+    # output of the evolved code goes to stderr instead.
+    protocol = os.fdopen(os.dup(sys.stdout.fileno()), "w")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    if memory_limit and resource is not None:
+        resource.setrlimit(resource.RLIMIT_AS, (int(memory_limit), int(memory_limit)))
+
+    def reply(response: dict):
+        protocol.write(json.dumps(response) + "\n")
+        protocol.flush()
+
+    try:
+        function = load_algorithm(path, function_name)
+        instance_type = next(iter(inspect.signature(function).parameters.values())).annotation
+    except Exception as e:
+        reply({"error": f"Loading evolved algorithm failed: {type(e).__name__}: {e}", "fatal": True})
+        return
+    reply({"ready": True})
+
+    for line in sys.stdin:
+        try:
+            solution = function(convert_from_json(json.loads(line)["instance"], instance_type))
+            if inspect.isgenerator(solution):
+                # Generator algorithms yield improving solutions; the last one is the best.
+                solution = deque(solution, maxlen=1).pop()
+            response = {"solution": convert_to_json(solution)}
+        except Exception as e:
+            response = {"error": f"{type(e).__name__}: {e}"}
+        reply(response)
+
+
+class SubprocessAlgorithm:
+    # Runs an evolved algorithm in separate Python processes, so that its crashes, memory and global state do not
+    # reach the calling process. Up to workers processes handle calls concurrently, one call each at a time; they
+    # are started when calls need them and kept for later calls. A call waits at most timeout seconds for a free
+    # process, and a call taking longer than timeout seconds kills its process, which the next call replaces.
+    # Where the resource module exists, memory_limit caps the address space of every process in bytes. The
+    # processes get a minimal environment without the caller's variables or sys.path, but run as the same user
+    # with the same file system and network access; they contain failures of the evolved code, but are no
+    # security boundary.
+
+    def __init__(
+        self,
+        path: str,
+        function_name: str,
+        timeout: float | None = 60.0,
+        memory_limit: int | None = None,
+        workers: int = 1,
+    ):
+        self.path = path
+        self.function_name = function_name
+        self.timeout = timeout
+        self.memory_limit = memory_limit
+        self.workers = workers
+        self.broken = False
+        self._reset()
+        reinit_after_fork(self)
+
+    def _reset(self):
+        # Free slots hold an idle process, or None where one is yet to be started. The most recently used process
+        # is handed out first, so that extra processes are only started under concurrent calls.
+        self._free = queue.LifoQueue()
+        for _ in range(self.workers):
+            self._free.put(None)
+        self._processes = set()
+        self._lock = threading.Lock()
+
+    def _after_fork(self):
+        # The worker processes belong to the parent; the child starts its own.
+        self._reset()
+
+    def __call__(self, instance) -> str:
+        # Returns the JSON of the solution.
+        request = json.dumps({"instance": convert_to_json(instance)}) + "\n"
+        if self.broken:
+            raise EvolvedAlgorithmError("Evolved algorithm could not be loaded")
+        try:
+            process = self._free.get(timeout=self.timeout)
+        except queue.Empty:
+            raise EvolvedAlgorithmError(f"No algorithm process became free within {self.timeout}s") from None
+        if self.broken:
+            self._free.put(process)
+            raise EvolvedAlgorithmError("Evolved algorithm could not be loaded")
+        try:
+            if process is None or process.poll() is not None:
+                process = None
+                process = self._start()
+            try:
+                process.stdin.write(request)
+                process.stdin.flush()
+            except OSError as e:
+                raise EvolvedAlgorithmError(f"Algorithm process exited: {e}") from e
+            response = self._read(process)
+        except BaseException:
+            self._kill(process)
+            process = None
+            raise
+        finally:
+            self._free.put(process)
+        if "error" in response:
+            raise EvolvedAlgorithmError(response["error"])
+        return response["solution"]
+
+    def close(self):
+        # Kills all processes; later calls start new ones.
+        with self._lock:
+            processes = list(self._processes)
+        for process in processes:
+            self._kill(process)
+
+    def _start(self) -> subprocess.Popen:
+        env = {name: os.environ[name] for name in _ENVIRONMENT if name in os.environ}
+        process = subprocess.Popen(
+            [
+                sys.executable,
+                "-I",
+                "-c",
+                _WORKER,
+                _PACKAGE_ROOT,
+                self.path,
+                self.function_name,
+                str(self.memory_limit or ""),
+            ],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            env=env,
+        )
+        with self._lock:
+            self._processes.add(process)
+        try:
+            response = self._read(process)
+        except BaseException:
+            self._kill(process)
+            raise
+        if response.get("fatal"):
+            self.broken = True
+            self._kill(process)
+            raise EvolvedAlgorithmError(response["error"])
+        return process
+
+    def _read(self, process: subprocess.Popen) -> dict:
+        # Killing the process on timeout ends the blocking read.
+        expired = threading.Event()
+
+        def expire():
+            expired.set()
+            process.kill()
+
+        timer = threading.Timer(self.timeout, expire) if self.timeout is not None else None
+        if timer is not None:
+            timer.daemon = True
+            timer.start()
+        try:
+            line = process.stdout.readline()
+        finally:
+            if timer is not None:
+                timer.cancel()
+        if not line or expired.is_set():
+            if expired.is_set():
+                raise EvolvedAlgorithmError(f"Evolved algorithm did not finish within {self.timeout}s")
+            raise EvolvedAlgorithmError("Algorithm process exited")
+        return json.loads(line)
+
+    def _kill(self, process: subprocess.Popen | None):
+        if process is None:
+            return
+        with self._lock:
+            if process not in self._processes:
+                return
+            self._processes.discard(process)
+        process.kill()
+        process.wait()
+        process.stdin.close()
+        process.stdout.close()
+
+
+class EvolvedAlgorithms:
+    # Runs the best algorithm algobench evolved for the problem on new instances, in a separate process, instead of
+    # the decorated function or, with race, at the same time as it. It is fetched in the background when it is
+    # first needed and again every refresh_interval seconds, and kept in algorithms.sqlite, so that later processes
+    # use it right away, even while algobench is unreachable. Until one is available the decorated function runs.
+    # Up to workers processes run it for concurrent calls, e.g. of solve.batch.
+
+    def __init__(
+        self,
+        race: bool = False,
+        refresh_interval: float = 600.0,
+        timeout: float | None = 60.0,
+        memory_limit: int | None = None,
+        workers: int = 4,
+    ):
+        self.race = race
+        self.refresh_interval = refresh_interval
+        self.timeout = timeout
+        self.memory_limit = memory_limit
+        self.workers = workers
+        self.algorithm = None
+        self._api_client = None
+        self._store = None
+        self._key = None
+        self._solution_type = None
+        self._process = None
+        self._refreshed = None
+        self._refreshing = False
+        self._refresh_executor = ForkSafeExecutor(
+            lambda: ThreadPoolExecutor(max_workers=1, thread_name_prefix="algobench-evolved")
+        )
+        self._lock = threading.Lock()
+        reinit_after_fork(self)
+
+    def _after_fork(self):
+        self._refreshing = False
+        self._lock = threading.Lock()
+
+    def bind(self, api_client: APIClient, store: DiskCache | None, key: str, solution_type: type):
+        # Fetches algorithms with api_client and keeps them in store under key. The stored one is used right away.
+        self._api_client, self._store, self._key, self._solution_type = api_client, store, key, solution_type
+        if store is None:
+            return
+        try:
+            value = store.get(key)
+            if value is not None:
+                self._use(EvolvedAlgorithm(**json.loads(value)))
+        except Exception as e:
+            logger.warning(f"Loading cached evolved algorithm failed: {e}")
+
+    def fetch(self) -> EvolvedAlgorithm | None:
+        # Asks algobench for its best evolved algorithm and uses it from now on. Returns the algorithm in use.
+        if self._api_client.problem_id is None:
+            return self.algorithm
+        data = self._api_client.fetch_best_algorithm()
+        self._refreshed = time.monotonic()
+        if data is None:
+            return self.algorithm
+        algorithm = EvolvedAlgorithm(str(data.get("id")), data["code"], data["algorithm_function_name"])
+        if algorithm != self.algorithm:
+            logger.info(f"Using evolved algorithm {algorithm.id}.")
+            self._use(algorithm)
+            if self._store is not None:
+                self._store.set(self._key, json.dumps(asdict(algorithm)))
+        return self.algorithm
+
+    def available(self) -> bool:
+        # Schedules a refresh when one is due; until it finished, the current algorithm is used.
+        if self._api_client is not None and (
+            self._refreshed is None or time.monotonic() - self._refreshed >= self.refresh_interval
+        ):
+            self._schedule_refresh()
+        process = self._process
+        return process is not None and not process.broken
+
+    def solve(self, instance):
+        process = self._process
+        if process is None:
+            raise EvolvedAlgorithmError("No evolved algorithm available")
+        with span("evolved"):
+            content = process(instance)
+        count("evolved_solves")
+        return convert_from_json(content, self._solution_type)
+
+    def close(self):
+        with self._lock:
+            process, self._process, self.algorithm = self._process, None, None
+        if process is not None:
+            process.close()
+        self._refresh_executor.shutdown(wait=False)
+
+    def _use(self, algorithm: EvolvedAlgorithm):
+        process = SubprocessAlgorithm(
+            write_source(algorithm), algorithm.function_name, self.timeout, self.memory_limit, self.workers
+        )
+        with self._lock:
+            previous, self._process, self.algorithm = self._process, process, algorithm
+        if previous is not None:
+            previous.close()
+
+    def _schedule_refresh(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        self._refresh_executor.submit(self._refresh)
+
+    def _refresh(self):
+        try:
+            self.fetch()
+        except Exception as e:
+            logger.warning(f"Fetching evolved algorithm failed: {e}")
+            self._refreshed = time.monotonic()
+        finally:
+            with self._lock:
+                self._refreshing = False
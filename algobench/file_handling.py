@@ -1,6 +1,25 @@
+import gzip
+import hashlib
 import json
 import logging
+from dataclasses import dataclass
 from json.decoder import JSONDecodeError
+from typing import Callable, Iterator
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
 
 logger = logging.getLogger(__name__)
 
@@ -29,5 +48,129 @@ def convert_from_json(data, class_type: type) -> object:
             return class_type.from_json(data)
         else:
             return class_type.from_json(json.dumps(data))
-    else:
+    elif isinstance(data, (str, bytes)):
         return json.loads(data)
+    else:
+        return data
+
+
+def content_hash(content: "str | bytes | JSONStream") -> str:
+    digest = hashlib.sha256()
+    for chunk in [content] if isinstance(content, (str, bytes)) else content:
+        digest.update(chunk.encode("utf-8") if isinstance(chunk, str) else chunk)
+    return digest.hexdigest()
+
+
+class JSONStream:
+    # JSON content of an object that is only produced chunk by chunk while it is iterated.
+
+    def __init__(self, object, chunk_size: int = 65536):
+        self.object = object
+        self.chunk_size = chunk_size
+
+    def __iter__(self) -> Iterator[str]:
+        return iter_json(self.object, self.chunk_size)
+
+
+def iter_json(object, chunk_size: int = 65536) -> Iterator[str]:
+    # Yields the same JSON text as convert_to_json in chunks of about chunk_size characters
+    # without building the whole string.
+    # model_dump_json writes compact UTF-8, json.dumps escapes non-ASCII characters.
+    if hasattr(object, "model_dump_json"):
+        encoder = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False)
+    else:
+        encoder = json.JSONEncoder()
+    buffer, buffered = [], 0
+    for piece in encoder.iterencode(convert_to_python(object)):
+        buffer.append(piece)
+        buffered += len(piece)
+        if buffered >= chunk_size:
+            yield "".join(buffer)
+            buffer, buffered = [], 0
+    if buffer:
+        yield "".join(buffer)
+
+
+def convert_to_python(object) -> object:
+    if hasattr(object, "model_dump"):
+        return object.model_dump(mode="json")
+    elif hasattr(object, "to_json"):
+        return object.to_json()
+    else:
+        return object
+
+
+@dataclass(frozen=True)
+class Codec:
+    name: str
+    media_type: str
+    encode: Callable[[object], bytes]
+    decode: Callable[[bytes], object]
+
+
+@dataclass(frozen=True)
+class Compression:
+    name: str
+    compress: Callable[[bytes], bytes]
+    decompress: Callable[[bytes], bytes]
+
+
+CODECS: dict[str, Codec] = {}
+COMPRESSIONS: dict[str, Compression] = {}
+
+
+def register_codec(codec: Codec):
+    CODECS[codec.name] = codec
+
+
+def register_compression(compression: Compression):
+    COMPRESSIONS[compression.name] = compression
+
+
+def encode(object, codec: str = "json", compression: str | None = None) -> bytes:
+    data = CODECS[codec].encode(object)
+    if compression is not None:
+        data = COMPRESSIONS[compression].compress(data)
+    return data
+
+
+def decode(data: bytes, class_type: type, codec: str = "json", compression: str | None = None) -> object:
+    if compression is not None:
+        data = COMPRESSIONS[compression].decompress(data)
+    if codec == "json" and hasattr(class_type, "model_validate_json"):
+        return class_type.model_validate_json(data)
+    return convert_from_json(CODECS[codec].decode(data), class_type)
+
+
+register_codec(Codec("json", "application/json", lambda object: convert_to_json(object).encode("utf-8"), json.loads))
+# Without a fixed mtime, the header holds the current time and equal instances would hash differently.
+register_compression(Compression("gzip", lambda data: gzip.compress(data, compresslevel=5, mtime=0), gzip.decompress))
+
+if orjson is not None:
+    register_codec(
+        Codec(
+            "orjson",
+            "application/json",
+            lambda object: orjson.dumps(convert_to_python(object), option=orjson.OPT_NON_STR_KEYS),
+            orjson.loads,
+        )
+    )
+
+if msgpack is not None:
+    register_codec(
+        Codec(
+            "msgpack",
+            "application/msgpack",
+            lambda object: msgpack.packb(convert_to_python(object)),
+            lambda data: msgpack.unpackb(data, strict_map_key=False),
+        )
+    )
+
+if zstandard is not None:
+    register_compression(
+        Compression(
+            "zstd",
+            lambda data: zstandard.ZstdCompressor().compress(data),
+            lambda data: zstandard.ZstdDecompressor().decompress(data),
+        )
+    )
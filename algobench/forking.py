@@ -0,0 +1,65 @@
+import logging
+import os
+import threading
+import weakref
+from concurrent.futures import Executor, Future
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+_reinit_after_fork = {}
+
+
+def reinit_after_fork(obj):
+    # obj._after_fork() is called in the child after os.fork(), e.g. by a multiprocessing pool using the fork
+    # start method. Only the forking thread exists in the child, so locks held by other threads, worker
+    # threads and connections shared with the parent have to be replaced there.
+    key = id(obj)
+    _reinit_after_fork[key] = weakref.ref(obj, lambda ref: _reinit_after_fork.pop(key, None))
+
+
+def _after_fork_in_child():
+    for ref in list(_reinit_after_fork.values()):
+        obj = ref()
+        if obj is None:
+            continue
+        try:
+            obj._after_fork()
+        except Exception as e:
+            logger.warning(f"Resetting {type(obj).__name__} after fork failed: {e}")
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+class ForkSafeExecutor(Executor):
+    # Creates the executor from factory on first use, and again in a forked child, where the copy of the
+    # parent's executor has no worker threads or processes left.
+
+    def __init__(self, factory: Callable[[], Executor]):
+        self.factory = factory
+        self._executor = None
+        self._lock = threading.Lock()
+        reinit_after_fork(self)
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = self.factory()
+        return self._executor
+
+    def submit(self, fn, /, *args, **kwargs) -> Future:
+        return self.executor.submit(fn, *args, **kwargs)
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait, cancel_futures=cancel_futures)
+                self._executor = None
+
+    def _after_fork(self):
+        self._executor = None
+        self._lock = threading.Lock()
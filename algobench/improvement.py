@@ -0,0 +1,250 @@
+import logging
+import math
+import random
+import threading
+import time
+from concurrent.futures import Executor
+from typing import Callable, Iterator
+
+from .evaluation import Evaluator
+from .instrumentation import span
+from .wait_budget import Observation, WaitBudget, relative_gain, size_bucket
+
+logger = logging.getLogger(__name__)
+
+# Decisions shared by the regular and the async path of a decorated function, which only differ in how they wait
+# for I/O. Solutions are passed around as (solution, feasible, score).
+
+
+class Objective:
+    # Compares scores of solutions of a problem. A feasible solution reaching target_score ends waits for
+    # algobench.
+
+    def __init__(self, is_minimization: bool, target_score: float | None = None):
+        self.is_minimization = is_minimization
+        self.target_score = target_score
+
+    def is_better(self, new_score, old_score, old_solution_feasible) -> bool:
+        return (
+            not old_solution_feasible
+            or (self.is_minimization and old_score > new_score)
+            or (not self.is_minimization and old_score < new_score)
+        )
+
+    def reaches_target(self, score) -> bool:
+        return (self.is_minimization and score <= self.target_score) or (
+            not self.is_minimization and score >= self.target_score
+        )
+
+    def reached(self, best: tuple) -> bool:
+        _, feasible, score = best
+        return self.target_score is not None and feasible and self.reaches_target(score)
+
+    def skip_improvement(self, instance_id: str | None, best: tuple) -> bool:
+        return instance_id is None or self.reached(best)
+
+    def better_of(self, best: tuple, server_best: tuple) -> tuple:
+        if server_best[1] and self.is_better(server_best[2], best[2], best[1]):
+            return server_best
+        return best
+
+    def server_wins_race(self, server_best: tuple, deadline: float) -> bool:
+        # While the local solve still runs, a feasible server solution is returned once the wait is over or it
+        # reached the target.
+        return server_best[1] and (time.monotonic() >= deadline or self.reached(server_best))
+
+
+def best_solution(
+    solutions: Iterator,
+    instance,
+    evaluator: Evaluator,
+    objective: Objective,
+    time_limit: float | None = None,
+    on_improvement: Callable[[object, bool, float | None], None] | None = None,
+) -> tuple:
+    # Consumes a generator algorithm until it is exhausted, yields a feasible solution reaching the target score or
+    # time_limit has passed, and returns the best solution. on_improvement(solution, feasible, score) is called for
+    # every solution that becomes the best one.
+    deadline = None if time_limit is None else time.monotonic() + time_limit
+    best = None
+    try:
+        for solution in timed_steps(solutions):
+            try:
+                feasible, score = evaluator.evaluate(instance, solution)
+            except Exception as e:
+                logger.warning(f"Evaluating solution failed: {e}")
+                feasible, score = False, None
+            if best is None or (feasible and objective.is_better(score, best[2], best[1])):
+                best = (solution, feasible, score)
+                if on_improvement is not None:
+                    on_improvement(*best)
+                if objective.reached(best):
+                    break
+            if deadline is not None and time.monotonic() >= deadline:
+                logger.info("Time limit reached. Returning the best solution so far.")
+                break
+    finally:
+        solutions.close()
+    return best if best is not None else (None, False, None)
+
+
+def timed_steps(solutions: Iterator):
+    while True:
+        with span("solve"):
+            try:
+                solution = next(solutions)
+            except StopIteration:
+                return
+        yield solution
+
+
+class ScoreTrust:
+    # The server's feasibility and score are used for all but a verify fraction of server solutions, until a
+    # verified one disagrees with the server.
+
+    def __init__(self, verify: float = 1.0):
+        self.verify = verify
+        self.revoked = threading.Event()
+
+    @property
+    def with_record(self) -> bool:
+        # Server solutions are only polled with their records if those can be trusted.
+        return self.verify < 1
+
+    def trusted_result(self, record) -> tuple[bool, float] | None:
+        if self.verify >= 1 or self.revoked.is_set() or random.random() < self.verify:
+            return None
+        return reported_result(record)
+
+    def check(self, record, feasible: bool, score: float):
+        reported = reported_result(record)
+        if self.verify >= 1 or reported is None:
+            return
+        if reported[0] != feasible or not math.isclose(reported[1], score, rel_tol=1e-9, abs_tol=1e-9):
+            logger.warning("Server reported a different score than the local evaluation. Verifying all solutions.")
+            self.revoked.set()
+
+
+def reported_result(record) -> tuple[bool, float] | None:
+    if not record or "score" not in record or "feasible" not in record:
+        return None
+    return bool(record["feasible"]), float(record["score"])
+
+
+class CandidateAcceptor:
+    # Keeps the best of the server solutions passed to accept() while polling. Its accept() returns True when the
+    # wait can end: after the first improvement, or with a target score once it is reached. With an executor,
+    # accept() returns right away and polling continues while the server solution is checked; a check that ends
+    # the wait calls stop_polling(), and settle() waits for the checks still running when polling ended. The
+    # arrival time and score of every improvement are appended to improvements.
+
+    def __init__(
+        self,
+        instance,
+        best: tuple,
+        objective: Objective,
+        evaluator: Evaluator,
+        trust: ScoreTrust,
+        executor: Executor | None = None,
+        first_improvement: bool = True,
+        stop_polling: Callable[[], None] | None = None,
+        improvements: list | None = None,
+    ):
+        self.instance = instance
+        self.objective = objective
+        self.evaluator = evaluator
+        self.trust = trust
+        self.executor = executor if stop_polling is not None else None
+        self.first_improvement = first_improvement
+        self.stop_polling = stop_polling
+        self.improvements = improvements
+        self._best = tuple(best)
+        self._lock = threading.Lock()
+        self._checks = threading.Condition()
+        self._running = 0
+
+    @property
+    def best(self) -> tuple:
+        with self._lock:
+            return self._best
+
+    def accept(self, server_solution, record=None) -> bool:
+        trusted = self.trust.trusted_result(record)
+        if trusted is not None:
+            return self._consider(server_solution, *trusted)
+        if self.executor is None:
+            return self._checked(
+                server_solution, record, lambda: self.evaluator.evaluate(self.instance, server_solution)
+            )
+        with self._checks:
+            self._running += 1
+
+        def finished(done):
+            try:
+                if self._checked(server_solution, record, done.result):
+                    self.stop_polling()
+            finally:
+                with self._checks:
+                    self._running -= 1
+                    self._checks.notify_all()
+
+        self.evaluator.submit(self.executor, self.instance, server_solution).add_done_callback(finished)
+        return False
+
+    def settle(self, timeout: float | None):
+        with self._checks:
+            self._checks.wait_for(lambda: self._running == 0, timeout)
+
+    def _checked(self, server_solution, record, result) -> bool:
+        try:
+            feasible, new_score = result()
+        except Exception as e:
+            logger.warning(f"Improving solution failed: {e}")
+            return False
+        self.trust.check(record, feasible, new_score)
+        return self._consider(server_solution, feasible, new_score)
+
+    def _consider(self, server_solution, feasible: bool, new_score: float) -> bool:
+        with self._lock:
+            _, best_feasible, best_score = self._best
+            if not feasible or not self.objective.is_better(new_score, best_score, best_feasible):
+                return False
+            logger.info(f"Improved solution found. New score: {new_score}. Old score: {best_score}")
+            self._best = (server_solution, True, new_score)
+            if self.improvements is not None:
+                self.improvements.append((time.monotonic(), new_score))
+        if self.objective.target_score is not None:
+            return self.objective.reaches_target(new_score)
+        return self.first_improvement
+
+
+class ImprovementWait:
+    # How long a call waits for algobench after its local solve: additional_wait_seconds, or the budget of the
+    # instance's size bucket with a wait budget, which learns from the improvements collected in improvements.
+
+    def __init__(self, instance, wait_budget: WaitBudget | None, additional_wait_seconds: float):
+        self.wait_budget = wait_budget
+        if wait_budget is None:
+            self.bucket, self.seconds = None, additional_wait_seconds
+        else:
+            self.bucket = size_bucket(instance)
+            self.seconds = wait_budget.budget(self.bucket)
+        self.started = time.monotonic()
+        self.improvements = []
+
+    def remaining(self) -> float:
+        return self.started + self.seconds - time.monotonic()
+
+    def learn(self, objective: Objective, instance_id: str | None, best: tuple):
+        # Only waits that polled algobench say something about its delays.
+        if self.bucket is None or objective.skip_improvement(instance_id, best):
+            return
+        _, feasible, score = best
+        observation = Observation(
+            time.monotonic() - self.started,
+            [
+                (arrived - self.started, relative_gain(score, feasible, new_score))
+                for arrived, new_score in self.improvements
+            ],
+        )
+        self.wait_budget.record(self.bucket, observation)
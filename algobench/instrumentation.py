@@ -0,0 +1,157 @@
+import contextvars
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable
+
+from .forking import reinit_after_fork
+
+try:
+    from opentelemetry import trace
+except ImportError:
+    trace = None
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Span:
+    name: str
+    start: float
+    duration: float
+
+
+@dataclass
+class CallRecord:
+    # Timings of one decorated call, or of one batch for kind "batch". start is a wall clock timestamp,
+    # durations are in seconds.
+    name: str
+    kind: str = "call"
+    start: float = field(default_factory=time.time)
+    duration: float = 0.0
+    spans: list[Span] = field(default_factory=list)
+    counters: dict[str, float] = field(default_factory=lambda: defaultdict(float))
+
+
+_current_call: contextvars.ContextVar[CallRecord | None] = contextvars.ContextVar("algobench_call", default=None)
+
+
+@contextmanager
+def span(name: str):
+    # Times the enclosed block as part of the current decorated call. Outside of a call this only yields.
+    record = _current_call.get()
+    if record is None:
+        yield
+        return
+    start, started = time.time(), time.perf_counter()
+    try:
+        yield
+    finally:
+        record.spans.append(Span(name, start, time.perf_counter() - started))
+
+
+def count(name: str, value: float = 1):
+    record = _current_call.get()
+    if record is not None:
+        record.counters[name] += value
+
+
+def bind_context(function: Callable) -> Callable:
+    # Lets function record into the current call when it runs on another thread, e.g. a pool worker.
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.copy().run(function, *args, **kwargs)
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+class Instrumentation:
+    # Collects the records of the calls of one decorated function. Hooks are called with every finished
+    # CallRecord; stats() summarizes the last max_samples durations of every span.
+
+    def __init__(self, name: str, hooks: list[Callable[[CallRecord], None]] | None = None, max_samples: int = 1000):
+        self.name = name
+        self.hooks = list(hooks or [])
+        self.max_samples = max_samples
+        self._calls = 0
+        self._counts = defaultdict(int)
+        self._durations = defaultdict(lambda: deque(maxlen=self.max_samples))
+        self._counters = defaultdict(float)
+        self._lock = threading.Lock()
+        reinit_after_fork(self)
+
+    def add_hook(self, hook: Callable[[CallRecord], None]):
+        self.hooks.append(hook)
+
+    @contextmanager
+    def call(self, kind: str = "call"):
+        record = CallRecord(self.name, kind)
+        token = _current_call.set(record)
+        started = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record.duration = time.perf_counter() - started
+            _current_call.reset(token)
+            self._finish(record)
+
+    def stats(self) -> dict:
+        with self._lock:
+            spans = {}
+            for name, durations in self._durations.items():
+                values = sorted(durations)
+                spans[name] = {
+                    "count": self._counts[name],
+                    "mean": sum(values) / len(values),
+                    "p50": percentile(values, 0.5),
+                    "p90": percentile(values, 0.9),
+                    "p99": percentile(values, 0.99),
+                    "max": values[-1],
+                }
+            return {"calls": self._calls, "spans": spans, "counters": dict(self._counters)}
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+
+    def _finish(self, record: CallRecord):
+        with self._lock:
+            self._calls += 1
+            for name, duration in [(record.kind, record.duration)] + [(s.name, s.duration) for s in record.spans]:
+                self._counts[name] += 1
+                self._durations[name].append(duration)
+            for name, value in record.counters.items():
+                self._counters[name] += value
+        for hook in self.hooks:
+            try:
+                hook(record)
+            except Exception as e:
+                logger.warning(f"Instrumentation hook failed: {e}")
+
+
+class OpenTelemetryExporter:
+    # Hook that reports every call as an OpenTelemetry span, with its spans as children and its counters
+    # as attributes. Needs the opentelemetry-api package; spans go to the configured tracer provider.
+
+    def __init__(self, tracer=None):
+        if trace is None:
+            raise ImportError("OpenTelemetryExporter requires the opentelemetry-api package")
+        self.tracer = tracer if tracer is not None else trace.get_tracer("algobench")
+
+    def __call__(self, record: CallRecord):
+        attributes = {f"algobench.{name}": value for name, value in record.counters.items()}
+        parent = self.tracer.start_span(
+            f"algobench {record.kind} {record.name}", start_time=nanoseconds(record.start), attributes=attributes
+        )
+        context = trace.set_span_in_context(parent)
+        for child in record.spans:
+            otel_span = self.tracer.start_span(child.name, context=context, start_time=nanoseconds(child.start))
+            otel_span.end(end_time=nanoseconds(child.start + child.duration))
+        parent.end(end_time=nanoseconds(record.start + record.duration))
+
+
+def nanoseconds(seconds: float) -> int:
+    return int(seconds * 1e9)
@@ -0,0 +1,128 @@
+import random
+import threading
+import time
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Callable
+
+from .file_handling import convert_to_json
+from .forking import reinit_after_fork
+
+
+@dataclass
+class UploadCall:
+    # What an upload policy knows about a decorated call. duration is the time the local solve took in seconds;
+    # it is only known to policies that wait for the solve.
+    instance: object
+    duration: float | None = None
+
+    @cached_property
+    def size(self) -> int:
+        # Length of the instance as JSON text.
+        return len(convert_to_json(self.instance))
+
+
+class UploadPolicy:
+    # Decides whether a decorated call goes to algobench. Calls that are not uploaded run the algorithm locally
+    # without any request. If waits_for_solve, the policy is asked after the local solve, and only then are the
+    # instance and the solution uploaded. Policies combine with & and |, evaluated left to right.
+    waits_for_solve = False
+
+    def __call__(self, call: UploadCall) -> bool:
+        raise NotImplementedError
+
+    def __and__(self, other) -> "UploadPolicy":
+        return AllOf(self, other)
+
+    def __or__(self, other) -> "UploadPolicy":
+        return AnyOf(self, other)
+
+
+def as_policy(policy: "UploadPolicy | Callable[[UploadCall], bool]") -> UploadPolicy:
+    return policy if isinstance(policy, UploadPolicy) else Predicate(policy)
+
+
+class Predicate(UploadPolicy):
+    def __init__(self, function: Callable[[UploadCall], bool], waits_for_solve: bool = False):
+        self.function = function
+        self.waits_for_solve = waits_for_solve
+
+    def __call__(self, call: UploadCall) -> bool:
+        return bool(self.function(call))
+
+
+class Sample(UploadPolicy):
+    # Uploads each call with probability rate.
+
+    def __init__(self, rate: float, seed: int | None = None):
+        self.rate = rate
+        self._random = random.Random(seed)
+
+    def __call__(self, call: UploadCall) -> bool:
+        return self._random.random() < self.rate
+
+
+class RateLimit(UploadPolicy):
+    # Token bucket: at most burst calls at once and rate calls per second on average. Place it last in a
+    # combination, so that only calls passing the other policies take a token.
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        reinit_after_fork(self)
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+
+    def __call__(self, call: UploadCall) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+class SizeRange(UploadPolicy):
+    # Uploads instances whose JSON text has between min_size and max_size characters.
+
+    def __init__(self, min_size: int = 0, max_size: int | None = None):
+        self.min_size = min_size
+        self.max_size = max_size
+
+    def __call__(self, call: UploadCall) -> bool:
+        return call.size >= self.min_size and (self.max_size is None or call.size <= self.max_size)
+
+
+class SlowerThan(UploadPolicy):
+    # Uploads calls whose local solve took longer than seconds, i.e. the hard instances.
+    waits_for_solve = True
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+
+    def __call__(self, call: UploadCall) -> bool:
+        return call.duration is not None and call.duration > self.seconds
+
+
+class AllOf(UploadPolicy):
+    def __init__(self, *policies):
+        self.policies = [as_policy(policy) for policy in policies]
+        self.waits_for_solve = any(policy.waits_for_solve for policy in self.policies)
+
+    def __call__(self, call: UploadCall) -> bool:
+        return all(policy(call) for policy in self.policies)
+
+
+class AnyOf(UploadPolicy):
+    def __init__(self, *policies):
+        self.policies = [as_policy(policy) for policy in policies]
+        self.waits_for_solve = any(policy.waits_for_solve for policy in self.policies)
+
+    def __call__(self, call: UploadCall) -> bool:
+        return any(policy(call) for policy in self.policies)
@@ -0,0 +1,22 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable
+
+_reporter: ContextVar[Callable[[object], None] | None] = ContextVar("algobench_reporter", default=None)
+
+
+def report_progress(solution):
+    # Called from inside a decorated algorithm with an intermediate solution. Improving solutions are
+    # uploaded as diffs against the previous one. Outside of a decorated call this does nothing.
+    reporter = _reporter.get()
+    if reporter is not None:
+        reporter(solution)
+
+
+@contextmanager
+def reporting(reporter: Callable[[object], None]):
+    token = _reporter.set(reporter)
+    try:
+        yield
+    finally:
+        _reporter.reset(token)
@@ -0,0 +1,396 @@
+import atexit
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable
+
+from .api_client import APIClient, UploadRejectedError
+from .cache import default_cache_dir
+from .delta import DeltaEncoder
+from .file_handling import convert_to_json
+from .forking import reinit_after_fork
+
+logger = logging.getLogger(__name__)
+
+
+def open_spool(file_name: str = "spool.sqlite", **kwargs) -> "Spool | None":
+    try:
+        return Spool(os.path.join(default_cache_dir(), file_name), **kwargs)
+    except (OSError, sqlite3.Error) as e:
+        logger.warning(f"Could not open spool {file_name}: {e}")
+        return None
+
+
+@dataclass
+class SpooledUpload:
+    id: int
+    kind: str
+    content: str
+    instance_id: str | None
+    feasible: bool | None
+    score: float | None
+    attempts: int
+
+
+class SpoolFuture(Future):
+    # Result of a spooled upload. spool_id identifies its row, so that solutions can refer to an instance
+    # that is not uploaded yet.
+
+    def __init__(self, spool_id: int):
+        super().__init__()
+        self.spool_id = spool_id
+
+
+class Spool:
+    # Durable queue of uploads on sqlite in WAL mode, shared by all processes using the file. A claimed row is
+    # not handed out again until claimed_until, which is lease_seconds for a claim and the backoff for a retry,
+    # so rows of a crashed replayer are shipped by another one. Solutions of a spooled instance become
+    # claimable once the instance was shipped. Rows that can never be shipped are moved to rejected_uploads.
+
+    def __init__(self, path: str, lease_seconds: float = 60.0):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection = self._connect()
+        self._connection.executescript(
+            "CREATE TABLE IF NOT EXISTS uploads ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, queue TEXT NOT NULL, kind TEXT NOT NULL, content TEXT NOT NULL, "
+            "instance_ref INTEGER, instance_id TEXT, feasible INTEGER, score REAL, "
+            "attempts INTEGER NOT NULL DEFAULT 0, claimed_until REAL NOT NULL DEFAULT 0, created REAL NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS uploads_queue ON uploads (queue, id);"
+            "CREATE TABLE IF NOT EXISTS shipped_instances "
+            "(ref INTEGER PRIMARY KEY, instance_id TEXT NOT NULL, created REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS rejected_uploads ("
+            "id INTEGER PRIMARY KEY, queue TEXT NOT NULL, kind TEXT NOT NULL, content TEXT NOT NULL, "
+            "instance_ref INTEGER, instance_id TEXT, feasible INTEGER, score REAL, attempts INTEGER NOT NULL, "
+            "created REAL NOT NULL, reason TEXT NOT NULL, rejected REAL NOT NULL);"
+        )
+        reinit_after_fork(self)
+
+    def _connect(self) -> sqlite3.Connection:
+        # With synchronous=NORMAL a commit does not wait for fsync; committed rows survive a crash of the
+        # process, but not necessarily of the machine.
+        connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30.0)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+        self._connection = self._connect()
+
+    def append_instance(self, queue: str, content: str) -> int:
+        with self._lock:
+            cursor = self._connection.execute(
+                "INSERT INTO uploads (queue, kind, content, created) VALUES (?, 'instance', ?, ?)",
+                (queue, content, time.time()),
+            )
+            return cursor.lastrowid
+
+    def append_solution(
+        self,
+        queue: str,
+        content: str,
+        feasible: bool,
+        score: float,
+        instance_id: str | None = None,
+        instance_ref: int | None = None,
+    ) -> int:
+        with self._lock:
+            cursor = self._connection.execute(
+                "INSERT INTO uploads (queue, kind, content, instance_ref, instance_id, feasible, score, created) "
+                "VALUES (?, 'solution', ?, ?, ?, ?, ?, ?)",
+                (queue, content, instance_ref, instance_id, feasible, score, time.time()),
+            )
+            return cursor.lastrowid
+
+    def claim(self, queue: str, limit: int) -> list[SpooledUpload]:
+        now = time.time()
+        with self._lock, self._transaction():
+            rows = self._connection.execute(
+                "SELECT u.id, u.kind, u.content, COALESCE(u.instance_id, s.instance_id), u.feasible, u.score, "
+                "u.attempts FROM uploads u LEFT JOIN shipped_instances s ON s.ref = u.instance_ref "
+                "WHERE u.queue = ? AND u.claimed_until <= ? "
+                "AND (u.kind = 'instance' OR u.instance_id IS NOT NULL OR s.instance_id IS NOT NULL) "
+                "ORDER BY u.id LIMIT ?",
+                (queue, now, limit),
+            ).fetchall()
+            self._connection.executemany(
+                "UPDATE uploads SET claimed_until = ? WHERE id = ?",
+                [(now + self.lease_seconds, row[0]) for row in rows],
+            )
+        return [
+            SpooledUpload(id, kind, content, instance_id, None if feasible is None else bool(feasible), score, attempts)
+            for id, kind, content, instance_id, feasible, score, attempts in rows
+        ]
+
+    def complete(self, upload: SpooledUpload, result_id: str):
+        with self._lock, self._transaction():
+            self._connection.execute("DELETE FROM uploads WHERE id = ?", (upload.id,))
+            if upload.kind == "instance":
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO shipped_instances (ref, instance_id, created) VALUES (?, ?, ?)",
+                    (upload.id, result_id, time.time()),
+                )
+
+    def retry(self, upload: SpooledUpload, delay: float):
+        with self._lock:
+            self._connection.execute(
+                "UPDATE uploads SET attempts = attempts + 1, claimed_until = ? WHERE id = ?",
+                (time.time() + delay, upload.id),
+            )
+
+    def reject(self, upload: SpooledUpload, reason: str) -> list[int]:
+        # Moves the row to rejected_uploads, together with the solutions waiting for it if it is an instance.
+        # Returns the ids of the moved rows.
+        with self._lock, self._transaction():
+            ids = [upload.id]
+            if upload.kind == "instance":
+                ids += [
+                    row[0]
+                    for row in self._connection.execute("SELECT id FROM uploads WHERE instance_ref = ?", (upload.id,))
+                ]
+            placeholders = ", ".join("?" * len(ids))
+            self._connection.execute(
+                "INSERT OR REPLACE INTO rejected_uploads (id, queue, kind, content, instance_ref, instance_id, "
+                "feasible, score, attempts, created, reason, rejected) SELECT id, queue, kind, content, "
+                "instance_ref, instance_id, feasible, score, attempts, created, ?, ? FROM uploads "
+                f"WHERE id IN ({placeholders})",
+                (reason, time.time(), *ids),
+            )
+            self._connection.execute(f"DELETE FROM uploads WHERE id IN ({placeholders})", ids)
+        return ids
+
+    def release(self, uploads: list[SpooledUpload]):
+        with self._lock:
+            self._connection.executemany(
+                "UPDATE uploads SET claimed_until = 0 WHERE id = ?", [(u.id,) for u in uploads]
+            )
+
+    def prune(self, max_age: float = 7 * 24 * 3600):
+        # Instance ids are kept while solutions may still refer to them.
+        with self._lock:
+            self._connection.execute(
+                "DELETE FROM shipped_instances WHERE created < ? "
+                "AND ref NOT IN (SELECT instance_ref FROM uploads WHERE instance_ref IS NOT NULL)",
+                (time.time() - max_age,),
+            )
+            self._connection.execute("DELETE FROM rejected_uploads WHERE rejected < ?", (time.time() - max_age,))
+
+    def pending(self, queue: str | None = None) -> int:
+        with self._lock:
+            if queue is None:
+                return self._connection.execute("SELECT COUNT(*) FROM uploads").fetchone()[0]
+            return self._connection.execute("SELECT COUNT(*) FROM uploads WHERE queue = ?", (queue,)).fetchone()[0]
+
+    def rejected(self, queue: str | None = None) -> int:
+        with self._lock:
+            if queue is None:
+                return self._connection.execute("SELECT COUNT(*) FROM rejected_uploads").fetchone()[0]
+            return self._connection.execute(
+                "SELECT COUNT(*) FROM rejected_uploads WHERE queue = ?", (queue,)
+            ).fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    @contextmanager
+    def _transaction(self):
+        # BEGIN IMMEDIATE takes the write lock up front, so concurrent claims of other processes wait instead of
+        # reading the same rows.
+        self._connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._connection.execute("ROLLBACK")
+            raise
+        self._connection.execute("COMMIT")
+
+
+class SpoolUploader:
+    # Drop-in for the BackgroundUploader that writes every upload to the spool and returns right away. A daemon
+    # replayer registers the problem if needed and ships spooled uploads of this problem in batches, retrying
+    # failed ones with exponential backoff. Uploads the server refuses for good (a 4xx status other than 408 and
+    # 429), and uploads still failing after max_attempts tries, are moved to the dead-letter table of the spool
+    # and resolve to None. While max_pending uploads of the problem are spooled, for instance because the API key
+    # is invalid, new ones are dropped. Uploads left at exit are shipped by the next process of the problem.
+    # Solutions are spooled as full JSON; diffs and content formats need the server and are not used.
+
+    def __init__(
+        self,
+        api_client: APIClient,
+        spool: Spool,
+        register: Callable[[], bool],
+        batch_size: int = 16,
+        poll_interval: float = 1.0,
+        retry_interval: float = 1.0,
+        max_retry_interval: float = 300.0,
+        max_attempts: int = 50,
+        max_pending: int = 100_000,
+        drain_timeout: float = 10.0,
+    ):
+        self.api_client = api_client
+        self.spool = spool
+        self.register = register
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.retry_interval = retry_interval
+        self.max_retry_interval = max_retry_interval
+        self.max_attempts = max_attempts
+        self.max_pending = max_pending
+        self.queue = f"{api_client.algobench_url}:{api_client.env_name}"
+        self._futures = {}
+        self._futures_changed = threading.Condition()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self._full = False
+        self._full_checked = None
+        atexit.register(self.flush, drain_timeout)
+        reinit_after_fork(self)
+        self.start()
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="algobench-spool", daemon=True)
+                self._thread.start()
+
+    def submit_instance(self, instance) -> Future:
+        if self._spool_full():
+            return self._dropped()
+        return self._track(self.spool.append_instance(self.queue, convert_to_json(instance)))
+
+    def submit_solution(
+        self, solution, instance_future: Future, feasible: bool, score: float, delta: DeltaEncoder | None = None
+    ) -> Future:
+        instance_id, instance_ref = None, getattr(instance_future, "spool_id", None)
+        if instance_future.done():
+            instance_id, instance_ref = instance_future.result(), None
+        if instance_id is None and instance_ref is None:
+            logger.warning("Skipping solution upload because its instance was not uploaded.")
+            return self._dropped()
+        if self._spool_full():
+            return self._dropped()
+        spool_id = self.spool.append_solution(
+            self.queue, convert_to_json(solution), feasible, score, instance_id=instance_id, instance_ref=instance_ref
+        )
+        return self._track(spool_id)
+
+    def flush(self, timeout: float | None = None) -> bool:
+        # Waits for the uploads submitted by this process; they stay in the spool if the timeout expires.
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._futures_changed:
+            while self._futures:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._futures_changed.wait(remaining)
+        return True
+
+    def _spool_full(self) -> bool:
+        # Counting the spooled rows takes a query, so it is done at most once a second.
+        now = time.monotonic()
+        if self._full_checked is None or now - self._full_checked >= 1.0:
+            self._full_checked = now
+            full = self.spool.pending(self.queue) >= self.max_pending
+            if full and not self._full:
+                logger.warning(f"Spool holds {self.max_pending} uploads. Dropping new ones until it drains.")
+            self._full = full
+        return self._full
+
+    def _dropped(self) -> Future:
+        future = Future()
+        future.set_result(None)
+        return future
+
+    def _track(self, spool_id: int) -> Future:
+        future = SpoolFuture(spool_id)
+        with self._futures_changed:
+            self._futures[spool_id] = future
+        self.start()
+        self._wakeup.set()
+        return future
+
+    def _resolve(self, spool_id: int, result):
+        with self._futures_changed:
+            future = self._futures.pop(spool_id, None)
+            self._futures_changed.notify_all()
+        if future is not None:
+            future.set_result(result)
+
+    def _after_fork(self):
+        # Uploads of the parent stay in the spool; the child only waits for its own ones.
+        self._futures = {}
+        self._futures_changed = threading.Condition()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self._full_checked = None
+
+    def _run(self):
+        failures = 0
+        while True:
+            try:
+                shipped = self._replay()
+                failures = 0 if shipped is not False else failures + 1
+            except Exception as e:
+                logger.warning(f"Replaying spooled uploads failed: {e}")
+                shipped, failures = False, failures + 1
+            if shipped is False:
+                time.sleep(self._backoff(failures))
+            elif shipped == 0:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+
+    def _replay(self) -> int | bool:
+        # Returns the number of shipped uploads, or False if the server could not be reached.
+        if not self.register():
+            return False
+        batch = self.spool.claim(self.queue, self.batch_size)
+        for index, upload in enumerate(batch):
+            try:
+                result = self._ship(upload)
+            except UploadRejectedError as e:
+                self._reject(upload, str(e))
+                continue
+            except Exception as e:
+                logger.info(f"Spooled {upload.kind} upload failed: {e}")
+                result = None
+            if result is None and upload.attempts + 1 >= self.max_attempts:
+                self._reject(upload, f"Upload failed {self.max_attempts} times")
+            elif result is None:
+                # Connection errors and 5xx statuses mean the server is unavailable, so the rest of the batch waits.
+                self.spool.retry(upload, self._backoff(upload.attempts + 1))
+                self.spool.release(batch[index + 1 :])
+                return False
+            else:
+                self.spool.complete(upload, result)
+                self._resolve(upload.id, result)
+        if not batch:
+            self.spool.prune()
+        return len(batch)
+
+    def _reject(self, upload: SpooledUpload, reason: str):
+        logger.warning(f"Dropping spooled {upload.kind} upload {upload.id}: {reason}")
+        for spool_id in self.spool.reject(upload, reason):
+            self._resolve(spool_id, None)
+
+    def _ship(self, upload: SpooledUpload) -> str | None:
+        if upload.kind == "instance":
+            return self.api_client.upload_instance_content(upload.content, raise_rejected=True)
+        return self.api_client.upload_solution_content(
+            upload.content, upload.instance_id, upload.feasible, upload.score, raise_rejected=True
+        )
+
+    def _backoff(self, failures: int) -> float:
+        return min(self.max_retry_interval, self.retry_interval * 2 ** max(0, failures - 1))
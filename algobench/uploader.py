@@ -0,0 +1,118 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+
+from .api_client import APIClient
+from .delta import DeltaEncoder
+from .forking import reinit_after_fork
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class UploadJob:
+    kind: str
+    content: str | bytes
+    future: Future = field(default_factory=Future)
+    instance_future: Future | None = None
+    feasible: bool | None = None
+    score: float | None = None
+    delta: DeltaEncoder | None = None
+
+
+def resolved_future(value) -> Future:
+    future = Future()
+    future.set_result(value)
+    return future
+
+
+class BackgroundUploader:
+    # Uploads are serialized in the calling thread and shipped in order by a single daemon worker.
+    # Instance ids are handed out as futures, and a full queue drops uploads instead of blocking.
+
+    def __init__(self, api_client: APIClient, max_queue_size: int = 1000, drain_timeout: float = 10.0):
+        self.api_client = api_client
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        atexit.register(self.flush, drain_timeout)
+        reinit_after_fork(self)
+
+    def submit_instance(self, instance) -> Future:
+        job = UploadJob(kind="instance", content=self.api_client.serialize(instance, stream=False))
+        self._enqueue(job)
+        return job.future
+
+    def submit_solution(
+        self, solution, instance_future: Future, feasible: bool, score: float, delta: DeltaEncoder | None = None
+    ) -> Future:
+        job = UploadJob(
+            kind="solution",
+            content=self.api_client.serialize(solution, stream=False),
+            instance_future=instance_future,
+            feasible=feasible,
+            score=score,
+            delta=delta,
+        )
+        self._enqueue(job)
+        return job.future
+
+    def flush(self, timeout: float | None = None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def _after_fork(self):
+        # Uploads queued before a fork are shipped by the parent; the child starts with an empty queue.
+        self._queue = queue.Queue(maxsize=self._queue.maxsize)
+        self._thread = None
+        self._thread_lock = threading.Lock()
+
+    def _enqueue(self, job: UploadJob):
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            logger.warning(f"Upload queue is full. Dropping {job.kind} upload.")
+            job.future.set_result(None)
+
+    def _ensure_worker(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="algobench-uploader", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        # The API has no bulk endpoints, so jobs are shipped one request at a time over the pooled connection.
+        while True:
+            job = self._queue.get()
+            try:
+                job.future.set_result(self._ship(job))
+            except Exception as e:
+                logger.warning(f"Background {job.kind} upload failed: {e}")
+                job.future.set_result(None)
+            finally:
+                self._queue.task_done()
+
+    def _ship(self, job: UploadJob) -> str | None:
+        if job.kind == "instance":
+            return self.api_client.upload_instance_content(job.content)
+
+        instance_id = job.instance_future.result()
+        if instance_id is None:
+            logger.warning("Skipping solution upload because its instance was not uploaded.")
+            return None
+        if job.delta is not None:
+            return job.delta.upload(self.api_client, job.content, instance_id, job.feasible, job.score)
+        return self.api_client.upload_solution_content(job.content, instance_id, job.feasible, job.score)
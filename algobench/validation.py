@@ -1,9 +1,20 @@
 import logging
 import inspect
+import typing
+from collections.abc import Generator, Iterable, Iterator
 
 logger = logging.getLogger(__name__)
 
 
+def solution_annotation(algorithm_function):
+    # Generator algorithms are annotated with Iterator[Solution] (or Iterable/Generator) and yield solutions.
+    annotation = inspect.signature(algorithm_function).return_annotation
+    is_generator = inspect.isgeneratorfunction(algorithm_function)
+    if is_generator and typing.get_origin(annotation) in (Generator, Iterable, Iterator):
+        return typing.get_args(annotation)[0]
+    return annotation
+
+
 def validate_functions(algorithm_function, feasibility_function, scoring_function):
     hints = list(inspect.signature(algorithm_function).parameters.values())
 
@@ -11,7 +22,7 @@ def validate_functions(algorithm_function, feasibility_function, scoring_functio
         logger.warning("algorithm_function must take exactly one argument")
         return False
     potential_instance_type = hints[0].annotation
-    potential_solution_type = inspect.signature(algorithm_function).return_annotation
+    potential_solution_type = solution_annotation(algorithm_function)
     feasibility_hints = list(inspect.signature(feasibility_function).parameters.values())
     if len(feasibility_hints) != 2:
         logger.warning("feasibility_function must take exactly two arguments")
@@ -0,0 +1,151 @@
+import json
+import logging
+import random
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+
+from .cache import DiskCache
+from .file_handling import convert_to_json
+from .forking import reinit_after_fork
+from .instrumentation import percentile
+
+logger = logging.getLogger(__name__)
+
+
+def size_bucket(instance) -> int:
+    # Instances whose JSON text has between 2 ** (bucket - 1) and 2 ** bucket - 1 characters share a bucket.
+    return len(convert_to_json(instance)).bit_length()
+
+
+def relative_gain(old_score: float | None, old_feasible: bool, new_score: float) -> float:
+    # Improvement over the local solution relative to its score, capped at 1. A feasible solution replacing an
+    # infeasible one gains 1.
+    if not old_feasible or old_score is None:
+        return 1.0
+    return min(1.0, abs(new_score - old_score) / max(abs(old_score), 1e-9))
+
+
+@dataclass
+class Observation:
+    # One wait for algobench: how many seconds it lasted, and the delay and relative gain over the local solution
+    # of every improvement that arrived during it, in order.
+    waited: float
+    improvements: list[tuple[float, float]] = field(default_factory=list)
+
+    def gain_by(self, seconds: float) -> float:
+        return max((gain for delay, gain in self.improvements if delay <= seconds), default=0.0)
+
+    def knows(self, seconds: float) -> bool:
+        # Waits that ended earlier without an improvement say nothing about what a longer wait would have brought.
+        return self.waited >= seconds or any(delay <= seconds for delay, _ in self.improvements)
+
+
+class WaitBudget:
+    # Chooses how long to wait for algobench after the local solve, from earlier waits for instances of the same
+    # problem and size bucket. The expected gain of waiting t seconds is the mean relative gain the observed waits
+    # had reached after t seconds; the budget is the longest wait, at one of the observed improvement delays times
+    # margin, whose expected gain per second is at least target_rate. No improvement worth it means a budget of 0.
+    # Buckets with fewer than min_observations waits, and an explore fraction of the other calls, wait max_wait,
+    # so that improvements arriving later than the current budget are still noticed.
+
+    def __init__(
+        self,
+        target_rate: float = 0.01,
+        max_wait: float = 30.0,
+        min_observations: int = 10,
+        max_observations: int = 200,
+        explore: float = 0.05,
+        margin: float = 1.2,
+        seed: int | None = None,
+    ):
+        self.target_rate = target_rate
+        self.max_wait = max_wait
+        self.min_observations = min_observations
+        self.max_observations = max_observations
+        self.explore = explore
+        self.margin = margin
+        self._observations = {}
+        self._store = None
+        self._key = None
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        reinit_after_fork(self)
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+
+    def bind(self, store: DiskCache | None, key: str):
+        # Loads the observations stored under key by earlier processes and stores new ones there. Processes
+        # sharing the key overwrite each other's latest observations.
+        with self._lock:
+            self._store, self._key = store, key
+            if store is None:
+                return
+            try:
+                value = store.get(key)
+                for bucket, observations in json.loads(value or "{}").items():
+                    self._bucket(int(bucket)).extend(
+                        Observation(waited, list(map(tuple, improvements))) for waited, improvements in observations
+                    )
+            except Exception as e:
+                logger.warning(f"Loading wait budget observations failed: {e}")
+
+    def budget(self, bucket: int) -> float:
+        with self._lock:
+            observations = list(self._observations.get(bucket, ()))
+            explore = len(observations) < self.min_observations or self._random.random() < self.explore
+        return self.max_wait if explore else self._learned(observations)
+
+    def record(self, bucket: int, observation: Observation):
+        with self._lock:
+            self._bucket(bucket).append(observation)
+            if self._store is None:
+                return
+            value = json.dumps(
+                {
+                    key: [[o.waited, o.improvements] for o in observations]
+                    for key, observations in self._observations.items()
+                }
+            )
+        try:
+            self._store.set(self._key, value)
+        except Exception as e:
+            logger.warning(f"Storing wait budget observations failed: {e}")
+
+    def model(self) -> dict:
+        # Per size bucket: the largest instance size, the number of observed waits, the fraction that brought an
+        # improvement, the median delay of the first improvement, the mean final gain and the learned budget.
+        with self._lock:
+            buckets = {bucket: list(observations) for bucket, observations in self._observations.items()}
+        model = {}
+        for bucket, observations in sorted(buckets.items()):
+            delays = sorted(o.improvements[0][0] for o in observations if o.improvements)
+            model[bucket] = {
+                "max_size": 2**bucket - 1,
+                "observations": len(observations),
+                "improved": len(delays) / len(observations),
+                "median_delay": percentile(delays, 0.5) if delays else None,
+                "mean_gain": sum(o.gain_by(o.waited) for o in observations) / len(observations),
+                "budget": self._learned(observations) if len(observations) >= self.min_observations else None,
+            }
+        return model
+
+    def _bucket(self, bucket: int) -> deque:
+        if bucket not in self._observations:
+            self._observations[bucket] = deque(maxlen=self.max_observations)
+        return self._observations[bucket]
+
+    def _learned(self, observations: list[Observation]) -> float:
+        candidates = sorted(
+            {min(self.max_wait, delay * self.margin) for o in observations for delay, _ in o.improvements}
+        )
+        budget = 0.0
+        for seconds in candidates:
+            known = [o for o in observations if o.knows(seconds)]
+            if not known:
+                continue
+            expected_gain = sum(o.gain_by(seconds) for o in known) / len(known)
+            if expected_gain >= self.target_rate * max(seconds, 1e-3):
+                budget = seconds
+        return budget
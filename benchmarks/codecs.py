@@ -0,0 +1,60 @@
+# Compares the codecs and compressions registered in algobench.file_handling on a large pydantic model.
+# Run with: python -m benchmarks.codecs --items 100000
+import argparse
+import random
+import time
+
+from pydantic import BaseModel
+
+from algobench.file_handling import CODECS, COMPRESSIONS, decode, encode
+
+
+class Item(BaseModel):
+    id: int
+    weight: float
+    value: float
+
+
+class Instance(BaseModel):
+    items: dict[int, Item]
+    capacity: float
+
+
+def make_instance(items: int) -> Instance:
+    rng = random.Random(0)
+    return Instance(
+        items={i: Item(id=i, weight=rng.uniform(1, 100), value=rng.uniform(1, 100)) for i in range(items)},
+        capacity=items * 10.0,
+    )
+
+
+def best_of(repeat: int, function) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    instance = make_instance(args.items)
+    print(f"{'codec':<10}{'compression':<13}{'bytes':>12}{'encode ms':>12}{'decode ms':>12}")
+    for codec in CODECS:
+        for compression in [None, *COMPRESSIONS]:
+            data = encode(instance, codec, compression)
+            encode_seconds = best_of(args.repeat, lambda: encode(instance, codec, compression))
+            decode_seconds = best_of(args.repeat, lambda: decode(data, Instance, codec, compression))
+            print(
+                f"{codec:<10}{compression or '-':<13}{len(data):>12}"
+                f"{encode_seconds * 1000:>12.1f}{decode_seconds * 1000:>12.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
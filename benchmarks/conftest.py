@@ -0,0 +1,20 @@
+import pytest
+
+from tests.mock_server import MockServer
+
+
+@pytest.fixture
+def algobench_server(monkeypatch, tmp_path):
+    # Returns a function that starts a local stand-in server with the given latency and points the SDK at it.
+    servers = []
+
+    def start(latency: float = 0.0) -> MockServer:
+        server = MockServer(latency=latency).start()
+        servers.append(server)
+        monkeypatch.setenv("ALGOBENCH_URL", server.url)
+        return server
+
+    monkeypatch.setenv("ALGOBENCH_CACHE_DIR", str(tmp_path / "cache"))
+    yield start
+    for server in servers:
+        server.stop()
@@ -0,0 +1,124 @@
+# SDK overhead against a local stand-in server. Run with: python -m pytest benchmarks
+# Compare runs with --benchmark-autosave and --benchmark-compare to catch regressions.
+import random
+import tracemalloc
+
+import pytest
+from pydantic import BaseModel
+
+from algobench import algorithm
+from algobench.file_handling import CODECS, encode
+
+pytest.importorskip("pytest_benchmark")
+
+SIZES = [100, 10000]
+
+
+class Instance(BaseModel):
+    values: list[float]
+    weights: list[float]
+    capacity: float
+
+
+class Solution(BaseModel):
+    picked: list[int]
+
+
+def greedy(instance: Instance) -> Solution:
+    order = sorted(range(len(instance.values)), key=lambda i: instance.weights[i] / instance.values[i])
+    picked, weight = [0] * len(order), 0.0
+    for index in order:
+        if weight + instance.weights[index] <= instance.capacity:
+            picked[index] = 1
+            weight += instance.weights[index]
+    return Solution(picked=picked)
+
+
+def feasibility(instance: Instance, solution: Solution) -> bool:
+    return sum(w for w, p in zip(instance.weights, solution.picked) if p) <= instance.capacity
+
+
+def scoring(instance: Instance, solution: Solution) -> float:
+    return sum(v for v, p in zip(instance.values, solution.picked) if p)
+
+
+def make_instance(size: int, seed: int = 0) -> Instance:
+    rng = random.Random(seed)
+    return Instance(
+        values=[rng.uniform(1, 100) for _ in range(size)],
+        weights=[rng.uniform(1, 100) for _ in range(size)],
+        capacity=size * 10.0,
+    )
+
+
+def decorate(**kwargs):
+    return algorithm(
+        name="benchmark",
+        feasibility_function=feasibility,
+        scoring_function=scoring,
+        api_key="test_key",
+        is_minimization=False,
+        **kwargs,
+    )(greedy)
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_undecorated_call(benchmark, size):
+    benchmark(greedy, make_instance(size))
+
+
+@pytest.mark.parametrize("background_uploads", [False, True])
+@pytest.mark.parametrize("size", SIZES)
+def test_decorated_call(benchmark, algobench_server, size, background_uploads):
+    algobench_server()
+    solve = decorate(background_uploads=background_uploads)
+    instance = make_instance(size)
+
+    benchmark(solve, instance)
+    if background_uploads:
+        solve.flush()
+    benchmark.extra_info["stats"] = solve.stats()["spans"]
+
+
+@pytest.mark.parametrize("max_workers", [1, 8])
+def test_batch_throughput(benchmark, algobench_server, max_workers):
+    algobench_server(latency=0.01)
+    solve = decorate()
+    instances = [make_instance(100, seed) for seed in range(32)]
+
+    benchmark.pedantic(solve.batch, args=(instances, max_workers), rounds=3)
+    # There are no stats with --benchmark-disable.
+    if benchmark.stats is not None:
+        benchmark.extra_info["instances_per_second"] = len(instances) / benchmark.stats["mean"]
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_memory_per_call(benchmark, algobench_server, size):
+    algobench_server()
+    solve = decorate()
+    instance = make_instance(size)
+    solve(instance)
+
+    tracemalloc.start()
+    bare_peak = measure_peak(greedy, instance)
+    decorated_peak = measure_peak(solve, instance)
+    tracemalloc.stop()
+
+    benchmark.extra_info["peak_bytes"] = decorated_peak
+    benchmark.extra_info["overhead_bytes"] = decorated_peak - bare_peak
+    benchmark.pedantic(solve, args=(instance,), rounds=5)
+
+
+def measure_peak(function, *args) -> int:
+    tracemalloc.reset_peak()
+    start = tracemalloc.get_traced_memory()[0]
+    function(*args)
+    return tracemalloc.get_traced_memory()[1] - start
+
+
+@pytest.mark.parametrize("codec", sorted(CODECS))
+@pytest.mark.parametrize("size", [100, 10000, 100000])
+def test_serialization(benchmark, size, codec):
+    instance = make_instance(size)
+    data = benchmark(encode, instance, codec)
+    benchmark.extra_info["bytes"] = len(data)
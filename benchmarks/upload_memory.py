@@ -0,0 +1,53 @@
+# Compares the peak memory of preparing and sending an instance upload with and without stream_uploads.
+# Nothing is sent over the network; the request body is prepared by requests and drained in place.
+# Run with: python -m benchmarks.upload_memory --items 200000
+import argparse
+import tracemalloc
+
+import requests
+
+from algobench.api_client import APIClient
+
+from .codecs import make_instance
+
+
+class DrainingSession:
+    def request(self, method, url, data=None, headers=None, **kwargs):
+        body = requests.Request(method, url, data=data, headers=headers).prepare().body
+        if isinstance(body, (str, bytes)):
+            sent = len(body)
+        else:
+            sent = sum(len(chunk) for chunk in body)
+        response = requests.Response()
+        response.status_code = 201
+        response._content = b'{"id": "%d"}' % sent
+        return response
+
+    def close(self):
+        pass
+
+
+def peak_memory(instance, stream_uploads: bool) -> tuple[int, str]:
+    api_client = APIClient(api_key="benchmark", env_name="benchmark", problem_id="1", stream_uploads=stream_uploads)
+    api_client._session = DrainingSession()
+    tracemalloc.start()
+    sent = api_client.upload_instance(instance)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak, sent
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=200000)
+    args = parser.parse_args()
+
+    instance = make_instance(args.items)
+    print(f"{'stream_uploads':<16}{'body bytes':>14}{'peak MiB':>12}")
+    for stream_uploads in [False, True]:
+        peak, sent = peak_memory(instance, stream_uploads)
+        print(f"{str(stream_uploads):<16}{sent:>14}{peak / 2**20:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -115,6 +115,7 @@ def test_full_decorator_flow_with_solution_pull():
         api_key=API_KEY,
         is_minimization=False,
         additional_wait_seconds=30,
+        target_score=9,
     )(my_algorithm)
 
     time.sleep(1)
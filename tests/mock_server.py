@@ -0,0 +1,206 @@
+import itertools
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from algobench.delta import apply_diff
+
+
+class MockServer:
+    # In-memory stand-in for the algobench API used by integration tests and benchmarks. Implements the
+    # problem, instance, solution, best solution and best algorithm endpoints the SDK uses, with a fixed latency
+    # per request. While unavailable is set, every request fails with 503. JSON Patch solution diffs are only
+    # understood, and advertised in every response, with solution_diffs; otherwise they are stored as content,
+    # like a server ignoring unknown fields would.
+
+    def __init__(self, api_key: str = "test_key", latency: float = 0.0, solution_diffs: bool = False):
+        self.api_key = api_key
+        self.latency = latency
+        self.solution_diffs = solution_diffs
+        self.unavailable = False
+        self.problems = {}
+        self.instances = {}
+        self.solutions = {}
+        self.algorithms = {}
+        self.requests = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), handler(self))
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockServer":
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, args=(0.05,), name="mock-algobench", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def add_solution(self, instance_id: str, content: str, score: float, feasible: bool = True) -> str:
+        # Simulates a solution found by algobench itself.
+        with self._lock:
+            solution_id = str(next(self._ids))
+            self.solutions[solution_id] = {
+                "id": solution_id,
+                "instance": instance_id,
+                "content": content,
+                "feasible": feasible,
+                "score": score,
+            }
+            return solution_id
+
+    def add_algorithm(self, problem_id: str, code: str, function_name: str) -> str:
+        # Simulates an algorithm evolved by algobench for the problem.
+        with self._lock:
+            algorithm_id = str(next(self._ids))
+            self.algorithms[problem_id] = {
+                "id": algorithm_id,
+                "problem": problem_id,
+                "code": code,
+                "algorithm_function_name": function_name,
+            }
+            return algorithm_id
+
+    def handle(self, method: str, path: str, query: dict, data: dict) -> tuple[int, object]:
+        with self._lock:
+            if re.fullmatch(r"/api/problems/?", path) and method == "GET":
+                name = query.get("name", [None])[0]
+                return 200, [problem for problem in self.problems.values() if name in (None, problem["name"])]
+            if path == "/api/problems/" and method == "POST":
+                problem_id = str(next(self._ids))
+                self.problems[problem_id] = {**data, "id": problem_id}
+                return 201, {"id": problem_id}
+            if match := re.fullmatch(r"/api/problems/(\w+)/best_algorithm/", path):
+                if match.group(1) not in self.algorithms:
+                    return 404, {"detail": "No algorithm."}
+                return 200, self.algorithms[match.group(1)]
+            if match := re.fullmatch(r"/api/problems/(\w+)/", path):
+                if match.group(1) not in self.problems or method != "PUT":
+                    return 404, {"detail": "Not found."}
+                self.problems[match.group(1)].update(data)
+                return 200, self.problems[match.group(1)]
+            if path == "/api/instances/" and method == "POST":
+                if data.get("problem") not in self.problems:
+                    return 400, {"problem": "Unknown problem."}
+                instance_id = str(next(self._ids))
+                self.instances[instance_id] = {
+                    "id": instance_id,
+                    "problem": data["problem"],
+                    "content": data["content"],
+                }
+                return 201, {"id": instance_id}
+            if path == "/api/solutions/" and method == "POST":
+                return self._create_solution(data)
+            if match := re.fullmatch(r"/api/instances/(\w+)/best_solution/", path):
+                return self._best_solution(match.group(1))
+            return 404, {"detail": "Not found."}
+
+    def _create_solution(self, data: dict) -> tuple[int, object]:
+        if data.get("instance") not in self.instances:
+            return 400, {"instance": "Unknown instance."}
+        content = data["content"]
+        is_diff = self.solution_diffs and data.get("content_encoding") == "json-patch"
+        if is_diff:
+            base = self.solutions.get(data.get("base_solution"))
+            if base is None:
+                return 400, {"base_solution": "Unknown solution."}
+            content = json.dumps(apply_diff(json.loads(base["content"]), json.loads(content)))
+        solution_id = str(next(self._ids))
+        self.solutions[solution_id] = {
+            "id": solution_id,
+            "instance": data["instance"],
+            "content": content,
+            "feasible": data["feasible"] == "True",
+            "score": float(data["score"]),
+            "diff": is_diff,
+        }
+        return 201, {"id": solution_id}
+
+    def _best_solution(self, instance_id: str) -> tuple[int, object]:
+        if instance_id not in self.instances:
+            return 404, {"detail": "Not found."}
+        is_minimization = self.problems[self.instances[instance_id]["problem"]]["is_minimization"]
+        candidates = [s for s in self.solutions.values() if s["instance"] == instance_id and s["feasible"]]
+        if not candidates:
+            return 404, {"detail": "No solution."}
+        best = (min if is_minimization else max)(candidates, key=lambda solution: solution["score"])
+        return 200, best
+
+
+def handler(server: MockServer) -> type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            self.respond()
+
+        def do_POST(self):
+            self.respond()
+
+        def do_PUT(self):
+            self.respond()
+
+        def respond(self):
+            body = self.read_body()
+            url = urlparse(self.path)
+            server.requests.append((self.command, url.path))
+            if server.latency:
+                time.sleep(server.latency)
+            if server.unavailable:
+                status, payload = 503, {"detail": "Service unavailable."}
+            elif self.headers.get("Authorization") != f"ApiKey {server.api_key}":
+                status, payload = 403, {"detail": "Invalid API key."}
+            else:
+                status, payload = server.handle(self.command, url.path, parse_qs(url.query), self.parse(body))
+            encoded = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            if server.solution_diffs:
+                self.send_header("X-Algobench-Solution-Encodings", "json, json-patch")
+            self.send_header("Content-Length", str(len(encoded)))
+            self.end_headers()
+            self.wfile.write(encoded)
+
+        def read_body(self) -> bytes:
+            if self.headers.get("Transfer-Encoding", "").lower() != "chunked":
+                return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            chunks = []
+            while size := int(self.rfile.readline().split(b";")[0], 16):
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+            self.rfile.readline()
+            return b"".join(chunks)
+
+        def parse(self, body: bytes) -> dict:
+            content_type = self.headers.get("Content-Type", "")
+            if content_type.startswith("application/json"):
+                return json.loads(body)
+            if content_type.startswith("application/x-www-form-urlencoded"):
+                return {
+                    key: values[0] for key, values in parse_qs(body.decode("ascii"), keep_blank_values=True).items()
+                }
+            return {}
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
@@ -0,0 +1,22 @@
+# Decorated at import time, like a user's solver module. Imported by the multiprocessing tests once the mock
+# server is running; worker processes import it again when they unpickle solve.
+from algobench import algorithm
+
+
+def half_feasibility(x: list[int], y: list[int]) -> bool:
+    return len(y) <= len(x)
+
+
+def half_scoring(x: list[int], y: list[int]) -> float:
+    return sum(y)
+
+
+@algorithm(
+    name="process_solver",
+    feasibility_function=half_feasibility,
+    scoring_function=half_scoring,
+    api_key="test_key",
+    is_minimization=False,
+)
+def solve(x: list[int]) -> list[int]:
+    return sorted(x)[len(x) // 2 :]
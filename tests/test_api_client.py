@@ -1,22 +1,32 @@
+import asyncio
+import gc
+import socket
+from concurrent.futures import ThreadPoolExecutor
+import time
 import pytest
 import json
-from unittest.mock import patch
+import requests
+from unittest.mock import Mock, patch
+from urllib.parse import parse_qs
 
-from algobench.api_client import APIClient
+from algobench.api_client import APIClient, AsyncAPIClient, FormStream, UploadRejectedError
+from algobench.cache import DiskCache
+from algobench.circuit_breaker import AdaptiveTimeouts, CircuitBreaker, CircuitOpenError
+from algobench.file_handling import JSONStream, content_hash, convert_to_json
+from algobench.instrumentation import Instrumentation
 
 
 @pytest.fixture
-def mock_requests():
-    with patch("algobench.api_client.requests") as mock_req:
-        yield mock_req
+def mock_session():
+    with patch("algobench.api_client.requests.Session") as mock_session_class:
+        yield mock_session_class.return_value
 
 
 @pytest.fixture
-def api_client(mock_requests):
-    with patch("algobench.api_client.requests") as mock_req:
-        mock_req.get.return_value.status_code = 200
-        client = APIClient(api_key="test_key", env_name="test_env")
-        return client
+def api_client(mock_session):
+    mock_session.request.return_value.status_code = 200
+    client = APIClient(api_key="test_key", env_name="test_env")
+    return client
 
 
 class SampleClass:
@@ -42,65 +52,75 @@ def test_check_api_key_empty():
     assert client.login() is False
 
 
-def test_check_api_key_invalid():
-    with patch("algobench.api_client.requests") as mock_req:
-        mock_req.get.return_value.status_code = 401
-        client = APIClient(api_key="invalid_key", env_name="test_env")
-        assert client.login() is False
+def test_check_api_key_invalid(mock_session):
+    mock_session.request.return_value.status_code = 401
+    client = APIClient(api_key="invalid_key", env_name="test_env")
+    assert client.login() is False
 
 
-def test_check_api_key_valid():
-    with patch("algobench.api_client.requests") as mock_req:
-        mock_req.get.return_value.status_code = 200
-        client = APIClient(api_key="valid_key", env_name="test_env")
-        assert client.login() is True
+def test_check_api_key_valid(mock_session):
+    mock_session.request.return_value.status_code = 200
+    client = APIClient(api_key="valid_key", env_name="test_env")
+    assert client.login() is True
 
 
-def test_upload_input_single_arg(api_client, mock_requests):
+def test_upload_input_single_arg(api_client, mock_session):
     instance = SampleClass()
-    mock_requests.post.return_value.status_code = 201
-    mock_requests.post.return_value.json.return_value = {"id": "test_id"}
+    mock_session.request.return_value.status_code = 201
+    mock_session.request.return_value.json.return_value = {"id": "test_id"}
 
     instance_id = api_client.upload_instance(instance)
 
     assert instance_id == "test_id"
-    mock_requests.post.assert_called_once()
+    mock_session.request.assert_called_once()
 
 
-def test_upload_input_failed_request(api_client, mock_requests):
+def test_upload_input_failed_request(api_client, mock_session):
     instance = SampleClass()
-    mock_requests.post.return_value.status_code = 400
-    mock_requests.post.return_value.json.return_value = {"error": "test error"}
+    mock_session.request.return_value.status_code = 400
+    mock_session.request.return_value.json.return_value = {"error": "test error"}
 
     instance_id = api_client.upload_instance(instance)
 
     assert instance_id is None
-    mock_requests.post.assert_called_once()
+    mock_session.request.assert_called_once()
 
 
-def test_upload_solution_success(api_client, mock_requests):
+def test_upload_solution_success(api_client, mock_session):
     result = SampleClass()
-    mock_requests.post.return_value.status_code = 201
-    mock_requests.post.return_value.json.return_value = {"id": "result_id"}
+    mock_session.request.return_value.status_code = 201
+    mock_session.request.return_value.json.return_value = {"id": "result_id"}
 
     result_id = api_client.upload_solution(result, "test_instance_id", True, 1.0)
 
     assert result_id == "result_id"
-    mock_requests.post.assert_called_once()
+    mock_session.request.assert_called_once()
 
 
-def test_upload_solution_failed_request(api_client, mock_requests):
+def test_upload_solution_failed_request(api_client, mock_session):
     result = SampleClass()
-    mock_requests.post.return_value.status_code = 400
-    mock_requests.post.return_value.json.return_value = {"error": "test error"}
+    mock_session.request.return_value.status_code = 400
+    mock_session.request.return_value.json.return_value = {"error": "test error"}
 
     result_id = api_client.upload_solution(result, "test_instance_id", True, 1.0)
 
     assert result_id is None
-    mock_requests.post.assert_called_once()
+    mock_session.request.assert_called_once()
+
+
+def test_upload_solution_delta(api_client, mock_session):
+    mock_session.request.return_value.status_code = 201
+    mock_session.request.return_value.json.return_value = {"id": "delta_id"}
+
+    assert api_client.upload_solution_delta("[]", "base_id", "test_instance_id", True, 1.0) == "delta_id"
 
+    data = mock_session.request.call_args.kwargs["data"]
+    assert data["content_encoding"] == "json-patch"
+    assert data["base_solution"] == "base_id"
+    assert data["content"] == "[]"
 
-def test_upload_problem(api_client, mock_requests):
+
+def test_upload_problem(api_client, mock_session):
     def test_algo(x):
         return x
 
@@ -110,12 +130,13 @@ def test_upload_problem(api_client, mock_requests):
     def test_scoring(x):
         return x
 
-    mock_requests.get.return_value.status_code = 200
-    mock_requests.get.return_value.json.return_value = []
+    mock_session.request.return_value.status_code = 200
+    mock_session.request.return_value.json.return_value = []
     api_client.upload_problem(test_algo, test_feasibility, test_scoring, True)
 
-    mock_requests.post.assert_called_once()
-    called_json = mock_requests.post.call_args.kwargs["json"]
+    mock_session.request.assert_called_once()
+    assert mock_session.request.call_args.args[0] == "POST"
+    called_json = mock_session.request.call_args.kwargs["json"]
     assert "python_version" in called_json
     assert "code" in called_json
     assert "algorithm_function_name" in called_json
@@ -124,7 +145,7 @@ def test_upload_problem(api_client, mock_requests):
     assert "name" in called_json
 
 
-def test_update_problem(api_client, mock_requests):
+def test_update_problem(api_client, mock_session):
     def test_algo(x):
         return x
 
@@ -134,12 +155,13 @@ def test_update_problem(api_client, mock_requests):
     def test_scoring(x):
         return x
 
-    mock_requests.get.return_value.status_code = 200
-    mock_requests.get.return_value.json.return_value = [{"id": "test_id", "name": "test_env"}]
+    mock_session.request.return_value.status_code = 200
+    mock_session.request.return_value.json.return_value = [{"id": "test_id", "name": "test_env"}]
     api_client.problem_id = "test_id"
     api_client.upload_problem(test_algo, test_feasibility, test_scoring, True)
-    mock_requests.put.assert_called_once()
-    called_json = mock_requests.put.call_args.kwargs["json"]
+    mock_session.request.assert_called_once()
+    assert mock_session.request.call_args.args[0] == "PUT"
+    called_json = mock_session.request.call_args.kwargs["json"]
     assert "python_version" in called_json
     assert "code" in called_json
     assert "algorithm_function_name" in called_json
@@ -148,9 +170,9 @@ def test_update_problem(api_client, mock_requests):
     assert "name" in called_json
 
 
-def test_login(api_client, mock_requests):
-    mock_requests.get.return_value.status_code = 200
-    mock_requests.get.return_value.json.return_value = [
+def test_login(api_client, mock_session):
+    mock_session.request.return_value.status_code = 200
+    mock_session.request.return_value.json.return_value = [
         {"name": "test_env", "id": "123"},
         {"name": "other_env", "id": "456"},
     ]
@@ -158,9 +180,9 @@ def test_login(api_client, mock_requests):
     assert api_client.problem_id == "123"
 
 
-def test_pull_solution(api_client, mock_requests):
-    mock_requests.get.return_value.status_code = 200
-    mock_requests.get.return_value.json.return_value = {
+def test_pull_solution(api_client, mock_session):
+    mock_session.request.return_value.status_code = 200
+    mock_session.request.return_value.json.return_value = {
         "id": "test_id",
         "content": {"data": "pull_solution_test_content"},
     }
@@ -168,6 +190,381 @@ def test_pull_solution(api_client, mock_requests):
     assert solution.data == "pull_solution_test_content"
 
 
-def test_no_connection(api_client, mock_requests):
-    # mock_requests.get.side_effect = requests.exceptions.ConnectionError
+def test_no_connection(api_client, mock_session):
+    mock_session.request.side_effect = requests.exceptions.ConnectionError
     assert api_client.login() is False
+
+
+def test_session_is_reused(api_client, mock_session):
+    mock_session.request.return_value.status_code = 201
+    mock_session.request.return_value.json.return_value = {"id": "test_id"}
+
+    api_client.upload_instance(SampleClass())
+    api_client.upload_solution(SampleClass(), "test_id", True, 1.0)
+
+    assert api_client.session is mock_session
+    assert mock_session.request.call_count == 2
+    for call in mock_session.request.call_args_list:
+        assert call.kwargs["timeout"] == (api_client.connect_timeout, api_client.read_timeout)
+
+
+def test_requests_are_counted(api_client, mock_session):
+    response = mock_session.request.return_value
+    response.status_code = 201
+    response.json.return_value = {"id": "test_id"}
+    response.request.body = "content=%7B%7D"
+    response.content = b'{"id": "test_id"}'
+    response.raw.retries.history = (Mock(), Mock())
+
+    with Instrumentation("test").call() as record:
+        api_client.upload_solution(SampleClass(), "test_id", True, 1.0)
+
+    assert record.counters == {"requests": 1, "bytes_sent": 14, "bytes_received": 17, "retries": 2}
+
+
+def test_session_pool_and_retry_configuration():
+    client = APIClient(api_key="test_key", env_name="test_env", pool_size=4, max_retries=2)
+    adapter = client.session.get_adapter("https://algobench.io")
+
+    assert adapter._pool_maxsize == 4
+    assert adapter.max_retries.total == 2
+    assert "POST" not in adapter.max_retries.allowed_methods
+    assert client.session.headers["Authorization"] == "ApiKey test_key"
+    client.close()
+
+
+def test_close_via_context_manager(mock_session):
+    with APIClient(api_key="test_key", env_name="test_env") as client:
+        assert client.session is mock_session
+
+    mock_session.close.assert_called_once()
+    assert client._session is None
+
+
+def test_wait_for_solution_returns_first_accepted(api_client, mock_session):
+    records = [
+        Mock(status_code=404),
+        Mock(status_code=200, json=Mock(return_value={"id": "1", "content": {"data": "worse"}})),
+        Mock(status_code=200, json=Mock(return_value={"id": "1", "content": {"data": "worse"}})),
+        Mock(status_code=200, json=Mock(return_value={"id": "2", "content": {"data": "better"}})),
+    ]
+    mock_session.request.side_effect = records
+    seen = []
+
+    def accept(solution):
+        seen.append(solution.data)
+        return solution.data == "better"
+
+    solution = api_client.wait_for_solution("test_instance_id", SampleClass, accept, timeout=5, poll_interval=0.001)
+
+    assert solution.data == "better"
+    assert seen == ["worse", "better"]
+    assert mock_session.request.call_count == 4
+
+
+def test_wait_for_solution_times_out(api_client, mock_session):
+    mock_session.request.return_value.status_code = 404
+
+    solution = api_client.wait_for_solution("test_instance_id", SampleClass, lambda s: True, timeout=0.05)
+
+    assert solution is None
+    assert mock_session.request.call_count >= 1
+
+
+def test_async_wait_for_solution_stops_on_event(api_client, mock_session):
+    mock_session.request.return_value.status_code = 404
+    async_client = AsyncAPIClient(api_client)
+
+    async def wait_with_stop():
+        stop = asyncio.Event()
+        asyncio.get_running_loop().call_later(0.05, stop.set)
+        start = time.monotonic()
+        solution = await async_client.wait_for_solution(
+            "test_instance_id", SampleClass, lambda s: True, timeout=5, stop=stop
+        )
+        return solution, time.monotonic() - start
+
+    solution, elapsed = asyncio.run(wait_with_stop())
+
+    assert solution is None
+    assert elapsed < 1
+
+
+def test_async_upload_instance(api_client, mock_session):
+    mock_session.request.return_value.status_code = 201
+    mock_session.request.return_value.json.return_value = {"id": "test_id"}
+
+    instance_id = asyncio.run(AsyncAPIClient(api_client).upload_instance(SampleClass()))
+
+    assert instance_id == "test_id"
+
+
+def test_upload_instance_deduplicated(mock_session, tmp_path):
+    mock_session.request.return_value.status_code = 201
+    mock_session.request.return_value.json.return_value = {"id": 42}
+    instance_cache = DiskCache(str(tmp_path / "instances.sqlite"))
+    client = APIClient(api_key="test_key", env_name="test_env", problem_id="1", instance_cache=instance_cache)
+
+    assert client.upload_instance(SampleClass("a")) == 42
+    assert client.upload_instance(SampleClass("a")) == 42
+    assert mock_session.request.call_count == 1
+
+    mock_session.request.return_value.json.return_value = {"id": 43}
+    assert client.upload_instance(SampleClass("b")) == 43
+    assert mock_session.request.call_count == 2
+
+
+def problem_functions():
+    def test_algo(x):
+        return x
+
+    def test_feasibility(x):
+        return True
+
+    def test_scoring(x):
+        return x
+
+    return test_algo, test_feasibility, test_scoring
+
+
+def test_upload_problem_skipped_when_fingerprint_cached(mock_session, tmp_path):
+    problem_cache = DiskCache(str(tmp_path / "problems.sqlite"))
+    client = APIClient(api_key="test_key", env_name="test_env", problem_id="test_id", problem_cache=problem_cache)
+    mock_session.request.return_value.status_code = 200
+
+    client.upload_problem(*problem_functions(), True)
+    client.upload_problem(*problem_functions(), True)
+    assert mock_session.request.call_count == 1
+    assert "fingerprint" in mock_session.request.call_args.kwargs["json"]
+
+    client.upload_problem(*problem_functions(), False)
+    assert mock_session.request.call_count == 2
+
+
+def test_upload_problem_skipped_when_server_fingerprint_matches(mock_session):
+    client = APIClient(api_key="test_key", env_name="test_env")
+    mock_session.request.return_value.status_code = 200
+    mock_session.request.return_value.json.return_value = [{"id": "test_id", "name": "test_env"}]
+    client.login()
+
+    client.upload_problem(*problem_functions(), True)
+    fingerprint = mock_session.request.call_args.kwargs["json"]["fingerprint"]
+    assert mock_session.request.call_count == 2
+
+    mock_session.request.return_value.json.return_value = [{"id": "test_id", "fingerprint": fingerprint}]
+    client.login()
+    client.upload_problem(*problem_functions(), True)
+    assert mock_session.request.call_count == 3
+
+
+def test_upload_problem_when_server_fingerprint_differs_from_cached(mock_session, tmp_path):
+    problem_cache = DiskCache(str(tmp_path / "problems.sqlite"))
+    client = APIClient(api_key="test_key", env_name="test_env", problem_id="test_id", problem_cache=problem_cache)
+    mock_session.request.return_value.status_code = 200
+    client.upload_problem(*problem_functions(), True)
+
+    mock_session.request.return_value.json.return_value = [{"id": "test_id", "fingerprint": "someone-elses-v2"}]
+    client.login()
+    client.upload_problem(*problem_functions(), True)
+
+    assert mock_session.request.call_args.args[0] == "PUT"
+    assert client.server_fingerprint != "someone-elses-v2"
+
+
+def test_content_format_negotiated_at_login(mock_session):
+    pytest.importorskip("msgpack")
+    mock_session.request.return_value.status_code = 200
+    mock_session.request.return_value.json.return_value = []
+    mock_session.request.return_value.headers = {"X-Algobench-Content-Formats": "json+gzip, msgpack+gzip"}
+    client = APIClient(api_key="test_key", env_name="test_env", codec="msgpack", compression="gzip")
+    assert client.login()
+    assert client.content_format == ("msgpack", "gzip")
+
+    mock_session.request.return_value.status_code = 201
+    mock_session.request.return_value.json.return_value = {"id": "test_id"}
+    assert client.upload_instance(SampleClass()) == "test_id"
+    kwargs = mock_session.request.call_args.kwargs
+    assert kwargs["data"]["content_codec"] == "msgpack"
+    assert kwargs["files"]["content"][2] == "application/msgpack"
+
+
+def test_content_format_falls_back_to_json(mock_session):
+    mock_session.request.return_value.status_code = 200
+    mock_session.request.return_value.json.return_value = []
+    mock_session.request.return_value.headers = {}
+    client = APIClient(api_key="test_key", env_name="test_env", codec="msgpack", compression="gzip")
+    assert client.login()
+    assert client.content_format is None
+
+    mock_session.request.return_value.status_code = 201
+    mock_session.request.return_value.json.return_value = {"id": "test_id"}
+    client.upload_instance(SampleClass())
+    assert mock_session.request.call_args.kwargs["data"]["content"] == '{"data": "test"}'
+
+
+@pytest.mark.parametrize("advertised, solution_diffs", [(None, False), ("json, json-patch", True)])
+def test_solution_diffs_negotiated_at_login(mock_session, advertised, solution_diffs):
+    mock_session.request.return_value.status_code = 200
+    mock_session.request.return_value.json.return_value = [{"id": "problem_id"}]
+    mock_session.request.return_value.headers = (
+        {} if advertised is None else {"X-Algobench-Solution-Encodings": advertised}
+    )
+    client = APIClient(api_key="test_key", env_name="test_env")
+
+    assert not client.solution_diffs
+    assert client.login()
+    assert client.solution_diffs == solution_diffs
+    assert client.registration().solution_diffs == solution_diffs
+
+
+def test_form_stream_matches_form_encoding():
+    content = '{"data": "a & b = c", "values": [1, 2, 3]}'
+    stream = FormStream({"problem": "1", "skipped": None}, "content", [content[:10], content[10:]])
+
+    body = b"".join(stream).decode("ascii")
+
+    assert parse_qs(body) == {"problem": ["1"], "content": [content]}
+    assert b"".join(stream).decode("ascii") == body
+
+
+def test_streamed_upload(api_client, mock_session):
+    api_client.stream_uploads = True
+    mock_session.request.return_value.status_code = 201
+    mock_session.request.return_value.json.return_value = {"id": "test_id"}
+
+    assert api_client.upload_instance(SampleClass("streamed")) == "test_id"
+
+    kwargs = mock_session.request.call_args.kwargs
+    assert isinstance(kwargs["data"], FormStream)
+    assert kwargs["headers"]["Content-Type"] == "application/x-www-form-urlencoded"
+    assert parse_qs(b"".join(kwargs["data"]).decode("ascii"))["content"] == ['{"data": "streamed"}']
+
+
+def test_streamed_content_hash_matches_json():
+    instance = SampleClass("hashed")
+    assert content_hash(JSONStream(instance, chunk_size=4)) == content_hash(convert_to_json(instance))
+
+
+def test_per_thread_sessions(mock_session):
+    sessions = [Mock(), Mock()]
+    client = APIClient(api_key="test_key", env_name="test_env", per_thread_sessions=True)
+
+    with patch("algobench.api_client.requests.Session", side_effect=sessions):
+        main_session = client.session
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            worker_session = executor.submit(lambda: client.session).result()
+
+    assert client.session is main_session
+    assert {id(main_session), id(worker_session)} == {id(session) for session in sessions}
+    client.close()
+    for session in sessions:
+        session.close.assert_called_once()
+
+
+def test_concurrent_problem_upload_creates_problem_once(api_client, mock_session):
+    def test_algo(x):
+        return x
+
+    def test_feasibility(x):
+        return True
+
+    def test_scoring(x):
+        return 1
+
+    def create(*args, **kwargs):
+        time.sleep(0.01)
+        return Mock(status_code=201, json=Mock(return_value={"id": "problem_id"}))
+
+    mock_session.request.side_effect = create
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        for _ in range(8):
+            executor.submit(api_client.upload_problem, test_algo, test_feasibility, test_scoring, True)
+
+    assert api_client.problem_id == "problem_id"
+    assert [call.args[0] for call in mock_session.request.call_args_list] == ["POST"]
+
+
+def test_requests_are_rejected_while_circuit_is_open(mock_session):
+    client = APIClient(api_key="test_key", env_name="test_env", circuit_breaker=CircuitBreaker(failure_threshold=2))
+    mock_session.request.side_effect = requests.exceptions.ConnectionError
+    mock_session.request.return_value.status_code = 503
+
+    assert not client.login()
+    with pytest.raises(requests.exceptions.ConnectionError):
+        client.upload_instance(SampleClass())
+    assert not client.reachable()
+    with pytest.raises(CircuitOpenError):
+        client.upload_instance(SampleClass())
+    assert not client.login()
+
+    assert mock_session.request.call_count == 2
+
+
+def test_server_errors_trip_the_circuit_and_latencies_set_timeouts(api_client, mock_session):
+    api_client.timeouts = AdaptiveTimeouts(min_samples=1, min_timeout=5.0)
+    api_client.fetch_best_solution("instance_id")
+
+    assert mock_session.request.call_args.kwargs["timeout"] == (api_client.connect_timeout, api_client.read_timeout)
+    api_client.fetch_best_solution("other_instance_id")
+    assert mock_session.request.call_args.kwargs["timeout"] == (api_client.connect_timeout, 5.0)
+
+    mock_session.request.return_value.status_code = 500
+    for _ in range(api_client.circuit_breaker.failure_threshold):
+        api_client.fetch_best_solution("instance_id")
+    assert api_client.circuit_breaker.state == "open"
+
+
+def test_sessions_of_finished_threads_are_closed(mock_session):
+    client = APIClient(api_key="test_key", env_name="test_env", per_thread_sessions=True)
+
+    with patch("algobench.api_client.requests.Session", side_effect=lambda: Mock()):
+        for _ in range(3):
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                sessions = list(executor.map(lambda _: client.session, range(4)))
+            del executor
+            gc.collect()
+            assert not client._thread_sessions
+            for session in sessions:
+                session.close.assert_called_once()
+
+
+def test_polls_are_bounded_by_the_wait(monkeypatch):
+    # The listening socket completes connections but never answers.
+    with socket.socket() as silent:
+        silent.bind(("127.0.0.1", 0))
+        silent.listen(8)
+        monkeypatch.setenv("ALGOBENCH_URL", f"http://127.0.0.1:{silent.getsockname()[1]}")
+        client = APIClient(api_key="test_key", env_name="test_env", read_timeout=5.0, min_poll_timeout=0.2)
+
+        started = time.monotonic()
+        with pytest.raises(requests.exceptions.Timeout):
+            client.wait_for_solution("instance_id", list, lambda solution: True, timeout=0)
+        assert time.monotonic() - started < 1.0
+        client.close()
+
+
+def test_uploads_keep_the_configured_read_timeout(api_client, mock_session):
+    api_client.timeouts = AdaptiveTimeouts(min_samples=1, min_timeout=1.0)
+    api_client.problem_id = "problem_id"
+    mock_session.request.return_value.status_code = 201
+    mock_session.request.return_value.json.return_value = {"id": "instance_id"}
+
+    for _ in range(3):
+        api_client.upload_instance_content('{"data": "small"}')
+
+    assert mock_session.request.call_args.kwargs["timeout"] == (api_client.connect_timeout, api_client.read_timeout)
+    assert APIClient(api_key="test_key", env_name="test_env").timeouts is None
+
+
+def test_rejected_uploads_raise_when_asked(api_client, mock_session):
+    api_client.problem_id = "problem_id"
+    mock_session.request.return_value.status_code = 413
+    mock_session.request.return_value.text = "too large"
+
+    assert api_client.upload_instance_content('{"data": "large"}') is None
+    with pytest.raises(UploadRejectedError) as e:
+        api_client.upload_instance_content('{"data": "large"}', raise_rejected=True)
+    assert e.value.status_code == 413
+
+    mock_session.request.return_value.status_code = 503
+    assert api_client.upload_solution_content("[1]", "instance_id", True, 1.0, raise_rejected=True) is None
@@ -0,0 +1,57 @@
+import time
+
+from algobench.cache import CachedSolution, DiskCache, SolutionCache
+
+
+def test_set_and_get(tmp_path):
+    cache = DiskCache(str(tmp_path / "cache.sqlite"))
+    cache.set("key", "value")
+
+    assert cache.get("key") == "value"
+    assert cache.get("missing") is None
+
+
+def test_persists_across_instances(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    DiskCache(path).set("key", "value")
+
+    assert DiskCache(path).get("key") == "value"
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = DiskCache(str(tmp_path / "cache.sqlite"), max_entries=2)
+    cache.set("a", "1")
+    time.sleep(0.01)
+    cache.set("b", "2")
+    time.sleep(0.01)
+    cache.get("a")
+    time.sleep(0.01)
+    cache.set("c", "3")
+
+    assert len(cache) == 2
+    assert cache.get("a") == "1"
+    assert cache.get("b") is None
+    assert cache.get("c") == "3"
+
+
+def test_expires_after_ttl(tmp_path):
+    cache = DiskCache(str(tmp_path / "cache.sqlite"), ttl_seconds=0.05)
+    cache.set("key", "value")
+    time.sleep(0.1)
+
+    assert cache.get("key") is None
+
+
+def test_solution_cache_round_trip_and_staleness(tmp_path):
+    cache = SolutionCache(DiskCache(str(tmp_path / "solutions.sqlite")), stale_after=0.05)
+    cache.put("key", CachedSolution("instance_id", '{"value": 1}', True, 1.0))
+
+    cached = cache.get("key")
+    assert cached.instance_id == "instance_id"
+    assert cached.content == '{"value": 1}'
+    assert cached.score == 1.0
+    assert not cache.is_stale(cached)
+
+    time.sleep(0.1)
+    assert cache.is_stale(cache.get("key"))
+    assert cache.get("missing") is None
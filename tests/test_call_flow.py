@@ -0,0 +1,68 @@
+import asyncio
+import threading
+from unittest.mock import Mock
+
+import pytest
+
+from algobench.call_flow import AsyncCallFlow, SyncCallFlow
+from algobench.evaluation import Evaluator
+from algobench.improvement import Objective, ScoreTrust
+from algobench.uploader import resolved_future
+
+
+def feasible(instance, solution) -> bool:
+    return len(instance) == len(solution)
+
+
+def length(instance, solution) -> float:
+    return len(solution)
+
+
+def reverse(x: list[int]) -> list[int]:
+    return x[::-1]
+
+
+async def reverse_async(x: list[int]) -> list[int]:
+    return x[::-1]
+
+
+def make_flow(kind, algorithm_function, api_client):
+    evaluator = Evaluator(feasible, length)
+    return kind(
+        algorithm_function, "test", api_client, evaluator, Objective(True), ScoreTrust(), list[int], threading.Event()
+    )
+
+
+def run(flow, steps):
+    if isinstance(flow, AsyncCallFlow):
+        return asyncio.run(flow.run(steps))
+    return flow.run(steps)
+
+
+@pytest.fixture(params=[(SyncCallFlow, reverse), (AsyncCallFlow, reverse_async)], ids=["sync", "async"])
+def flow_kind(request):
+    return request.param
+
+
+def test_steps_get_what_they_waited_for(flow_kind):
+    kind, algorithm_function = flow_kind
+    api_client = Mock()
+    api_client.upload_solution.return_value = "solution_id"
+    flow = make_flow(kind, algorithm_function, api_client)
+
+    assert run(flow, flow.resolve_instance_id(resolved_future("instance_id"), 1)) == "instance_id"
+    best = run(flow, flow.solve_and_upload([1, 2, 3], resolved_future("instance_id"), ([1, 2, 3],), {}))
+
+    assert best == ([3, 2, 1], True, 3)
+    api_client.upload_solution.assert_called_once_with([3, 2, 1], "instance_id", True, 3)
+
+
+def test_failures_are_raised_into_the_steps(flow_kind):
+    kind, algorithm_function = flow_kind
+    api_client = Mock()
+    api_client.upload_solution.side_effect = ConnectionError("unreachable")
+    flow = make_flow(kind, algorithm_function, api_client)
+
+    best = run(flow, flow.solve_and_upload([1, 2], resolved_future("instance_id"), ([1, 2],), {}))
+
+    assert best == ([2, 1], False, None)
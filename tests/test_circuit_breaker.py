@@ -0,0 +1,80 @@
+import time
+
+from algobench.circuit_breaker import AdaptiveTimeouts, CircuitBreaker, endpoint_key
+from algobench.instrumentation import Instrumentation
+
+
+def test_circuit_opens_after_consecutive_failures_and_closes_after_probe():
+    transitions = []
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=0.05, listeners=[lambda *t: transitions.append(t)])
+
+    with Instrumentation("test").call() as record:
+        for _ in range(2):
+            assert breaker.allow()
+            breaker.record_failure()
+        breaker.record_success(0.01)
+        for _ in range(3):
+            assert breaker.allow()
+            breaker.record_failure()
+        assert breaker.is_open()
+        assert not breaker.allow()
+
+    time.sleep(0.06)
+    assert not breaker.is_open()
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_success(0.01)
+
+    assert breaker.state == "closed"
+    assert [(previous, state) for previous, state, _ in transitions] == [
+        ("closed", "open"),
+        ("open", "half_open"),
+        ("half_open", "closed"),
+    ]
+    assert breaker.stats() == {
+        "state": "closed",
+        "transitions": {"closed->open": 1, "open->half_open": 1, "half_open->closed": 1},
+        "rejections": 2,
+    }
+    assert record.counters == {"circuit_open": 1, "circuit_rejections": 1}
+
+
+def test_failed_probe_opens_circuit_again():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.01)
+    breaker.record_failure()
+    time.sleep(0.02)
+
+    assert breaker.allow()
+    breaker.record_failure()
+
+    assert breaker.is_open()
+    assert breaker.transitions["half_open->open"] == 1
+
+
+def test_circuit_opens_when_latency_exceeds_budget():
+    breaker = CircuitBreaker(latency_budget=0.5, latency_percentile=0.9, window=10)
+
+    for _ in range(8):
+        breaker.record_success(0.1)
+    breaker.record_success(1.0)
+    assert breaker.state == "closed"
+    breaker.record_success(1.0)
+
+    assert breaker.state == "open"
+
+
+def test_adaptive_timeouts_follow_observed_latencies():
+    timeouts = AdaptiveTimeouts(multiplier=4, latency_percentile=0.5, min_timeout=0.5, min_samples=3)
+    endpoint = endpoint_key("GET", "/api/instances/7/best_solution/")
+
+    timeouts.observe(endpoint, 1.0)
+    assert timeouts.read_timeout(endpoint, 30.0) == 30.0
+    timeouts.observe(endpoint, 1.0)
+    timeouts.observe(endpoint_key("GET", "/api/instances/8/best_solution/"), 2.0)
+
+    assert timeouts.read_timeout(endpoint, 30.0) == 4.0
+    assert timeouts.read_timeout(endpoint, 3.0) == 3.0
+    assert timeouts.read_timeout(endpoint_key("POST", "/api/solutions/"), 30.0) == 30.0
+    for _ in range(3):
+        timeouts.observe("GET /api/problems", 0.01)
+    assert timeouts.read_timeout("GET /api/problems", 30.0) == 0.5
@@ -1,4 +1,13 @@
+import asyncio
+import pickle
+import threading
+import time
+import pytest
+import requests
+from collections.abc import Iterator
+from algobench import report_progress
 from algobench.decorator import algorithm
+from algobench.file_handling import convert_to_json
 from unittest.mock import Mock, patch
 
 
@@ -14,6 +23,10 @@ def sample_scoring(x: int, y: int) -> float:
     return x
 
 
+def value_scoring(x: int, y: int) -> float:
+    return y
+
+
 def test_decorator_with_sample_functions():
     with patch("algobench.decorator.APIClient") as MockAPIClient:
         mock_client = Mock()
@@ -32,6 +45,17 @@ def test_decorator_with_sample_functions():
         assert wrapped(5) == 10
 
 
+def assert_falls_back(wrapped):
+    # The function runs unchanged, but keeps the attributes of a decorated one.
+    assert wrapped.__wrapped__ is sample_algorithm
+    assert wrapped(5) == 10
+    assert wrapped.batch([1, 2, 3], max_workers=2) == [2, 4, 6]
+    assert wrapped.evaluate(5, [10]) == [(True, 5)]
+    assert wrapped.flush()
+    assert not wrapped.registered.is_set()
+    assert wrapped.stats()["spans"]["solve"]["count"] == 4
+
+
 def test_decorator_invalid_api_key():
     with patch("algobench.decorator.APIClient") as MockAPIClient:
         mock_client = Mock()
@@ -46,7 +70,43 @@ def test_decorator_invalid_api_key():
             is_minimization=True,
         )(sample_algorithm)
 
-        assert wrapped == sample_algorithm
+        assert_falls_back(wrapped)
+
+
+def test_registration_errors_fall_back():
+    with patch("algobench.decorator.APIClient") as MockAPIClient:
+        mock_client = Mock()
+        mock_client.login.return_value = True
+        mock_client.upload_problem.side_effect = requests.exceptions.ReadTimeout("no response")
+        MockAPIClient.return_value = mock_client
+
+        wrapped = algorithm(
+            name="test_algo",
+            feasibility_function=sample_feasibility,
+            scoring_function=sample_scoring,
+            api_key="valid_key",
+            is_minimization=True,
+        )(sample_algorithm)
+
+        assert_falls_back(wrapped)
+
+
+def test_content_format_is_passed_to_the_client():
+    with patch("algobench.decorator.APIClient") as MockAPIClient:
+        MockAPIClient.return_value = Mock()
+
+        algorithm(
+            name="test_algo",
+            feasibility_function=sample_feasibility,
+            scoring_function=sample_scoring,
+            api_key="valid_key",
+            is_minimization=True,
+            codec="msgpack",
+            compression="gzip",
+        )(sample_algorithm)
+
+        assert MockAPIClient.call_args.kwargs["codec"] == "msgpack"
+        assert MockAPIClient.call_args.kwargs["compression"] == "gzip"
 
 
 def test_decorator_empty_name():
@@ -62,7 +122,7 @@ def test_decorator_empty_name():
             api_key="valid_key",
             is_minimization=True,
         )(sample_algorithm)
-        assert wrapped == sample_algorithm
+        assert_falls_back(wrapped)
 
 
 def test_decorator_upload_failures():
@@ -126,3 +186,728 @@ def test_decorator_happy_path():
 
         mock_client.upload_instance.assert_called_once()
         mock_client.upload_solution.assert_called_once()
+
+
+def test_decorator_background_uploads():
+    with patch("algobench.decorator.APIClient") as MockAPIClient:
+        mock_client = Mock()
+        mock_client.login.return_value = True
+        mock_client.serialize.side_effect = lambda object, stream=None: convert_to_json(object)
+        mock_client.upload_instance_content.return_value = "test_instance_id"
+        MockAPIClient.return_value = mock_client
+
+        wrapped = algorithm(
+            name="test_algo",
+            feasibility_function=sample_feasibility,
+            scoring_function=sample_scoring,
+            api_key="valid_key",
+            is_minimization=True,
+            background_uploads=True,
+        )(sample_algorithm)
+
+        assert wrapped(5) == 10
+        assert wrapped.flush(timeout=5)
+
+        mock_client.upload_instance_content.assert_called_once_with("5")
+        mock_client.upload_solution_content.assert_called_once_with("10", "test_instance_id", True, 5)
+        mock_client.pull_solution.assert_not_called()
+
+
+def test_decorator_waits_for_target_score():
+    with patch("algobench.decorator.APIClient") as MockAPIClient:
+        mock_client = Mock()
+        mock_client.login.return_value = True
+        mock_client.upload_instance.return_value = "test_instance_id"
+
+        def wait_for_solution(instance_id, solution_type, accept, timeout, **kwargs):
+            for server_solution in [12, 7, 3, 4]:
+                if accept(server_solution):
+                    return server_solution
+            return None
+
+        mock_client.wait_for_solution.side_effect = wait_for_solution
+        MockAPIClient.return_value = mock_client
+
+        wrapped = algorithm(
+            name="test_algo",
+            feasibility_function=sample_feasibility,
+            scoring_function=value_scoring,
+            api_key="valid_key",
+            is_minimization=True,
+            additional_wait_seconds=1,
+            target_score=5,
+        )(sample_algorithm)
+
+        assert wrapped(5) == 3
+
+
+def test_decorator_race_returns_server_solution_before_local_finishes():
+    release = threading.Event()
+
+    def slow_algorithm(x: int) -> int:
+        release.wait(5)
+        return x * 2
+
+    with patch("algobench.decorator.APIClient") as MockAPIClient:
+        mock_client = Mock()
+        mock_client.login.return_value = True
+        mock_client.upload_instance.return_value = "test_instance_id"
+        mock_client.wait_for_solution.side_effect = lambda instance_id, solution_type, accept, timeout, **kwargs: (
+            3 if accept(3) else None
+        )
+        MockAPIClient.return_value = mock_client
+
+        wrapped = algorithm(
+            name="test_algo",
+            feasibility_function=sample_feasibility,
+            scoring_function=value_scoring,
+            api_key="valid_key",
+            is_minimization=True,
+            additional_wait_seconds=5,
+            target_score=5,
+            race=True,
+        )(slow_algorithm)
+
+        assert wrapped(5) == 3
+        mock_client.upload_solution.assert_not_called()
+
+        release.set()
+        for _ in range(100):
+            if mock_client.upload_solution.called:
+                break
+            time.sleep(0.01)
+        mock_client.upload_solution.assert_called_once_with(10, "test_instance_id", True, 10)
+
+
+def test_decorator_race_keeps_better_local_solution():
+    def wait_for_solution(instance_id, solution_type, accept, timeout, stop=None, **kwargs):
+        accept(12)
+        if stop is not None:
+            stop.wait(5)
+        return None
+
+    with patch("algobench.decorator.APIClient") as MockAPIClient:
+        mock_client = Mock()
+        mock_client.login.return_value = True
+        mock_client.upload_instance.return_value = "test_instance_id"
+        mock_client.wait_for_solution.side_effect = wait_for_solution
+        MockAPIClient.return_value = mock_client
+
+        wrapped = algorithm(
+            name="test_algo",
+            feasibility_function=sample_feasibility,
+            scoring_function=value_scoring,
+            api_key="valid_key",
+            is_minimization=True,
+            additional_wait_seconds=1,
+            race=True,
+        )(sample_algorithm)
+
+        assert wrapped(5) == 10
+        mock_client.upload_solution.assert_called_once_with(10, "test_instance_id", True, 10)
+
+
+async def sample_async_algorithm(x: int) -> int:
+    await asyncio.sleep(0)
+    return x * 2
+
+
+def test_decorator_async_algorithm():
+    with patch("algobench.decorator.APIClient") as MockAPIClient:
+        mock_client = Mock()
+        mock_client.login.return_value = True
+        mock_client.upload_instance.return_value = "test_instance_id"
+        mock_client.fetch_best_solution.return_value = None
+        MockAPIClient.return_value = mock_client
+
+        wrapped = algorithm(
+            name="test_algo",
+            feasibility_function=sample_feasibility,
+            scoring_function=sample_scoring,
+            api_key="valid_key",
+            is_minimization=True,
+        )(sample_async_algorithm)
+
+        async def solve_many():
+            return await asyncio.gather(*(wrapped(x) for x in range(5)))
+
+        assert asyncio.iscoroutinefunction(wrapped)
+        assert asyncio.run(solve_many()) == [0, 2, 4, 6, 8]
+        assert mock_client.upload_instance.call_count == 5
+        assert mock_client.upload_solution.call_count == 5
+
+
+def test_decorator_async_algorithm_improves_solution():
+    with patch("algobench.decorator.APIClient") as MockAPIClient:
+        mock_client = Mock()
+        mock_client.login.return_value = True
+        mock_client.upload_instance.return_value = "test_instance_id"
+        mock_client.fetch_best_solution.return_value = {"id": "solution_id", "content": "4"}
+        MockAPIClient.return_value = mock_client
+
+        wrapped = algorithm(
+            name="test_algo",
+            feasibility_function=sample_feasibility,
+            scoring_function=value_scoring,
+            api_key="valid_key",
+            is_minimization=True,
+            additional_wait_seconds=1,
+        )(sample_async_algorithm)
+
+        assert asyncio.run(wrapped(5)) == 4
+
+
+def test_decorator_async_race_returns_server_solution():
+    async def slow_async_algorithm(x: int) -> int:
+        await asyncio.sleep(5)
+        return x * 2
+
+    with patch("algobench.decorator.APIClient") as MockAPIClient:
+        mock_client = Mock()
+        mock_client.login.return_value = True
+        mock_client.upload_instance.return_value = "test_instance_id"
+        mock_client.fetch_best_solution.return_value = {"id": "solution_id", "content": "3"}
+        MockAPIClient.return_value = mock_client
+
+        wrapped = algorithm(
+            name="test_algo",
+            feasibility_function=sample_feasibility,
+            scoring_function=value_scoring,
+            api_key="valid_key",
+            is_minimization=True,
+            additional_wait_seconds=5,
+            target_score=5,
+            race=True,
+        )(slow_async_algorithm)
+
+        start = time.monotonic()
+        assert asyncio.run(wrapped(5)) == 3
+        assert time.monotonic() - start < 1
+
+
+def test_decorator_batch():
+    with patch("algobench.decorator.APIClient") as MockAPIClient:
+        mock_client = Mock()
+        mock_client.login.return_value = True
+        mock_client.upload_instance.side_effect = lambda instance: f"instance_{instance}"
+        mock_client.wait_for_solution.return_value = None
+        MockAPIClient.return_value = mock_client
+
+        wrapped = algorithm(
+            name="test_algo",
+            feasibility_function=sample_feasibility,
+            scoring_function=sample_scoring,
+            api_key="valid_key",
+            is_minimization=True,
+        )(sample_algorithm)
+
+        assert wrapped.batch(range(20), max_workers=4) == [x * 2 for x in range(20)]
+        assert mock_client.upload_instance.call_count == 20
+        assert mock_client.upload_solution.call_count == 20
+        assert mock_client.wait_for_solution.call_count == 20
+        uploaded_pairs = {call.args[0]: call.args[1] for call in mock_client.upload_solution.call_args_list}
+        assert uploaded_pairs == {x * 2: f"instance_{x}" for x in range(20)}
+
+
+def test_decorator_cache_solutions(tmp_path, monkeypatch):
+    monkeypatch.setenv("ALGOBENCH_CACHE_DIR", str(tmp_path))
+    calls = []
+
+    def counting_algorithm(x: int) -> int:
+        calls.append(x)
+        return x * 2
+
+    with patch("algobench.decorator.APIClient") as MockAPIClient:
+        mock_client = Mock()
+        mock_client.login.return_value = True
+        mock_client.algobench_url = "http://test"
+        mock_client.upload_instance.return_value = "test_instance_id"
+        mock_client.wait_for_solution.side_effect = lambda instance_id, solution_type, accept, timeout, **kwargs: (
+            4 if accept(4) else None
+        )
+        MockAPIClient.return_value = mock_client
+
+        wrapped = algorithm(
+            name="test_algo",
+            feasibility_function=sample_feasibility,
+            scoring_function=value_scoring,
+            api_key="valid_key",
+            is_minimization=True,
+            cache_solutions=True,
+        )(counting_algorithm)
+
+        assert wrapped(5) == 4
+        assert wrapped(5) == 4
+        assert wrapped(6) == 4
+        assert calls == [5, 6]
+        assert mock_client.upload_instance.call_count == 2
+
+        # While the circuit is open, cached solutions are still used and other instances are solved locally.
+        mock_client.reachable.return_value = False
+        assert wrapped(5) == 4
+        assert wrapped.batch([5, 7]) == [4, 14]
+        assert calls == [5, 6, 7]
+        assert mock_client.upload_instance.call_count == 2
+
+
+def test_decorator_lazy_registration():
+    release = threading.Event()
+
+    with patch("algobench.decorator.APIClient") as MockAPIClient:
+        mock_client = Mock()
+        mock_client.login.side_effect = lambda: release.wait(5)
+        mock_client.upload_instance.return_value = "test_instance_id"
+        MockAPIClient.return_value = mock_client
+
+        wrapped = algorithm(
+            name="test_algo",
+            feasibility_function=sample_feasibility,
+            scoring_function=sample_scoring,
+            api_key="valid_key",
+            is_minimization=True,
+            lazy_registration=True,
+        )(sample_algorithm)
+
+        assert wrapped != sample_algorithm
+        assert wrapped(5) == 10
+        mock_client.upload_instance.assert_not_called()
+
+        release.set()
+        assert wrapped.registered.wait(5)
+
+        assert wrapped(5) == 10
+        mock_client.upload_instance.assert_called_once()
+
+
+def test_decorator_lazy_registration_failure():
+    with patch("algobench.decorator.APIClient") as MockAPIClient:
+        mock_client = Mock()
+        mock_client.login.return_value = False
+        MockAPIClient.return_value = mock_client
+
+        wrapped = algorithm(
+            name="test_algo",
+            feasibility_function=sample_feasibility,
+            scoring_function=sample_scoring,
+            api_key="invalid_key",
+            is_minimization=True,
+            lazy_registration=True,
+        )(sample_algorithm)
+
+        assert wrapped(5) == 10
+        assert not wrapped.registered.wait(0.05)
+        assert wrapped(5) == 10
+        mock_client.upload_instance.assert_not_called()
+        mock_client.upload_problem.assert_not_called()
+
+
+def local_search(x: list[int]) -> list[int]:
+    solution = [0] * len(x)
+    for index in range(3):
+        solution = list(solution)
+        solution[index] = x[index]
+        report_progress(solution)
+    report_progress([0] * len(x))
+    solution = list(solution)
+    solution[3] = x[3]
+    return solution
+
+
+def list_feasibility(x: list[int], y: list[int]) -> bool:
+    return len(x) == len(y)
+
+
+def list_scoring(x: list[int], y: list[int]) -> float:
+    return sum(y)
+
+
+def test_decorator_uploads_progress_as_diffs():
+    with patch("algobench.decorator.APIClient") as MockAPIClient:
+        mock_client = Mock()
+        mock_client.login.return_value = True
+        mock_client.upload_instance.return_value = "test_instance_id"
+        mock_client.serialize.side_effect = lambda object, stream=None: convert_to_json(object)
+        mock_client.upload_solution_content.return_value = "full_id"
+        mock_client.upload_solution_delta.side_effect = [f"delta_{i}" for i in range(10)]
+        MockAPIClient.return_value = mock_client
+
+        wrapped = algorithm(
+            name="test_algo",
+            feasibility_function=list_feasibility,
+            scoring_function=list_scoring,
+            api_key="valid_key",
+            is_minimization=False,
+        )(local_search)
+
+        instance = list(range(1, 101))
+        assert wrapped(instance) == [1, 2, 3, 4] + [0] * 96
+
+        mock_client.upload_solution_content.assert_called_once()
+        assert mock_client.upload_solution_delta.call_count == 3
+        bases = [call.args[1] for call in mock_client.upload_solution_delta.call_args_list]
+        assert bases == ["full_id", "delta_0", "delta_1"]
+        assert mock_client.upload_solution_delta.call_args.args[4] == 10
+        mock_client.upload_solution.assert_not_called()
+
+
+def test_report_progress_outside_decorated_call():
+    assert local_search([5, 6, 7, 8]) == [5, 6, 7, 8]
+
+
+async def async_local_search(x: list[int]) -> list[int]:
+    report_progress([x[0]] + [0] * (len(x) - 1))
+    await asyncio.sleep(0.2)
+    return [x[0], x[1]] + [0] * (len(x) - 2)
+
+
+def test_async_decorator_uploads_progress_as_diffs():
+    with patch("algobench.decorator.APIClient") as MockAPIClient:
+        mock_client = Mock()
+        mock_client.login.return_value = True
+        mock_client.upload_instance.return_value = "test_instance_id"
+        mock_client.serialize.side_effect = lambda object, stream=None: convert_to_json(object)
+        mock_client.upload_solution_content.return_value = "full_id"
+        mock_client.upload_solution_delta.return_value = "delta_id"
+        MockAPIClient.return_value = mock_client
+
+        wrapped = algorithm(
+            name="test_algo",
+            feasibility_function=list_feasibility,
+            scoring_function=list_scoring,
+            api_key="valid_key",
+            is_minimization=False,
+        )(async_local_search)
+
+        assert asyncio.run(wrapped(list(range(1, 101)))) == [1, 2] + [0] * 98
+
+        mock_client.upload_solution_content.assert_called_once()
+        mock_client.upload_solution_delta.assert_called_once()
+        assert mock_client.upload_solution_delta.call_args.args[1:] == ("full_id", "test_instance_id", True, 3)
+
+
+def improving_solutions(x: int) -> Iterator[int]:
+    yield from [3, 1, 5, 2, 8, 9]
+
+
+def endless_solutions(x: int) -> Iterator[int]:
+    solution = 0
+    while True:
+        time.sleep(0.01)
+        solution += 1
+        yield solution
+
+
+def generator_mock_client():
+    mock_client = Mock()
+    mock_client.login.return_value = True
+    mock_client.upload_instance.return_value = "test_instance_id"
+    mock_client.serialize.side_effect = lambda object, stream=None: convert_to_json(object)
+    mock_client.upload_solution_content.side_effect = [f"solution_{i}" for i in range(10)]
+    mock_client.wait_for_solution.return_value = None
+    return mock_client
+
+
+def test_generator_algorithm_returns_best_yielded_solution():
+    with patch("algobench.decorator.APIClient") as MockAPIClient:
+        mock_client = generator_mock_client()
+        MockAPIClient.return_value = mock_client
+
+        wrapped = algorithm(
+            name="test_algo",
+            feasibility_function=sample_feasibility,
+            scoring_function=value_scoring,
+            api_key="valid_key",
+            is_minimization=False,
+        )(improving_solutions)
+
+        assert wrapped(5) == 9
+        uploaded = [call.args[3] for call in mock_client.upload_solution_content.call_args_list]
+        assert uploaded == [3, 5, 8, 9]
+
+
+def test_generator_algorithm_stops_at_target_and_time_limit():
+    with patch("algobench.decorator.APIClient") as MockAPIClient:
+        MockAPIClient.return_value = generator_mock_client()
+
+        targeted = algorithm(
+            name="test_algo",
+            feasibility_function=sample_feasibility,
+            scoring_function=value_scoring,
+            api_key="valid_key",
+            is_minimization=True,
+            target_score=1,
+        )(improving_solutions)
+        limited = algorithm(
+            name="test_algo",
+            feasibility_function=sample_feasibility,
+            scoring_function=value_scoring,
+            api_key="valid_key",
+            is_minimization=False,
+            time_limit=0.1,
+            background_uploads=True,
+        )(endless_solutions)
+
+        assert targeted(5) == 1
+        assert 1 < limited(5) < 100
+        assert limited.flush(timeout=5)
+
+
+def test_fallback_generator_stops_at_target_and_time_limit():
+    limited = algorithm(
+        name="",
+        feasibility_function=sample_feasibility,
+        scoring_function=value_scoring,
+        api_key="valid_key",
+        is_minimization=False,
+        time_limit=0.2,
+    )(endless_solutions)
+    targeted = algorithm(
+        name="",
+        feasibility_function=sample_feasibility,
+        scoring_function=value_scoring,
+        api_key="valid_key",
+        is_minimization=False,
+        target_score=5,
+    )(endless_solutions)
+
+    start = time.monotonic()
+    assert 1 < limited(5) < 100
+    assert all(1 < solution < 100 for solution in limited.batch([1, 2], max_workers=2))
+    assert time.monotonic() - start < 2
+    assert targeted(5) == 5
+
+
+def test_generator_algorithm_without_registration():
+    with patch("algobench.decorator.APIClient") as MockAPIClient:
+        mock_client = generator_mock_client()
+        mock_client.login.return_value = False
+        MockAPIClient.return_value = mock_client
+
+        wrapped = algorithm(
+            name="test_algo",
+            feasibility_function=sample_feasibility,
+            scoring_function=value_scoring,
+            api_key="valid_key",
+            is_minimization=False,
+            lazy_registration=True,
+        )(improving_solutions)
+
+        assert wrapped(5) == 9
+        mock_client.upload_solution_content.assert_not_called()
+
+
+def test_decorator_memoizes_evaluations():
+    scores = []
+
+    def counted_scoring(x: int, y: int) -> float:
+        scores.append(y)
+        return y
+
+    with patch("algobench.decorator.APIClient") as MockAPIClient:
+        mock_client = Mock()
+        mock_client.login.return_value = True
+        mock_client.upload_instance.return_value = "test_instance_id"
+
+        def wait_for_solution(instance_id, solution_type, accept, timeout, **kwargs):
+            # The best server solution is the one that was just uploaded.
+            accept(10)
+            return None
+
+        mock_client.wait_for_solution.side_effect = wait_for_solution
+        MockAPIClient.return_value = mock_client
+
+        wrapped = algorithm(
+            name="test_algo",
+            feasibility_function=sample_feasibility,
+            scoring_function=counted_scoring,
+            api_key="valid_key",
+            is_minimization=True,
+            additional_wait_seconds=1,
+            memoize_evaluations=True,
+        )(sample_algorithm)
+
+        assert wrapped(5) == 10
+        assert scores == [10]
+        assert wrapped.evaluate(5, [10, 4]) == [(True, 10), (True, 4)]
+        assert scores == [10, 4]
+
+
+def counting_scoring(x: int, y: int) -> float:
+    counting_scoring.calls += 1
+    return y
+
+
+def polling_client(server_solutions):
+    mock_client = Mock()
+    mock_client.login.return_value = True
+    mock_client.upload_instance.return_value = "test_instance_id"
+
+    def wait_for_solution(instance_id, solution_type, accept, timeout, stop=None, with_record=False, **kwargs):
+        for record in server_solutions:
+            if accept(record["content"], record) if with_record else accept(record["content"]):
+                return record["content"]
+        if stop is not None:
+            stop.wait(timeout)
+        return None
+
+    mock_client.wait_for_solution.side_effect = wait_for_solution
+    return mock_client
+
+
+@pytest.mark.parametrize("evaluation_pool", ["thread", "process"])
+def test_decorator_checks_server_solutions_on_pool(evaluation_pool):
+    with patch("algobench.decorator.APIClient") as MockAPIClient:
+        MockAPIClient.return_value = polling_client([{"content": 12}, {"content": 3}])
+
+        wrapped = algorithm(
+            name="test_algo",
+            feasibility_function=sample_feasibility,
+            scoring_function=value_scoring,
+            api_key="valid_key",
+            is_minimization=True,
+            additional_wait_seconds=10,
+            evaluation_pool=evaluation_pool,
+        )(sample_algorithm)
+
+        start = time.monotonic()
+        assert wrapped(5) == 3
+        assert time.monotonic() - start < 5
+
+
+def slow_feasibility(x: int, y: int) -> bool:
+    time.sleep(0.2)
+    return sample_feasibility(x, y)
+
+
+def test_decorator_waits_for_running_checks_when_the_wait_ends():
+    with patch("algobench.decorator.APIClient") as MockAPIClient:
+        MockAPIClient.return_value = polling_client([{"content": 3}])
+
+        wrapped = algorithm(
+            name="test_algo",
+            feasibility_function=slow_feasibility,
+            scoring_function=value_scoring,
+            api_key="valid_key",
+            is_minimization=True,
+            additional_wait_seconds=0.01,
+            evaluation_pool="thread",
+        )(sample_algorithm)
+
+        assert wrapped(5) == 3
+
+
+def test_decorator_trusts_server_scores_until_verification_fails():
+    counting_scoring.calls = 0
+    with patch("algobench.decorator.APIClient") as MockAPIClient, patch("algobench.improvement.random") as mock_random:
+        MockAPIClient.return_value = polling_client([{"content": 3, "feasible": True, "score": 3}])
+        mock_random.random.return_value = 0.9
+
+        wrapped = algorithm(
+            name="test_algo",
+            feasibility_function=sample_feasibility,
+            scoring_function=counting_scoring,
+            api_key="valid_key",
+            is_minimization=True,
+            additional_wait_seconds=1,
+            verify_server_scores=0.5,
+        )(sample_algorithm)
+
+        assert wrapped(5) == 3
+        assert counting_scoring.calls == 1
+
+        MockAPIClient.return_value.wait_for_solution.side_effect = polling_client(
+            [{"content": 4, "feasible": True, "score": 1}]
+        ).wait_for_solution.side_effect
+        mock_random.random.return_value = 0.1
+        assert wrapped(5) == 4
+        assert counting_scoring.calls == 3
+
+        mock_random.random.return_value = 0.9
+        assert wrapped(5) == 4
+        assert counting_scoring.calls == 5
+
+
+def test_decorator_stats_and_hooks():
+    records = []
+    with patch("algobench.decorator.APIClient") as MockAPIClient:
+        mock_client = Mock()
+        mock_client.login.return_value = True
+        mock_client.upload_instance.return_value = "test_instance_id"
+        MockAPIClient.return_value = mock_client
+
+        wrapped = algorithm(
+            name="test_algo",
+            feasibility_function=sample_feasibility,
+            scoring_function=sample_scoring,
+            api_key="valid_key",
+            is_minimization=True,
+            additional_wait_seconds=1,
+            hooks=[records.append],
+        )(sample_algorithm)
+
+        assert wrapped(5) == 10
+        assert wrapped.batch([1, 2]) == [2, 4]
+
+        stats = wrapped.stats()
+        assert stats["calls"] == 2
+        assert stats["spans"]["call"]["count"] == 1
+        assert stats["spans"]["batch"]["count"] == 1
+        assert stats["spans"]["solve"]["count"] == 3
+        for name in ["upload_instance", "feasibility", "scoring", "upload_solution", "wait"]:
+            assert stats["spans"][name]["count"] == 3
+        assert stats["counters"] == {"instances": 2}
+        assert [record.kind for record in records] == ["call", "batch"]
+
+
+def test_decorated_methods_are_bound():
+    class Solver:
+        @algorithm(
+            name="test_algo",
+            feasibility_function=sample_feasibility,
+            scoring_function=sample_scoring,
+            api_key="valid_key",
+            is_minimization=True,
+        )
+        def solve(self, x: int) -> int:
+            return x * 2
+
+    assert Solver().solve(3) == 6
+    assert Solver.solve(Solver(), 4) == 8
+
+
+def test_decorated_function_outside_a_module_cannot_be_pickled():
+    with patch("algobench.decorator.APIClient"):
+        wrapped = algorithm(
+            name="test_algo",
+            feasibility_function=sample_feasibility,
+            scoring_function=sample_scoring,
+            api_key="valid_key",
+            is_minimization=True,
+        )(sample_algorithm)
+
+    assert wrapped.__wrapped__ is sample_algorithm
+    assert wrapped.__name__ == "sample_algorithm"
+    with pytest.raises(pickle.PicklingError):
+        pickle.dumps(wrapped)
+
+
+def test_async_decorator_skips_calls_rejected_by_policy():
+    with patch("algobench.decorator.APIClient") as MockAPIClient:
+        mock_client = Mock()
+        mock_client.upload_instance.return_value = "test_instance_id"
+        mock_client.upload_solution.return_value = "test_solution_id"
+        MockAPIClient.return_value = mock_client
+
+        wrapped = algorithm(
+            name="test_algo",
+            feasibility_function=sample_feasibility,
+            scoring_function=sample_scoring,
+            api_key="valid_key",
+            is_minimization=True,
+            upload_policy=lambda call: call.instance > 10,
+        )(sample_async_algorithm)
+
+        assert asyncio.run(wrapped(5)) == 10
+        mock_client.upload_instance.assert_not_called()
+        assert asyncio.run(wrapped(20)) == 40
+        mock_client.upload_instance.assert_called_once_with(20)
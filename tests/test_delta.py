@@ -0,0 +1,100 @@
+import json
+from unittest.mock import Mock
+
+import pytest
+
+from algobench.delta import DeltaEncoder, apply_diff, diff
+
+
+@pytest.mark.parametrize(
+    "old, new",
+    [
+        ({"a": 1, "b": [1, 2, 3]}, {"a": 2, "b": [1, 5, 3, 4]}),
+        ({"a": {"x": 1}, "c/d": "~"}, {"a": {"y": None}, "c/d": "~~"}),
+        ([1, 2, 3, 4], [1]),
+        ([{"id": 1}, {"id": 2}], [{"id": 1, "x": True}]),
+        ({"a": 1}, [1]),
+        (1, 1.0),
+        ({"a": [1, 2]}, {"a": [1, 2]}),
+    ],
+)
+def test_diff_round_trip(old, new):
+    operations = diff(old, new)
+    patched = apply_diff(old, operations)
+    assert patched == new
+    assert type(patched) is type(new)
+
+
+def test_diff_is_minimal_for_small_changes():
+    old = {"items": list(range(1000))}
+    new = {"items": list(range(1000))}
+    new["items"][500] = -1
+
+    assert diff(old, new) == [{"op": "replace", "path": "/items/500", "value": -1}]
+    assert diff(old, old) == []
+
+
+def mock_api_client(delta_accepted=True):
+    api_client = Mock(solution_diffs=True)
+    api_client.upload_solution_content.side_effect = [f"full-{i}" for i in range(100)]
+    api_client.upload_solution_delta.side_effect = [f"delta-{i}" if delta_accepted else None for i in range(100)]
+    return api_client
+
+
+def solution(changed: int) -> str:
+    items = list(range(100))
+    items[changed] = -1
+    return json.dumps(items)
+
+
+def test_encoder_sends_diffs_between_checkpoints():
+    api_client = mock_api_client()
+    encoder = DeltaEncoder(checkpoint_every=3)
+
+    ids = [encoder.upload(api_client, solution(i), "instance", True, i) for i in range(5)]
+
+    assert ids == ["full-0", "delta-0", "delta-1", "full-1", "delta-2"]
+    delta, base_solution_id, instance_id, feasible, score = api_client.upload_solution_delta.call_args_list[0].args
+    assert (base_solution_id, instance_id, feasible, score) == ("full-0", "instance", True, 1)
+    assert apply_diff(json.loads(solution(0)), json.loads(delta)) == json.loads(solution(1))
+
+
+def test_encoder_falls_back_to_full_uploads():
+    api_client = mock_api_client(delta_accepted=False)
+    encoder = DeltaEncoder()
+
+    ids = [encoder.upload(api_client, solution(i), "instance", True, i) for i in range(3)]
+
+    assert ids == ["full-0", "full-1", "full-2"]
+    api_client.upload_solution_delta.assert_called_once()
+
+
+def test_encoder_sends_full_solutions_unless_the_server_advertised_diffs():
+    api_client = mock_api_client()
+    api_client.solution_diffs = False
+    encoder = DeltaEncoder()
+
+    ids = [encoder.upload(api_client, solution(i), "instance", True, i) for i in range(3)]
+
+    assert ids == ["full-0", "full-1", "full-2"]
+    api_client.upload_solution_delta.assert_not_called()
+
+
+def test_encoder_sends_full_solution_when_diff_is_larger():
+    api_client = mock_api_client()
+    encoder = DeltaEncoder()
+
+    encoder.upload(api_client, json.dumps([1, 2]), "instance", True, 1)
+    encoder.upload(api_client, json.dumps([3, 4]), "instance", True, 2)
+
+    assert api_client.upload_solution_content.call_count == 2
+    api_client.upload_solution_delta.assert_not_called()
+
+
+def test_encoder_skips_unchanged_solution():
+    api_client = mock_api_client()
+    encoder = DeltaEncoder()
+
+    assert encoder.upload(api_client, solution(1), "instance", True, 1) == "full-0"
+    assert encoder.upload(api_client, solution(1), "instance", True, 1) == "full-0"
+    api_client.upload_solution_delta.assert_not_called()
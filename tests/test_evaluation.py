@@ -0,0 +1,79 @@
+from unittest.mock import Mock
+
+from algobench.evaluation import Evaluator
+
+
+def counting_evaluator(**kwargs):
+    feasibility = Mock(side_effect=lambda instance, solution: sum(solution) <= instance["capacity"])
+    scoring = Mock(side_effect=lambda instance, solution: sum(solution))
+    return Evaluator(feasibility, scoring, **kwargs), feasibility, scoring
+
+
+def test_evaluate_without_memoization():
+    evaluator, feasibility, scoring = counting_evaluator()
+    instance = {"capacity": 5}
+
+    assert evaluator.evaluate(instance, [1, 2]) == (True, 3)
+    assert evaluator.evaluate(instance, [1, 2]) == (True, 3)
+    assert scoring.call_count == 2
+
+
+def test_memoized_by_content():
+    evaluator, feasibility, scoring = counting_evaluator(memoize=True)
+
+    assert evaluator.evaluate({"capacity": 5}, [1, 2]) == (True, 3)
+    assert evaluator.evaluate({"capacity": 5}, [1, 2]) == (True, 3)
+    assert evaluator.evaluate({"capacity": 2}, [1, 2]) == (False, 3)
+    assert scoring.call_count == 2
+    assert feasibility.call_count == 2
+
+
+def test_instances_changed_in_place_are_evaluated_again():
+    evaluator, _, scoring = counting_evaluator(memoize=True)
+    instance = {"capacity": 5}
+
+    assert evaluator.evaluate(instance, [1, 2]) == (True, 3)
+    instance["capacity"] = 2
+    assert evaluator.evaluate(instance, [1, 2]) == (False, 3)
+    with evaluator.call(instance):
+        assert evaluator.evaluate(instance, [1, 2]) == (False, 3)
+        assert evaluator.evaluate({"capacity": 5}, [1, 2]) == (True, 3)
+    assert scoring.call_count == 2
+
+
+def test_memo_is_bounded():
+    evaluator, _, scoring = counting_evaluator(memoize=True, max_entries=2)
+    instance = {"capacity": 5}
+
+    for solution in [[1], [2], [3], [1]]:
+        evaluator.evaluate(instance, solution)
+
+    assert scoring.call_count == 4
+    evaluator.evaluate(instance, [3])
+    assert scoring.call_count == 4
+
+
+class Score:
+    # Stands in for a NumPy scalar.
+    def __init__(self, value):
+        self.value = value
+
+    def item(self):
+        return self.value
+
+
+def test_evaluate_many_uses_batched_functions():
+    batch_feasibility = Mock(
+        side_effect=lambda instance, solutions: [sum(s) <= instance["capacity"] for s in solutions]
+    )
+    batch_scoring = Mock(side_effect=lambda instance, solutions: [Score(sum(s)) for s in solutions])
+    evaluator, feasibility, scoring = counting_evaluator(
+        batch_feasibility_function=batch_feasibility, batch_scoring_function=batch_scoring, memoize=True
+    )
+    instance = {"capacity": 5}
+    evaluator.evaluate(instance, [4])
+
+    assert evaluator.evaluate_many(instance, [[1], [4], [2, 4]]) == [(True, 1), (True, 4), (False, 6)]
+    batch_scoring.assert_called_once_with(instance, [[1], [2, 4]])
+    batch_feasibility.assert_called_once()
+    assert scoring.call_count == 1
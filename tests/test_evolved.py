@@ -0,0 +1,133 @@
+import json
+import textwrap
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import Mock
+
+import pytest
+
+from algobench.cache import DiskCache
+from algobench.evolved import (
+    EvolvedAlgorithm,
+    EvolvedAlgorithmError,
+    EvolvedAlgorithms,
+    SubprocessAlgorithm,
+    write_source,
+)
+
+EVOLVED_CODE = textwrap.dedent("""
+    import time
+
+    from algobench import algorithm
+
+
+    def feasibility(x: list[int], y: list[int]) -> bool:
+        return len(x) == len(y)
+
+
+    @algorithm(
+        name="evolved", feasibility_function=feasibility, scoring_function=len, api_key="", is_minimization=False
+    )
+    def solve(x: list[int]) -> list[int]:
+        print("evolved output goes to stderr")
+        if x and x[0] < 0:
+            time.sleep(10)
+        if not x:
+            raise ValueError("empty instance")
+        return [1] * len(x)
+    """)
+
+
+def evolved_process(code=EVOLVED_CODE, function_name="solve", **kwargs) -> SubprocessAlgorithm:
+    return SubprocessAlgorithm(write_source(EvolvedAlgorithm("1", code, function_name)), function_name, **kwargs)
+
+
+def test_process_runs_evolved_code_undecorated():
+    algorithm = evolved_process()
+
+    assert json.loads(algorithm([3, 4, 5])) == [1, 1, 1]
+    assert json.loads(algorithm([6])) == [1]
+    algorithm.close()
+
+
+def test_process_does_not_inherit_the_environment(monkeypatch):
+    monkeypatch.setenv("ALGOBENCH_SECRET", "secret")
+    code = textwrap.dedent("""
+        import os
+        import sys
+
+
+        def solve(x: list[int]) -> list[int]:
+            return [int("ALGOBENCH_SECRET" in os.environ), sys.flags.isolated]
+        """)
+    algorithm = evolved_process(code)
+
+    assert json.loads(algorithm([1])) == [0, 1]
+    algorithm.close()
+
+
+def test_concurrent_calls_run_on_several_processes():
+    code = textwrap.dedent("""
+        import time
+
+
+        def solve(x: list[int]) -> list[int]:
+            time.sleep(0.5)
+            return x
+        """)
+    algorithm = evolved_process(code, workers=2)
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        list(executor.map(algorithm, [[1], [2]]))
+        started = time.monotonic()
+        assert [json.loads(solution) for solution in executor.map(algorithm, [[3], [4]])] == [[3], [4]]
+        assert time.monotonic() - started < 0.9
+    algorithm.close()
+
+
+def test_process_reports_errors_and_keeps_running():
+    algorithm = evolved_process()
+
+    with pytest.raises(EvolvedAlgorithmError, match="empty instance"):
+        algorithm([])
+    assert json.loads(algorithm([1])) == [1]
+    algorithm.close()
+
+
+def test_process_restarts_after_timeout():
+    algorithm = evolved_process(timeout=2.0)
+
+    with pytest.raises(EvolvedAlgorithmError, match="did not finish"):
+        algorithm([-1])
+    assert json.loads(algorithm([1, 2])) == [1, 1]
+    algorithm.close()
+
+
+def test_process_with_broken_code_is_marked_broken():
+    algorithm = evolved_process(code="raise ImportError('missing dependency')")
+
+    with pytest.raises(EvolvedAlgorithmError, match="missing dependency"):
+        algorithm([1])
+    assert algorithm.broken
+    with pytest.raises(EvolvedAlgorithmError, match="could not be loaded"):
+        algorithm([1])
+
+
+def test_evolved_algorithm_is_cached_for_later_processes(tmp_path):
+    store = DiskCache(str(tmp_path / "algorithms.sqlite"))
+    api_client = Mock(problem_id="problem")
+    api_client.fetch_best_algorithm.return_value = {"id": 7, "code": EVOLVED_CODE, "algorithm_function_name": "solve"}
+    first = EvolvedAlgorithms()
+    first.bind(api_client, store, "key", list[int])
+
+    assert first.fetch() == EvolvedAlgorithm("7", EVOLVED_CODE, "solve")
+    assert first.solve([5, 5]) == [1, 1]
+    first.close()
+
+    offline = Mock(problem_id="problem")
+    offline.fetch_best_algorithm.return_value = None
+    second = EvolvedAlgorithms()
+    second.bind(offline, store, "key", list[int])
+    assert second.available()
+    assert second.solve([5]) == [1]
+    second.close()
@@ -1,5 +1,16 @@
+import gzip
+import time
 import json
-from algobench.file_handling import convert_to_json, convert_from_json
+import pytest
+from algobench.file_handling import (
+    CODECS,
+    COMPRESSIONS,
+    convert_to_json,
+    convert_from_json,
+    decode,
+    encode,
+    iter_json,
+)
 from pydantic import BaseModel
 
 
@@ -7,6 +18,10 @@ class PydanticValidClass(BaseModel):
     value: int
 
 
+class PydanticNamedClass(BaseModel):
+    name: str
+
+
 class ValidClass:
     def __init__(self, value: int = 1):
         self.value = value
@@ -48,3 +63,43 @@ def test_convert_from_json():
     instance_json = convert_to_json(instance)
     converted_instance = convert_from_json(instance_json, ValidClass)
     assert converted_instance.value == instance.value
+
+
+def test_codec_round_trip():
+    pydantic_instance = PydanticValidClass(value=1)
+    instance = ValidClass(2)
+    for codec in CODECS:
+        for compression in [None, *COMPRESSIONS]:
+            data = encode(pydantic_instance, codec, compression)
+            assert isinstance(data, bytes)
+            assert decode(data, PydanticValidClass, codec, compression) == pydantic_instance
+            assert decode(encode(instance, codec, compression), ValidClass, codec, compression).value == 2
+
+
+def test_json_codec_matches_convert_to_json():
+    instance = PydanticValidClass(value=1)
+    assert encode(instance) == convert_to_json(instance).encode("utf-8")
+    assert gzip.decompress(encode(instance, compression="gzip")) == encode(instance)
+
+
+def test_gzip_output_is_deterministic(monkeypatch):
+    first = encode([1, 2, 3], compression="gzip")
+    monkeypatch.setattr(time, "time", lambda: 2e9)
+    assert encode([1, 2, 3], compression="gzip") == first
+
+
+def test_msgpack_codec():
+    pytest.importorskip("msgpack")
+    data = encode({"a": [1, 2, 3]}, "msgpack")
+    assert data != encode({"a": [1, 2, 3]})
+    assert decode(data, dict, "msgpack") == {"a": [1, 2, 3]}
+
+
+@pytest.mark.parametrize(
+    "object",
+    [PydanticValidClass(value=3), PydanticNamedClass(name="café"), ValidClass(4), {"a": [1, 2.5, "x"], "b": "café"}],
+)
+def test_iter_json_matches_convert_to_json(object):
+    chunks = list(iter_json(object, chunk_size=2))
+    assert "".join(chunks) == convert_to_json(object)
+    assert len(chunks) > 1
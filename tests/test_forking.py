@@ -0,0 +1,39 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from algobench.api_client import APIClient
+from algobench.forking import ForkSafeExecutor
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs os.fork")
+def test_executor_and_client_are_reset_in_forked_child():
+    executor = ForkSafeExecutor(lambda: ThreadPoolExecutor(max_workers=1))
+    client = APIClient(api_key="test_key", env_name="test_env")
+    assert executor.submit(lambda: 1).result() == 1
+    parent_session = client.session
+
+    pid = os.fork()
+    if pid == 0:
+        ok = False
+        try:
+            ok = executor.submit(lambda: 2).result(timeout=5) == 2 and client.session is not parent_session
+        finally:
+            os._exit(0 if ok else 1)
+
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+    assert client.session is parent_session
+    executor.shutdown()
+    client.close()
+
+
+def test_executor_is_created_on_first_use():
+    created = []
+    executor = ForkSafeExecutor(lambda: created.append(ThreadPoolExecutor(max_workers=1)) or created[-1])
+
+    assert created == []
+    assert list(executor.map(abs, [-1, -2])) == [1, 2]
+    executor.shutdown()
+    assert len(created) == 1
@@ -0,0 +1,76 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import Mock
+
+from algobench.evaluation import Evaluator
+from algobench.improvement import CandidateAcceptor, ImprovementWait, Objective, ScoreTrust
+from algobench.wait_budget import WaitBudget
+
+
+def length(instance, solution) -> float:
+    return len(solution)
+
+
+def test_objective_compares_scores():
+    minimize = Objective(is_minimization=True, target_score=2)
+
+    assert minimize.is_better(1, 3, True)
+    assert not minimize.is_better(3, 1, True)
+    assert minimize.is_better(3, 1, False)
+    assert minimize.reached(([1], True, 2)) and not minimize.reached(([1], False, 2))
+    assert minimize.skip_improvement(None, ([1], False, None))
+    assert minimize.better_of(([1, 2, 3], True, 3), ([1], True, 1)) == ([1], True, 1)
+    assert minimize.better_of(([1], True, 1), ([1, 2], True, 2)) == ([1], True, 1)
+    assert minimize.better_of(([1], False, None), ([1, 2], False, 2)) == ([1], False, None)
+
+
+def test_acceptor_keeps_the_best_server_solution():
+    evaluator = Evaluator(lambda instance, solution: all(solution), length)
+    acceptor = CandidateAcceptor(None, ([1, 1, 1], True, 3), Objective(True), evaluator, ScoreTrust())
+
+    assert not acceptor.accept([1, 1, 1, 1])
+    assert not acceptor.accept([0])
+    assert acceptor.accept([1, 1])
+    assert acceptor.best == ([1, 1], True, 2)
+
+
+def test_acceptor_uses_trusted_server_scores():
+    trust = ScoreTrust(verify=0.0)
+    evaluator = Mock()
+    acceptor = CandidateAcceptor(None, ([1, 1, 1], True, 3), Objective(True, target_score=1), evaluator, trust)
+
+    assert not acceptor.accept([1, 1], {"feasible": True, "score": 2})
+    assert acceptor.accept([1], {"feasible": True, "score": 1})
+    evaluator.evaluate.assert_not_called()
+
+
+def test_acceptor_settles_running_checks():
+    def slow_length(instance, solution) -> float:
+        time.sleep(0.2)
+        return len(solution)
+
+    stop_polling = Mock()
+    evaluator = Evaluator(lambda instance, solution: True, slow_length)
+    with ThreadPoolExecutor() as executor:
+        acceptor = CandidateAcceptor(
+            None, ([1, 1, 1], True, 3), Objective(True), evaluator, ScoreTrust(), executor, stop_polling=stop_polling
+        )
+
+        assert not acceptor.accept([1])
+        assert acceptor.best == ([1, 1, 1], True, 3)
+        acceptor.settle(5)
+
+    assert acceptor.best == ([1], True, 1)
+    stop_polling.assert_called_once()
+
+
+def test_wait_learns_from_improvements():
+    budget = WaitBudget(min_observations=1, explore=0.0, margin=1.0)
+    wait = ImprovementWait([1, 2], budget, additional_wait_seconds=0)
+    assert wait.seconds == budget.max_wait
+    wait.improvements.append((wait.started + 1.0, 1.0))
+
+    wait.learn(Objective(True), "instance_id", ([1, 2], True, 2.0))
+
+    assert budget.model()[wait.bucket]["improved"] == 1.0
+    assert ImprovementWait([1, 2], None, additional_wait_seconds=3).seconds == 3
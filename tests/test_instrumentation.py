@@ -0,0 +1,95 @@
+import threading
+import time
+
+import pytest
+
+from algobench.instrumentation import Instrumentation, bind_context, count, span
+
+
+def test_spans_and_counters_are_recorded_per_call():
+    records = []
+    instrumentation = Instrumentation("test", hooks=[records.append])
+
+    with instrumentation.call():
+        with span("solve"):
+            time.sleep(0.01)
+        count("bytes_sent", 10)
+        count("bytes_sent", 5)
+
+    (record,) = records
+    assert record.name == "test"
+    assert [s.name for s in record.spans] == ["solve"]
+    assert record.spans[0].duration >= 0.01
+    assert record.duration >= record.spans[0].duration
+    assert record.counters == {"bytes_sent": 15}
+
+
+def test_spans_outside_of_calls_are_ignored():
+    instrumentation = Instrumentation("test")
+    with span("solve"):
+        count("requests")
+    assert instrumentation.stats() == {"calls": 0, "spans": {}, "counters": {}}
+
+
+def test_stats_percentiles():
+    instrumentation = Instrumentation("test", max_samples=100)
+    for _ in range(200):
+        with instrumentation.call():
+            count("requests")
+
+    stats = instrumentation.stats()
+    assert stats["calls"] == 200
+    assert stats["counters"] == {"requests": 200}
+    call = stats["spans"]["call"]
+    assert call["count"] == 200
+    assert call["p50"] <= call["p90"] <= call["p99"] <= call["max"]
+
+
+def test_bound_functions_record_into_the_call():
+    instrumentation = Instrumentation("test")
+
+    def work():
+        with span("worker"):
+            count("items")
+
+    with instrumentation.call() as record:
+        bound = bind_context(work)
+        threads = [threading.Thread(target=bound) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    assert [s.name for s in record.spans] == ["worker"] * 3
+    assert record.counters == {"items": 3}
+
+
+def test_failing_hook_does_not_break_the_call():
+    instrumentation = Instrumentation("test", hooks=[lambda record: 1 / 0])
+    with instrumentation.call():
+        pass
+    assert instrumentation.stats()["calls"] == 1
+
+
+def test_open_telemetry_exporter():
+    pytest.importorskip("opentelemetry.sdk")
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+    from algobench.instrumentation import OpenTelemetryExporter
+
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    instrumentation = Instrumentation("knapsack", hooks=[OpenTelemetryExporter(provider.get_tracer("test"))])
+
+    with instrumentation.call():
+        with span("solve"):
+            count("retries", 2)
+
+    child, parent = exporter.get_finished_spans()
+    assert parent.name == "algobench call knapsack"
+    assert parent.attributes["algobench.retries"] == 2
+    assert child.name == "solve"
+    assert child.parent.span_id == parent.context.span_id
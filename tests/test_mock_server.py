@@ -0,0 +1,336 @@
+import json
+import multiprocessing
+import os
+import pickle
+import sys
+import time
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pytest
+
+from algobench import report_progress
+from algobench.circuit_breaker import CircuitBreaker
+from algobench.policy import SizeRange, SlowerThan
+from algobench.decorator import algorithm
+from algobench.evolved import EvolvedAlgorithms
+from algobench.wait_budget import WaitBudget
+from tests.mock_server import MockServer
+
+
+def pick_items(x: list[int]) -> list[int]:
+    solution = [0] * len(x)
+    for index in range(0, len(x), 10):
+        solution[index] = 1
+        report_progress(list(solution))
+    return solution
+
+
+def pick_feasibility(x: list[int], y: list[int]) -> bool:
+    return len(x) == len(y)
+
+
+def pick_scoring(x: list[int], y: list[int]) -> float:
+    return sum(value for value, picked in zip(x, y) if picked)
+
+
+@pytest.fixture
+def server(monkeypatch):
+    with MockServer() as server:
+        monkeypatch.setenv("ALGOBENCH_URL", server.url)
+        yield server
+
+
+def decorate(**kwargs):
+    return algorithm(
+        name="mock_server_test",
+        feasibility_function=pick_feasibility,
+        scoring_function=pick_scoring,
+        api_key="test_key",
+        is_minimization=False,
+        **kwargs,
+    )(pick_items)
+
+
+@pytest.mark.parametrize("solution_diffs", [False, True])
+def test_decorator_against_mock_server(server, solution_diffs):
+    server.solution_diffs = solution_diffs
+    solve = decorate(stream_uploads=True, checkpoint_every=3)
+    instance = list(range(100))
+
+    assert solve(instance) == [1 if index % 10 == 0 else 0 for index in range(100)]
+
+    (problem,) = server.problems.values()
+    assert problem["algorithm_function_name"] == "pick_items"
+    (stored_instance,) = server.instances.values()
+    assert json.loads(stored_instance["content"]) == instance
+    solutions = list(server.solutions.values())
+    assert [solution["score"] for solution in solutions] == [sum(range(0, 10 * n, 10)) for n in range(1, 11)]
+    assert json.loads(solutions[-1]["content"]) == solve(instance)
+    assert any(solution["diff"] for solution in solutions) == solution_diffs
+
+
+def test_server_solution_is_returned(server):
+    instance = list(range(20))
+    decorate(dedup_instances=True)(instance)
+    solve = decorate(dedup_instances=True, additional_wait_seconds=2)
+
+    (instance_id,) = server.instances
+    server.add_solution(instance_id, json.dumps([1] * 20), score=sum(instance))
+
+    assert solve(instance) == [1] * 20
+    assert len(server.instances) == 1
+
+
+def test_invalid_api_key_falls_back(server):
+    solve = algorithm(
+        name="mock_server_test",
+        feasibility_function=pick_feasibility,
+        scoring_function=pick_scoring,
+        api_key="wrong_key",
+        is_minimization=False,
+    )(pick_items)
+
+    assert solve.__wrapped__ is pick_items
+    instances = [list(range(10)), list(range(20))]
+    assert solve.batch(instances) == [pick_items(instance) for instance in instances]
+    assert not solve.registered.is_set()
+
+
+@pytest.mark.parametrize("per_thread_sessions", [False, True])
+def test_concurrent_calls_pair_instances_and_solutions(server, per_thread_sessions):
+    solve = decorate(per_thread_sessions=per_thread_sessions)
+    instances = [list(range(length)) for length in range(10, 106)]
+
+    with ThreadPoolExecutor(max_workers=32) as executor:
+        results = list(executor.map(solve, instances))
+
+    assert results == [pick_items(instance) for instance in instances]
+    assert len(server.problems) == 1
+    assert len(server.instances) == len(instances)
+    final = {}
+    for solution in server.solutions.values():
+        instance = json.loads(server.instances[solution["instance"]]["content"])
+        content = json.loads(solution["content"])
+        assert len(content) == len(instance)
+        assert solution["score"] == pick_scoring(instance, content)
+        final[solution["instance"]] = content
+    assert sorted(map(len, final.values())) == [len(instance) for instance in instances]
+    assert all(content == pick_items(list(range(len(content)))) for content in final.values())
+
+
+@pytest.fixture
+def process_solver(server):
+    sys.modules.pop("tests.process_solver", None)
+    import tests.process_solver
+
+    yield tests.process_solver
+    sys.modules.pop("tests.process_solver", None)
+
+
+def test_decorated_function_runs_in_spawned_processes(server, process_solver):
+    instances = [list(range(length, 0, -1)) for length in range(1, 9)]
+
+    assert pickle.loads(pickle.dumps(process_solver.solve)) is process_solver.solve
+    with ProcessPoolExecutor(max_workers=2, mp_context=multiprocessing.get_context("spawn")) as executor:
+        results = list(executor.map(process_solver.solve, instances))
+
+    assert results == [sorted(instance)[len(instance) // 2 :] for instance in instances]
+    assert len(server.instances) == len(server.solutions) == len(instances)
+    # The workers reused the registration of the parent instead of logging in and uploading the problem.
+    assert server.requests.count(("GET", "/api/problems")) == 1
+    assert server.requests.count(("POST", "/api/problems/")) == 1
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs os.fork")
+def test_decorated_function_runs_in_forked_processes(server, process_solver):
+    instances = [list(range(length)) for length in range(1, 9)]
+    process_solver.solve(instances[0])
+
+    with ProcessPoolExecutor(max_workers=2, mp_context=multiprocessing.get_context("fork")) as executor:
+        results = list(executor.map(process_solver.solve, instances))
+
+    assert results == [instance[len(instance) // 2 :] for instance in instances]
+    assert len(server.instances) == len(instances) + 1
+    assert server.requests.count(("GET", "/api/problems")) == 1
+
+
+def test_spooled_uploads_survive_an_outage(server, monkeypatch, tmp_path):
+    monkeypatch.setenv("ALGOBENCH_CACHE_DIR", str(tmp_path))
+    solve = decorate(spool_uploads=True)
+    instance = list(range(30))
+
+    server.unavailable = True
+    server.latency = 0.5
+    started = time.monotonic()
+    assert solve(instance) == pick_items(instance)
+    assert time.monotonic() - started < 0.5
+    assert not solve.flush(timeout=0.2)
+
+    server.unavailable = False
+    server.latency = 0.0
+    assert solve.flush(timeout=10)
+    (problem,) = server.problems.values()
+    (stored_instance,) = server.instances.values()
+    assert json.loads(stored_instance["content"]) == instance
+    assert json.loads(list(server.solutions.values())[-1]["content"]) == pick_items(instance)
+
+
+def test_spooled_calls_do_not_wait_for_improvements_during_an_outage(server, monkeypatch, tmp_path):
+    monkeypatch.setenv("ALGOBENCH_CACHE_DIR", str(tmp_path))
+    solve = decorate(
+        spool_uploads=True,
+        additional_wait_seconds=10,
+        circuit_breaker=CircuitBreaker(failure_threshold=1, reset_timeout=60),
+    )
+    instance = list(range(30))
+
+    server.unavailable = True
+    started = time.monotonic()
+    assert solve(instance) == pick_items(instance)
+    # The first call stops waiting once the failed login opened the circuit.
+    assert time.monotonic() - started < 8
+    assert solve.circuit_breaker.state == "open"
+
+    started = time.monotonic()
+    for _ in range(3):
+        assert solve(instance) == pick_items(instance)
+    assert solve.batch([instance, instance]) == [pick_items(instance)] * 2
+    assert time.monotonic() - started < 1
+
+
+def test_open_circuit_skips_algobench(server):
+    solve = decorate(circuit_breaker=CircuitBreaker(failure_threshold=2, reset_timeout=60))
+    instance = list(range(20))
+
+    server.unavailable = True
+    for _ in range(5):
+        assert solve(instance) == pick_items(instance)
+
+    assert solve.circuit_breaker.state == "open"
+    assert server.requests[-2:] == [("POST", "/api/instances/"), ("POST", "/api/solutions/")]
+    assert len(server.requests) == 4
+    assert solve.circuit_breaker.stats()["transitions"] == {"closed->open": 1}
+
+
+def test_skipped_calls_make_no_requests(server):
+    solve = decorate(upload_policy=SizeRange(min_size=100))
+    requests_after_registration = len(server.requests)
+    small, large = list(range(5)), list(range(50))
+
+    assert solve(small) == pick_items(small)
+    assert solve.batch([small, small]) == [pick_items(small)] * 2
+    assert len(server.requests) == requests_after_registration
+
+    assert solve(large) == pick_items(large)
+    assert [json.loads(instance["content"]) for instance in server.instances.values()] == [large]
+    assert solve.stats()["counters"]["policy_skips"] == 3
+
+
+def slow_items(x: list[int]) -> list[int]:
+    if len(x) > 10:
+        time.sleep(0.05)
+    return pick_items(x)
+
+
+def test_only_slow_calls_are_uploaded_after_the_solve(server):
+    solve = algorithm(
+        name="mock_server_test",
+        feasibility_function=pick_feasibility,
+        scoring_function=pick_scoring,
+        api_key="test_key",
+        is_minimization=False,
+        upload_policy=SlowerThan(0.04),
+    )(slow_items)
+    fast, slow = list(range(5)), list(range(20))
+
+    assert solve(fast) == pick_items(fast)
+    assert solve.batch([fast, slow]) == [pick_items(fast), pick_items(slow)]
+
+    assert [json.loads(instance["content"]) for instance in server.instances.values()] == [slow]
+    ((_, solution),) = server.solutions.items()
+    assert json.loads(solution["content"]) == pick_items(slow)
+    assert solution["score"] == pick_scoring(slow, pick_items(slow))
+
+
+def test_wait_budget_learns_from_server_improvements(server):
+    instance = list(range(20))
+    decorate(dedup_instances=True)(instance)
+    (instance_id,) = server.instances
+    server.add_solution(instance_id, json.dumps([1] * 20), score=sum(instance))
+    solve = decorate(dedup_instances=True, wait_budget=WaitBudget(max_wait=5.0, min_observations=2, explore=0.0))
+
+    assert [solve(instance) for _ in range(2)] == [[1] * 20] * 2
+    ((bucket, model),) = solve.wait_budget.model().items()
+    assert model["observations"] == 2
+    assert model["improved"] == 1.0
+    assert model["mean_gain"] == 1.0
+    assert 0 < model["budget"] < 1.0
+
+    started = time.monotonic()
+    assert solve(instance) == [1] * 20
+    assert time.monotonic() - started < 1.0
+    assert solve.wait_budget.model()[bucket]["observations"] == 3
+
+
+EVOLVED_PICK_ITEMS = """
+def pick_items(x: list[int]) -> list[int]:
+    return [1 if value > {threshold} else 0 for value in x]
+"""
+
+
+def test_evolved_algorithm_runs_locally(server):
+    solve = decorate(evolved=EvolvedAlgorithms())
+    instance = list(range(20))
+    assert solve(instance) == pick_items(instance)
+
+    (problem_id,) = server.problems
+    server.add_algorithm(problem_id, EVOLVED_PICK_ITEMS.format(threshold=0), "pick_items")
+    assert solve.evolved.fetch().function_name == "pick_items"
+    requests_before = len(server.requests)
+
+    assert solve(instance) == [0] + [1] * 19
+    assert list(server.solutions.values())[-1]["score"] == sum(instance)
+    assert len(server.requests) == requests_before + 3
+    assert solve.stats()["counters"]["evolved_solves"] == 1
+    solve.evolved.close()
+
+
+def test_racing_evolved_algorithm_returns_the_better_solution(server):
+    solve = decorate(evolved=EvolvedAlgorithms(race=True))
+    (problem_id,) = server.problems
+    server.add_algorithm(problem_id, EVOLVED_PICK_ITEMS.format(threshold=15), "pick_items")
+    solve.evolved.fetch()
+
+    worse = [5] * 20
+    better = list(range(0, 200, 10))
+    assert solve(worse) == pick_items(worse)
+    assert solve(better) == [0, 0] + [1] * 18
+    assert solve.stats()["counters"]["evolved_wins"] == 1
+    solve.evolved.close()
+
+
+def yield_items(x: list[int]) -> Iterator[list[int]]:
+    solution = [0] * len(x)
+    for index in range(5):
+        solution[index] = 1
+        yield list(solution)
+
+
+@pytest.mark.parametrize("solution_diffs", [False, True])
+def test_generator_uploads_full_solutions_unless_diffs_are_advertised(server, solution_diffs):
+    server.solution_diffs = solution_diffs
+    solve = algorithm(
+        name="mock_server_test",
+        feasibility_function=pick_feasibility,
+        scoring_function=pick_scoring,
+        api_key="test_key",
+        is_minimization=False,
+    )(yield_items)
+    instance = list(range(1, 101))
+
+    assert solve(instance) == [1] * 5 + [0] * 95
+
+    solutions = list(server.solutions.values())
+    assert [json.loads(solution["content"]).count(1) for solution in solutions] == [1, 2, 3, 4, 5]
+    assert [solution["diff"] for solution in solutions] == [False] + [solution_diffs] * 4
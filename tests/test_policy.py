@@ -0,0 +1,49 @@
+import time
+
+from algobench.policy import AllOf, AnyOf, Predicate, RateLimit, Sample, SizeRange, SlowerThan, UploadCall
+
+
+def test_sample_uploads_a_fraction_of_calls():
+    policy = Sample(0.25, seed=1)
+
+    uploads = sum(policy(UploadCall(index)) for index in range(4000))
+
+    assert 800 < uploads < 1200
+    assert not Sample(0.0)(UploadCall(1))
+    assert Sample(1.0)(UploadCall(1))
+
+
+def test_rate_limit_allows_burst_then_rate():
+    policy = RateLimit(rate=20, burst=2)
+
+    assert [policy(UploadCall(1)) for _ in range(3)] == [True, True, False]
+    time.sleep(0.06)
+    assert policy(UploadCall(1))
+    assert not policy(UploadCall(1))
+
+
+def test_size_range_uses_json_length():
+    policy = SizeRange(min_size=5, max_size=10)
+
+    assert [policy(UploadCall(instance)) for instance in [[1], [1, 2], list(range(10))]] == [False, True, False]
+
+
+def test_combined_policies_wait_for_solve_if_any_part_does():
+    slow_or_sampled = Sample(0.0) | SlowerThan(0.5)
+    sampled_and_limited = AllOf(Sample(1.0), RateLimit(rate=1, burst=1))
+
+    assert slow_or_sampled.waits_for_solve
+    assert not sampled_and_limited.waits_for_solve
+    assert slow_or_sampled(UploadCall(1, duration=1.0))
+    assert not slow_or_sampled(UploadCall(1, duration=0.1))
+    assert sampled_and_limited(UploadCall(1))
+    assert not sampled_and_limited(UploadCall(1))
+
+
+def test_predicates_see_the_instance():
+    policy = AnyOf(lambda call: call.instance > 10, Predicate(lambda call: call.duration > 1, waits_for_solve=True))
+
+    assert policy.waits_for_solve
+    assert policy(UploadCall(11, duration=0.0))
+    assert policy(UploadCall(1, duration=2.0))
+    assert not policy(UploadCall(1, duration=0.0))
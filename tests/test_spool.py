@@ -0,0 +1,144 @@
+import time
+from unittest.mock import Mock
+
+import pytest
+
+from algobench.api_client import UploadRejectedError
+from algobench.spool import Spool, SpoolUploader
+
+
+@pytest.fixture
+def spool(tmp_path):
+    spool = Spool(str(tmp_path / "spool.sqlite"))
+    yield spool
+    spool.close()
+
+
+def mock_client():
+    client = Mock(algobench_url="http://localhost", env_name="test_env")
+    client.upload_instance_content.return_value = "instance_id"
+    client.upload_solution_content.return_value = "solution_id"
+    return client
+
+
+def wait_until(condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_solutions_are_claimed_after_their_instance(spool):
+    instance_ref = spool.append_instance("queue", "[1, 2]")
+    spool.append_solution("queue", "[1]", True, 1.0, instance_ref=instance_ref)
+    spool.append_solution("other_queue", "[2]", True, 2.0, instance_id="other_instance")
+
+    (instance,) = spool.claim("queue", 10)
+    assert (instance.kind, instance.content) == ("instance", "[1, 2]")
+    spool.complete(instance, "instance_id")
+
+    (solution,) = spool.claim("queue", 10)
+    assert (solution.kind, solution.instance_id, solution.feasible, solution.score) == (
+        "solution",
+        "instance_id",
+        True,
+        1.0,
+    )
+    assert spool.pending("queue") == 1
+    assert spool.pending() == 2
+
+
+def test_claimed_rows_are_not_handed_out_twice(spool):
+    other = Spool(spool.path)
+    spool.append_instance("queue", "[1]")
+
+    (instance,) = spool.claim("queue", 10)
+    assert other.claim("queue", 10) == []
+
+    spool.retry(instance, delay=60)
+    assert other.claim("queue", 10) == []
+    spool.release([instance])
+    (retried,) = other.claim("queue", 10)
+    assert retried.attempts == 1
+    other.close()
+
+
+def test_uploader_registers_and_ships_in_order(spool):
+    client = mock_client()
+    register = Mock(side_effect=[False, True, True, True])
+    uploader = SpoolUploader(client, spool, register, poll_interval=0.01, retry_interval=0.01, drain_timeout=0)
+
+    instance_future = uploader.submit_instance([1, 2])
+    solution_future = uploader.submit_solution([1], instance_future, True, 1.0)
+
+    assert uploader.flush(timeout=5)
+    assert instance_future.result() == "instance_id"
+    assert solution_future.result() == "solution_id"
+    client.upload_instance_content.assert_called_once_with("[1, 2]", raise_rejected=True)
+    client.upload_solution_content.assert_called_once_with("[1]", "instance_id", True, 1.0, raise_rejected=True)
+    assert spool.pending() == 0
+
+
+def test_failed_uploads_are_retried(spool):
+    client = mock_client()
+    client.upload_solution_content.side_effect = [None, ConnectionError("offline"), "solution_id"]
+    uploader = SpoolUploader(client, spool, lambda: True, poll_interval=0.01, retry_interval=0.01, drain_timeout=0)
+
+    future = uploader.submit_solution([1], uploader.submit_instance([1, 2]), True, 1.0)
+
+    assert future.result(timeout=5) == "solution_id"
+    assert client.upload_solution_content.call_count == 3
+
+
+def test_spooled_uploads_survive_the_process(spool):
+    offline = SpoolUploader(mock_client(), spool, lambda: False, retry_interval=60, drain_timeout=0)
+    offline.submit_solution([1], offline.submit_instance([1, 2]), True, 1.0)
+    assert not offline.flush(timeout=0.05)
+    assert spool.pending() == 2
+
+    client = mock_client()
+    SpoolUploader(client, Spool(spool.path), lambda: True, poll_interval=0.01, drain_timeout=0)
+
+    wait_until(lambda: spool.pending() == 0)
+    client.upload_solution_content.assert_called_once_with("[1]", "instance_id", True, 1.0, raise_rejected=True)
+
+
+def test_rejected_uploads_are_dead_lettered_with_their_solutions(spool):
+    client = mock_client()
+    client.upload_instance_content.side_effect = [UploadRejectedError(413, "too large"), "instance_id"]
+    uploader = SpoolUploader(client, spool, lambda: True, poll_interval=0.01, drain_timeout=0)
+
+    rejected = uploader.submit_instance([1] * 1000)
+    orphan = uploader.submit_solution([1], rejected, True, 1.0)
+    instance = uploader.submit_instance([1, 2])
+    solution = uploader.submit_solution([2], instance, True, 2.0)
+
+    assert uploader.flush(timeout=5)
+    assert (rejected.result(), orphan.result()) == (None, None)
+    assert (instance.result(), solution.result()) == ("instance_id", "solution_id")
+    client.upload_solution_content.assert_called_once_with("[2]", "instance_id", True, 2.0, raise_rejected=True)
+    assert spool.pending() == 0
+    assert spool.rejected(uploader.queue) == 2
+
+
+def test_uploads_failing_too_often_are_dead_lettered(spool):
+    client = mock_client()
+    client.upload_solution_content.return_value = None
+    uploader = SpoolUploader(
+        client, spool, lambda: True, poll_interval=0.01, retry_interval=0.01, max_attempts=3, drain_timeout=0
+    )
+
+    future = uploader.submit_solution([1], uploader.submit_instance([1, 2]), True, 1.0)
+
+    assert future.result(timeout=5) is None
+    assert client.upload_solution_content.call_count == 3
+    assert spool.pending() == 0
+    assert spool.rejected() == 1
+
+
+def test_full_spool_drops_new_uploads(spool):
+    spool.append_instance("http://localhost:test_env", "[1]")
+    uploader = SpoolUploader(mock_client(), spool, lambda: False, max_pending=1, retry_interval=60, drain_timeout=0)
+
+    assert uploader.submit_instance([2]).result() is None
+    assert spool.pending() == 1
@@ -0,0 +1,75 @@
+import threading
+from unittest.mock import Mock
+
+from algobench.file_handling import convert_to_json
+from algobench.uploader import BackgroundUploader, resolved_future
+
+
+def mock_api_client():
+    api_client = Mock()
+    api_client.serialize.side_effect = lambda object, stream=None: convert_to_json(object)
+    return api_client
+
+
+def test_uploads_instance_then_solution():
+    api_client = mock_api_client()
+    api_client.upload_instance_content.return_value = "instance_id"
+    api_client.upload_solution_content.return_value = "solution_id"
+    uploader = BackgroundUploader(api_client)
+
+    instance_future = uploader.submit_instance([1, 2, 3])
+    solution_future = uploader.submit_solution([3], instance_future, True, 3.0)
+
+    assert uploader.flush(timeout=5)
+    assert instance_future.result() == "instance_id"
+    assert solution_future.result() == "solution_id"
+    api_client.upload_instance_content.assert_called_once_with("[1, 2, 3]")
+    api_client.upload_solution_content.assert_called_once_with("[3]", "instance_id", True, 3.0)
+
+
+def test_solution_skipped_without_instance_id():
+    api_client = mock_api_client()
+    uploader = BackgroundUploader(api_client)
+
+    solution_future = uploader.submit_solution([3], resolved_future(None), True, 3.0)
+
+    assert uploader.flush(timeout=5)
+    assert solution_future.result() is None
+    api_client.upload_solution_content.assert_not_called()
+
+
+def test_failed_upload_resolves_to_none():
+    api_client = mock_api_client()
+    api_client.upload_instance_content.side_effect = Exception("Upload failed")
+    uploader = BackgroundUploader(api_client)
+
+    instance_future = uploader.submit_instance([1])
+
+    assert uploader.flush(timeout=5)
+    assert instance_future.result() is None
+
+
+def test_full_queue_drops_upload():
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow_upload(content):
+        started.set()
+        release.wait(5)
+        return "instance_id"
+
+    api_client = mock_api_client()
+    api_client.upload_instance_content.side_effect = slow_upload
+    uploader = BackgroundUploader(api_client, max_queue_size=1)
+
+    first = uploader.submit_instance([1])
+    assert started.wait(5)
+    second = uploader.submit_instance([2])
+    dropped = uploader.submit_instance([3])
+
+    assert dropped.result(timeout=1) is None
+    assert not uploader.flush(timeout=0.05)
+    release.set()
+    assert uploader.flush(timeout=5)
+    assert first.result() == "instance_id"
+    assert second.result() == "instance_id"
@@ -1,5 +1,6 @@
+from collections.abc import Iterator
 from unittest.mock import patch
-from algobench.validation import validate_functions, validate
+from algobench.validation import solution_annotation, validate_functions, validate
 
 
 def sample_algorithm(x: int) -> int:
@@ -78,3 +79,18 @@ def test_function_validation():
     assert not validate_functions(invalid_function, invalid_feasibility, valid_scoring)
     assert not validate_functions(invalid_function, valid_feasibility, valid_scoring)
     assert not validate_functions(invalid_function, valid_feasibility, invalid_scoring)
+
+
+def generator_function(input: TestInstance) -> Iterator[TestSolution]:
+    yield TestSolution()
+
+
+def plain_iterator_function(input: TestInstance) -> Iterator[TestSolution]:
+    return iter([TestSolution()])
+
+
+def test_generator_validation():
+    assert solution_annotation(generator_function) is TestSolution
+    assert validate_functions(generator_function, valid_feasibility, valid_scoring)
+
+    assert not validate_functions(plain_iterator_function, valid_feasibility, valid_scoring)
@@ -0,0 +1,82 @@
+from algobench.cache import DiskCache
+from algobench.wait_budget import Observation, WaitBudget, relative_gain, size_bucket
+
+
+def test_size_bucket_groups_powers_of_two():
+    assert size_bucket([1, 2]) == size_bucket([1, 23]) == 3
+    assert size_bucket([1]) == 2
+    assert size_bucket(list(range(100))) == 9
+
+
+def test_relative_gain():
+    assert relative_gain(100.0, True, 90.0) == 0.1
+    assert relative_gain(100.0, True, 300.0) == 1.0
+    assert relative_gain(None, False, 5.0) == 1.0
+
+
+def test_explores_until_enough_observations():
+    budget = WaitBudget(max_wait=10.0, min_observations=3, explore=0.0)
+
+    for _ in range(2):
+        assert budget.budget(4) == 10.0
+        budget.record(4, Observation(10.0))
+
+    assert budget.budget(4) == 10.0
+    budget.record(4, Observation(10.0))
+    assert budget.budget(4) == 0.0
+    assert budget.budget(5) == 10.0
+
+
+def test_waits_for_improvements_worth_their_delay():
+    budget = WaitBudget(target_rate=0.01, max_wait=30.0, min_observations=4, explore=0.0, margin=1.0)
+    # Improvements by 10% after a second, and one more by 20% after 25 seconds, which is not worth waiting for.
+    for _ in range(3):
+        budget.record(7, Observation(1.0, [(1.0, 0.1)]))
+    budget.record(7, Observation(30.0, [(1.0, 0.1), (25.0, 0.2)]))
+
+    assert budget.budget(7) == 1.0
+
+    for _ in range(4):
+        budget.record(7, Observation(30.0, [(1.0, 0.1), (25.0, 0.5)]))
+    assert budget.budget(7) == 25.0
+
+
+def test_short_waits_without_improvement_do_not_count_against_longer_ones():
+    budget = WaitBudget(target_rate=0.01, max_wait=30.0, min_observations=2, explore=0.0, margin=1.0)
+    budget.record(3, Observation(20.0, [(10.0, 0.5)]))
+    for _ in range(20):
+        budget.record(3, Observation(2.0))
+
+    assert budget.budget(3) == 10.0
+
+
+def test_model_summarizes_buckets():
+    budget = WaitBudget(min_observations=2, margin=1.0)
+    budget.record(3, Observation(2.0, [(2.0, 0.5)]))
+    budget.record(3, Observation(5.0))
+
+    assert budget.model() == {
+        3: {
+            "max_size": 7,
+            "observations": 2,
+            "improved": 0.5,
+            "median_delay": 2.0,
+            "mean_gain": 0.25,
+            "budget": 2.0,
+        }
+    }
+
+
+def test_observations_persist_across_processes(tmp_path):
+    store = DiskCache(str(tmp_path / "wait_budgets.sqlite"))
+    first = WaitBudget(min_observations=1, explore=0.0, margin=1.0)
+    first.bind(store, "problem")
+    first.record(3, Observation(2.0, [(2.0, 0.5)]))
+
+    second = WaitBudget(min_observations=1, explore=0.0, margin=1.0)
+    second.bind(store, "problem")
+    other = WaitBudget(min_observations=1, explore=0.0)
+    other.bind(store, "other problem")
+
+    assert second.budget(3) == 2.0
+    assert other.model() == {}